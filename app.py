@@ -1,69 +1,84 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, send_from_directory, abort, render_template_string, current_app
+from flask import Blueprint, Flask, render_template, redirect, url_for, flash, request, send_from_directory, send_file, abort, render_template_string, current_app, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user, UserMixin
-from models import db, User, UserRole, Case, Client, Document, CalendarEvent, Note, Template, PersonEntity
-from forms import SignUpForm, LoginForm, CaseForm, ClientForm, CalendarEventForm,  TemplateForm, GenerateDocumentForm, DocumentForm, PartyForm
+from models import db, User, UserRole, Case, Client, Document, CalendarEvent, Note, Template, PersonEntity, Job
+from forms import SignUpForm, LoginForm, CaseForm, ClientForm, CalendarEventForm,  TemplateForm, GenerateDocumentForm, DocumentForm, PartyForm, BatchGenerateForm, NoteForm
 import datetime
 from datetime import timedelta
 from werkzeug.utils import secure_filename
 import os
-from services.custom_fields import attach_custom_fields_to_form, get_custom_fields_for, save_custom_field_values
+import mimetypes
+from services.custom_fields import get_custom_form, populate_custom_field_values, save_custom_field_values
+from services.pagination import keyset_paginate, clamp_page_size, InvalidCursor
+from services.case_queries import case_summary_query, case_choices, case_label_with_number, case_detail_loaders
+from services.template_cache import render_cached
+from services.template_resolver import resolve_template, invalidate_template_cache, slugify
+from services.batch_generation import generate_batch, resolve_sources
+from services.choices import apply_choices, choice_options, search_choices, CHOICE_SOURCES
+from services.note_queries import notes_timeline_page, note_row_to_dict
 from werkzeug.security import generate_password_hash
+from sqlalchemy.orm import joinedload
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key_here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///cms.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+from config import CONFIGS
+from services import bootstrap, calendar_windows, choices, custom_fields, ics_feed, jobs, profiling, search as search_index, template_resolver, user_cache
+from utils import database, schema_check, schema_evolve, storage
+from utils.db_routing import replica_reads
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# inside app.py after app = Flask(...)
-from cms.cases import cases_bp
-app.register_blueprint(cases_bp)
-# Add similar for documents blueprint or services
+login_manager.login_view = 'main.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# --- Ensure super user exists ---
-def create_superuser():
-    with app.app_context():
-        super_email = "admin@lawfirm.com"
-        super_name = "Super User"
-        super_password = "supersecret"
-        superuser = User.query.filter_by(email=super_email).first()
-        if not superuser:
-            su = User(
-                name=super_name,
-                email=super_email,
-                role=UserRole.superuser,
-                is_active=True
-            )
-            su.set_password(super_password)
-            db.session.add(su)
-            db.session.commit()
+    # cached per process (services/user_cache.py), so page views skip the users lookup
+    return user_cache.load_user(int(user_id))
 
-@app.before_request
-def setup():
-    db.create_all()
-    create_superuser()
+# every view below; registered on each app by create_app()
+bp = Blueprint('main', __name__)
+
+def create_app(config=None):
+    """
+    Build and configure an app: settings from config.py (the class named by CMS_CONFIG,
+    default 'development', or `config`), then the database, login, views and service hooks.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config or CONFIGS[os.getenv('CMS_CONFIG', 'development')])
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # engine options and SQLite pragmas for the configured backend (and replica), then db.init_app
+    database.init_app(app)
+    login_manager.init_app(app)
+
+    from cms.cases import cases_bp
+    app.register_blueprint(cases_bp)
+    app.register_blueprint(bp)
+
+    profiling.init_app(app)
+    user_cache.init_app(app)
+    template_resolver.init_app(app)
+    custom_fields.init_app(app)
+    search_index.init_app(app)
+    choices.init_app(app)
+    calendar_windows.init_app(app)
+    ics_feed.init_app(app)
+    jobs.init_app(app)
+    storage.init_app(app)
+    schema_check.init_app(app)
+    schema_evolve.init_app(app)
+    # --- One-shot bootstrap: create tables and ensure super user exists (not per request) ---
+    bootstrap.init_app(app)
+    return app
 
 # --- Routes ---
-@app.route('/')
+@bp.route('/')
 def home():
     return render_template('home.html')
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     form = SignUpForm()
     if form.validate_on_submit():
         if User.query.filter_by(email=form.email.data).first():
             flash('Email is already registered.', 'danger')
-            return redirect(url_for('signup'))
+            return redirect(url_for('main.signup'))
         new_user = User(
             name=form.name.data,
             email=form.email.data,
@@ -73,10 +88,10 @@ def signup():
         db.session.add(new_user)
         db.session.commit()
         flash('Registration submitted. Await super user approval.', 'info')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('signup.html', form=form)
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -84,59 +99,49 @@ def login():
         if user and user.check_password(form.password.data):
             if not user.is_active:
                 flash('Awaiting super user approval.', 'warning')
-                return redirect(url_for('login'))
+                return redirect(url_for('main.login'))
             login_user(user)
             flash('Logged in successfully!', 'success')
-            return redirect(url_for('team_dashboard'))
+            return redirect(url_for('main.team_dashboard'))
         flash('Invalid credentials.', 'danger')
     return render_template('login.html', form=form)
 
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
+@replica_reads
 def dashboard():
     import datetime
     today = datetime.date.today()
-    # Get start of week (Monday)
-    start_of_week = today - datetime.timedelta(days=today.weekday())
-    end_of_week = start_of_week + datetime.timedelta(days=6)
-
-    # Get events for the current week
-    week_start_dt = datetime.datetime.combine(start_of_week, datetime.time.min)
-    week_end_dt = datetime.datetime.combine(end_of_week, datetime.time.max)
-    weekly_events = CalendarEvent.query.filter(
-        CalendarEvent.event_datetime >= week_start_dt,
-        CalendarEvent.event_datetime <= week_end_dt
-    ).order_by(CalendarEvent.event_datetime.asc()).all()
+    # This week (Monday first), bucketed by day and cached (services/calendar_windows.py)
+    week = calendar_windows.week_window(today)
     return render_template('dashboard.html',
         user=current_user,
-        weekly_events=weekly_events,
-        timedelta=timedelta,
-        week_days=[start_of_week + datetime.timedelta(days=i) for i in range(7)],
+        week=week,
     )
 
 from auth import team_required
 
-@app.route('/team_dashboard')
+@bp.route('/team_dashboard')
 @team_required
 def team_dashboard():
     # You can pass real data for recent cases, events, etc.
     return render_template('team_dashboard.html', user=current_user)
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Logged out.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # --- Superuser approval ---
-@app.route('/approve', methods=['GET', 'POST'])
+@bp.route('/approve', methods=['GET', 'POST'])
 @login_required
 def approve_users():
     if not current_user.is_superuser():
         flash('Access denied.', 'danger')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     pending_users = User.query.filter_by(role=UserRole.pending).all()
     if request.method == 'POST':
         user_id = request.form.get('user_id')
@@ -147,21 +152,21 @@ def approve_users():
             user.is_active = True
             db.session.commit()
             flash(f'User {user.name} approved as {role}.', 'success')
-        return redirect(url_for('approve_users'))
+        return redirect(url_for('main.approve_users'))
     return render_template('approve.html', pending_users=pending_users, roles=[r for r in UserRole if r != UserRole.superuser and r != UserRole.pending])
 
-@app.route('/settings')
+@bp.route('/settings')
 @login_required
 def settings():
     # You can restrict to certain roles if needed
     return render_template('settings.html', user=current_user)
 
-@app.route('/admin/search_users')
+@bp.route('/admin/search_users')
 @login_required
 def search_users():
     if not current_user.is_superuser():
         flash('Access denied.', 'danger')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     query = request.args.get('q', '')
     users = User.query.filter(
         db.or_(
@@ -171,36 +176,92 @@ def search_users():
         )
     ).all()
     return render_template('admin_dashboard.html', users=users)
+
+@bp.route('/admin/profiling', methods=['GET', 'POST'])
+@login_required
+def admin_profiling():
+    """Per-endpoint latency percentiles and query counts, plus the most recent slow queries."""
+    if not current_user.is_superuser():
+        flash('Access denied.', 'danger')
+        return redirect(url_for('main.dashboard'))
+    profiler = profiling.get_profiler()
+    if request.method == 'POST':
+        profiler.reset()
+        flash('Profiling statistics reset.', 'info')
+        return redirect(url_for('main.admin_profiling'))
+    return render_template('admin_profiling.html', stats=profiler.stats(),
+                           slow_queries=list(profiler.slow_queries),
+                           slow_query_ms=current_app.config['SLOW_QUERY_MS'],
+                           enabled=current_app.config['PROFILE_REQUESTS'])
+
+@bp.route('/search/suggest')
+@login_required
+@replica_reads
+def search_suggest():
+    """Type-ahead JSON: ranked cases, notes and people matching every word of `q` as a prefix."""
+    q = request.args.get('q', '').strip()
+    kinds = [k for k in request.args.getlist('kind') if k in search_index.KIND_CODES] or None
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    hits = search_index.search(q, kinds=kinds, limit=limit) if len(q) >= 2 else []
+    results = []
+    for hit in hits:
+        item = hit.to_dict()
+        if hit.kind == 'case':
+            item['url'] = url_for('main.case_detail', case_id=hit.ref_id)
+        elif hit.kind == 'note':
+            item['url'] = url_for('main.note_detail', note_id=hit.ref_id)
+        results.append(item)
+    return jsonify(results=results)
+
+@bp.route('/api/choices/<name>')
+@login_required
+@replica_reads
+def choices_api(name):
+    """Type-ahead JSON for dropdowns too large to embed (services/choices.py): [{id, label}] matching `q`."""
+    if name not in CHOICE_SOURCES:
+        abort(404)
+    q = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 50)
+    return jsonify(results=[{'id': id_, 'label': label} for id_, label in search_choices(name, q, limit=limit)])
+
 #--- Cases Module ---
-@app.route('/cases')
+@bp.route('/cases')
 @login_required
+@replica_reads
 def cases_list():
     search = request.args.get('search', '').strip()
-    query = Case.query
+    page_size = clamp_page_size(request.args.get('page_size'))
+    query = case_summary_query()
     if search:
-        query = query.filter(Case.style.ilike(f"%{search}%") | Case.case_number.ilike(f"%{search}%"))
-    cases = query.all()
-    return render_template('cases_list.html', cases=cases, search=search)
-
-@app.route('/cases/<int:case_id>')
+        query = query.filter(search_index.search_condition(
+            'case', Case.id, search,
+            fallback=Case.style.ilike(f"%{search}%") | Case.case_number.ilike(f"%{search}%")))
+    try:
+        page = keyset_paginate(query, [Case.created_at, Case.id],
+                               after=request.args.get('after'), before=request.args.get('before'),
+                               page_size=page_size)
+    except InvalidCursor:
+        flash('Invalid page link; showing the first page.', 'warning')
+        page = keyset_paginate(query, [Case.created_at, Case.id], page_size=page_size)
+    return render_template('cases_list.html', cases=page.items, page=page, search=search, page_size=page_size)
+
+@bp.route('/cases/<int:case_id>')
 @login_required
+@replica_reads
 def case_detail(case_id):
-    case = Case.query.get_or_404(case_id)
-    # Pass related info as needed
-    return render_template('case_detail.html', case=case)
+    case = Case.query.options(*case_detail_loaders()).filter(Case.id == case_id).first_or_404()
+    return render_template('case_detail.html', case=case, feed_url=ics_feed.feed_url('case', case.id, current_user))
 
 
-@app.route('/cases/create', methods=['GET', 'POST'])
+@bp.route('/cases/create', methods=['GET', 'POST'])
 @login_required
 def case_create():
-    form = CaseForm()
+    # CaseForm plus the custom fields, compiled once and cached (no owner yet)
+    form_cls, custom_fields = get_custom_form(CaseForm, 'case')
+    form = form_cls()
     # populate client/user choices
-    form.client_id.choices = [(c.id, c.name) for c in Client.query.order_by(Client.name).all()]
-    form.user_id.choices = [(u.id, u.name) for u in User.query.order_by(User.name).all()]
-
-    # Get custom fields metadata and attach dynamic fields to the form (no owner yet)
-    custom_fields = get_custom_fields_for('case')
-    attach_custom_fields_to_form(form, target='case', owner=None)
+    apply_choices(form.client_id, 'clients')
+    apply_choices(form.user_id, 'users')
 
     if form.validate_on_submit():
         # create the Case first so it has an id for storing custom values
@@ -214,21 +275,22 @@ def case_create():
         db.session.commit()  # commit custom field values
 
         flash('Case created.', 'success')
-        return redirect(url_for('cases_list'))  # adjust endpoint name as needed
+        return redirect(url_for('main.cases_list'))  # adjust endpoint name as needed
     return render_template('case_form.html', form=form, custom_fields=custom_fields, case=None)
 
-@app.route('/cases/<int:case_id>/edit', methods=['GET', 'POST'])
+@bp.route('/cases/<int:case_id>/edit', methods=['GET', 'POST'])
 @login_required
 def case_edit(case_id):
     case = Case.query.get_or_404(case_id)
-    form = CaseForm(obj=case)
+    form_cls, custom_fields = get_custom_form(CaseForm, 'case')
+    form = form_cls(obj=case)
     # populate client/user choices
-    form.client_id.choices = [(c.id, c.name) for c in Client.query.order_by(Client.name).all()]
-    form.user_id.choices = [(u.id, u.name) for u in User.query.order_by(User.name).all()]
+    apply_choices(form.client_id, 'clients')
+    apply_choices(form.user_id, 'users')
 
-    # Get custom fields and attach to form, passing the existing case so fields get pre-populated
-    custom_fields = get_custom_fields_for('case')
-    attach_custom_fields_to_form(form, target='case', owner=case)
+    # pre-populate custom fields from the stored values (submitted data wins on POST)
+    if not form.is_submitted():
+        populate_custom_field_values(form, 'case', case, custom_fields)
 
     if form.validate_on_submit():
         form.populate_obj(case)
@@ -236,25 +298,25 @@ def case_edit(case_id):
         save_custom_field_values(case, 'case', custom_fields, form)
         db.session.commit()
         flash('Case updated.', 'success')
-        return redirect(url_for('case_detail', case_id=case.id))  # adjust endpoint as needed
+        return redirect(url_for('main.case_detail', case_id=case.id))  # adjust endpoint as needed
 
     return render_template('case_form.html', form=form, custom_fields=custom_fields, case=case)
-@app.route('/cases/<int:case_id>/delete', methods=['POST'])
+@bp.route('/cases/<int:case_id>/delete', methods=['POST'])
 @login_required
 def case_delete(case_id):
     case = Case.query.get_or_404(case_id)
     db.session.delete(case)
     db.session.commit()
     flash('Case deleted.', 'info')
-    return redirect(url_for('cases_list'))
+    return redirect(url_for('main.cases_list'))
 
-@app.route('/people_entity')
+@bp.route('/people_entity')
 @login_required
 def people_entity_list():
     people_entity = PersonEntity.query.all()
     return render_template('people_entity_list.html', people_entity=people_entity)
 
-@app.route('/people_entity/create', methods=['GET', 'POST'])
+@bp.route('/people_entity/create', methods=['GET', 'POST'])
 @login_required
 def create_people_entity():
     form = PartyForm()
@@ -275,14 +337,14 @@ def create_people_entity():
             db.session.add(person_entity)
             db.session.commit()
             flash('Client created successfully!', 'success')
-            return redirect(url_for('people_entity_list'))
+            return redirect(url_for('main.people_entity_list'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error creating client: {str(e)}', 'danger')
-        redirect(url_for('people_entity_list'))
+        redirect(url_for('main.people_entity_list'))
     return render_template('people_entity_form.html', form=form)
 
-@app.route('/people_entity/<int:people_entity_id>/edit', methods=['GET', 'POST'])
+@bp.route('/people_entity/<int:people_entity_id>/edit', methods=['GET', 'POST'])
 @login_required
 def people_entity_edit(client_id):
     people_entity = PersonEntity.query.get_or_404(client_id)
@@ -294,28 +356,31 @@ def people_entity_edit(client_id):
         return redirect(url_for('people_entity'))
     return render_template('people_entity_form.html', form=form, client=client)
 
-@app.route('/people_entity/<int:people_entity_id>/delete', methods=['POST'])
+@bp.route('/people_entity/<int:people_entity_id>/delete', methods=['POST'])
 @login_required
 def people_entity_delete(client_id):
     people_entity = PersonEntity.query.get_or_404(client_id)
     db.session.delete(people_entity)
     db.session.commit()
     flash('Data deleted.', 'info')
-    return redirect(url_for('people_entity_list'))
+    return redirect(url_for('main.people_entity_list'))
 
-@app.route('/clients/<int:client_id>')
+@bp.route('/clients/<int:client_id>')
 @login_required
+@replica_reads
 def client_detail(client_id):
     client = Client.query.get_or_404(client_id)
     cases = client.cases
     documents = client.documents
     return render_template('people_entity_detail.html', client=client, cases=cases, documents=documents)
 
-@app.route('/documents')
+@bp.route('/documents')
 @login_required
+@replica_reads
 def documents_list():
     sort = request.args.get('sort', 'recently_added')
-    query = Document.query
+    # the list shows each document's client and case; join them instead of a lazy load per row
+    query = Document.query.options(joinedload(Document.client), joinedload(Document.case))
 
     if sort == 'recently_viewed':
         query = query.order_by(Document.last_viewed_at.desc().nullslast())
@@ -331,12 +396,12 @@ def documents_list():
     documents = query.all()
     return render_template('documents_list.html', documents=documents, sort=sort)
 
-@app.route('/documents/create', methods=['GET', 'POST'])
+@bp.route('/documents/create', methods=['GET', 'POST'])
 @login_required
 def document_create():
     form = DocumentForm()
-    form.client_id.choices = [(c.id, c.name) for c in Client.query.all()]
-    form.case_id.choices = [(c.id, c.style) for c in Case.query.all()]
+    apply_choices(form.client_id, 'clients')
+    apply_choices(form.case_id, 'cases')
     if form.validate_on_submit():
         # handle file upload as needed
         doc = Document(
@@ -348,84 +413,104 @@ def document_create():
         db.session.add(doc)
         db.session.commit()
         flash('Document created!', 'success')
-        return redirect(url_for('documents_list'))
+        return redirect(url_for('main.documents_list'))
     return render_template('document_form.html', form=form)
 
-@app.route('/documents/<int:doc_id>/edit', methods=['GET', 'POST'])
+@bp.route('/documents/<int:doc_id>/edit', methods=['GET', 'POST'])
 @login_required
 def document_edit(doc_id):
     doc = Document.query.get_or_404(doc_id)
     form = DocumentForm(obj=doc)
-    form.client_id.choices = [(c.id, c.name) for c in Client.query.all()]
-    form.case_id.choices = [(c.id, c.style) for c in Case.query.all()]
+    apply_choices(form.client_id, 'clients')
+    apply_choices(form.case_id, 'cases')
     if form.validate_on_submit():
         form.populate_obj(doc)
         db.session.commit()
         flash('Document updated!', 'success')
-        return redirect(url_for('documents_list'))
+        return redirect(url_for('main.documents_list'))
     return render_template('document_form.html', form=form, doc=doc)
 
-@app.route('/documents/<int:doc_id>/delete', methods=['POST'])
+@bp.route('/documents/<int:doc_id>/delete', methods=['POST'])
 @login_required
 def document_delete(doc_id):
     doc = Document.query.get_or_404(doc_id)
     db.session.delete(doc)
     db.session.commit()
     flash('Document deleted.', 'info')
-    return redirect(url_for('documents_list'))
+    return redirect(url_for('main.documents_list'))
 
-@app.route('/documents/<int:doc_id>')
+@bp.route('/documents/<int:doc_id>')
 @login_required
+@replica_reads
 def document_detail(doc_id):
     doc = Document.query.get_or_404(doc_id)
     return render_template('document_detail.html', doc=doc)
 
-@app.route('/notes')
+@bp.route('/notes')
 @login_required
+@replica_reads
 def notes_list():
+    # Newest first, a page at a time (services/note_queries.py); "Load more" fetches /api/notes
     search = request.args.get('search', '').strip()
     user_id = request.args.get('user_id', type=int)
-    client_id = request.args.get('client_id', type=int)
     case_id = request.args.get('case_id', type=int)
+    page_size = clamp_page_size(request.args.get('page_size'))
+    try:
+        page = notes_timeline_page(search, user_id, case_id, after=request.args.get('after'),
+                                   before=request.args.get('before'), page_size=page_size)
+    except InvalidCursor:
+        flash('Invalid page link; showing the first page.', 'warning')
+        page = notes_timeline_page(search, user_id, case_id, page_size=page_size)
 
-    query = Note.query
-
-    if search:
-        query = query.filter(Note.note.ilike(f"%{search}%"))
-    if user_id:
-        query = query.filter(Note.user_id == user_id)
-    if client_id:
-        query = query.filter(Note.client_id == client_id)
-    if case_id:
-        query = query.filter(Note.case_id == case_id)
-
-    notes = query.order_by(Note.created_at.desc()).all()
-
-    users = User.query.all()
-    clients = Client.query.all()
-    cases = Case.query.all()
+    # filter dropdowns: cached lists, or type-ahead for large tables (services/choices.py)
+    users, users_url = choice_options('users', [user_id])
+    cases, cases_url = choice_options('cases', [case_id])
 
     return render_template(
         'notes_list.html',
-        notes=notes,
+        notes=page.items,
+        page=page,
         search=search,
         user_id=user_id,
-        client_id=client_id,
         case_id=case_id,
+        page_size=page_size,
         users=users,
-        clients=clients,
-        cases=cases
+        users_url=users_url,
+        cases=cases,
+        cases_url=cases_url,
     )
 
-@app.route('/notes/create', methods=['GET', 'POST'])
+@bp.route('/api/notes')
+@login_required
+@replica_reads
+def notes_api():
+    """Timeline JSON for infinite scroll: {results: [...], next_cursor}; same filters as /notes."""
+    try:
+        page = notes_timeline_page(request.args.get('search', '').strip(),
+                                   request.args.get('user_id', type=int),
+                                   request.args.get('case_id', type=int),
+                                   after=request.args.get('after'), before=request.args.get('before'),
+                                   page_size=clamp_page_size(request.args.get('page_size')))
+    except InvalidCursor:
+        return jsonify(error='invalid cursor'), 400
+    results = []
+    for row in page.items:
+        item = note_row_to_dict(row)
+        item['url'] = url_for('main.note_detail', note_id=row.id)
+        item['edit_url'] = url_for('main.note_edit', note_id=row.id)
+        item['delete_url'] = url_for('main.note_delete', note_id=row.id)
+        results.append(item)
+    return jsonify(results=results, next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+@bp.route('/notes/create', methods=['GET', 'POST'])
 @login_required
 def note_create():
     form = NoteForm()
-    form.user_id.choices = [(u.id, u.name) for u in User.query.all()]
-    form.case_id.choices = [(c.id, c.style) for c in Case.query.all()]
-    form.client_id.choices = [(c.id, c.name) for c in Client.query.all()]
-    form.event_id.choices = [(e.id, e.title) for e in CalendarEvent.query.all()]
-    form.document_id.choices = [(d.id, d.filename) for d in Document.query.all()]
+    apply_choices(form.user_id, 'users')
+    apply_choices(form.case_id, 'cases')
+    apply_choices(form.client_id, 'clients')
+    apply_choices(form.event_id, 'events')
+    apply_choices(form.document_id, 'documents')
     if form.validate_on_submit():
         note = Note(
             note=form.note.data,
@@ -439,88 +524,94 @@ def note_create():
         db.session.add(note)
         db.session.commit()
         flash('Note created!', 'success')
-        return redirect(url_for('notes_list'))
+        return redirect(url_for('main.notes_list'))
     return render_template('note_form.html', form=form)
 
-@app.route('/notes/<int:note_id>/edit', methods=['GET', 'POST'])
+@bp.route('/notes/<int:note_id>/edit', methods=['GET', 'POST'])
 @login_required
 def note_edit(note_id):
     note = Note.query.get_or_404(note_id)
     form = NoteForm(obj=note)
-    form.user_id.choices = [(u.id, u.name) for u in User.query.all()]
-    form.case_id.choices = [(c.id, c.style) for c in Case.query.all()]
-    form.client_id.choices = [(c.id, c.name) for c in Client.query.all()]
-    form.event_id.choices = [(e.id, e.title) for e in CalendarEvent.query.all()]
-    form.document_id.choices = [(d.id, d.filename) for d in Document.query.all()]
+    apply_choices(form.user_id, 'users')
+    apply_choices(form.case_id, 'cases')
+    apply_choices(form.client_id, 'clients')
+    apply_choices(form.event_id, 'events')
+    apply_choices(form.document_id, 'documents')
     if form.validate_on_submit():
         form.populate_obj(note)
         db.session.commit()
         flash('Note updated!', 'success')
-        return redirect(url_for('notes_list'))
+        return redirect(url_for('main.notes_list'))
     return render_template('note_form.html', form=form, note=note)
 
-@app.route('/notes/<int:note_id>/delete', methods=['POST'])
+@bp.route('/notes/<int:note_id>/delete', methods=['POST'])
 @login_required
 def note_delete(note_id):
     note = Note.query.get_or_404(note_id)
     db.session.delete(note)
     db.session.commit()
     flash('Note deleted.', 'info')
-    return redirect(url_for('notes_list'))
+    return redirect(url_for('main.notes_list'))
 
-@app.route('/notes/<int:note_id>')
+@bp.route('/notes/<int:note_id>')
 @login_required
+@replica_reads
 def note_detail(note_id):
     note = Note.query.get_or_404(note_id)
     return render_template('note_detail.html', note=note)
 
-@app.route('/calendar')
+@bp.route('/calendar')
 @login_required
+@replica_reads
 def calendar_month():
-    # Get current month info
+    # ?year=&month= picks the month (default: this one); ?mine=1 shows only the user's events
     today = datetime.now()
-    year, month = today.year, today.month
+    year = request.args.get('year', today.year, type=int)
+    month = request.args.get('month', today.month, type=int)
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        year, month = today.year, today.month
+    mine = request.args.get('mine', type=int) == 1
 
-    # Get all events for the current month
-    start = datetime(year, month, 1)
-    if month == 12:
-        end = datetime.datetime(year + 1, 1, 1)
-    else:
-        end = datetime(year, month + 1, 1)
-    events = CalendarEvent.query.filter(CalendarEvent.event_datetime >= start, CalendarEvent.event_datetime < end).all()
-
-    # Organize events by day
-    from collections import defaultdict
-    events_by_day = defaultdict(list)
-    for event in events:
-        day = event.event_datetime.day
-        events_by_day[day].append(event)
-
-    import calendar as pycal
-    month_days = pycal.monthcalendar(year, month)  # list of weeks, each week is a list of day numbers (0 means blank)
+    # Events and deadlines of the month, bucketed by day (one indexed query, then cached)
+    window = calendar_windows.month_window(year, month, user_id=current_user.id if mine else None)
+    prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_month = (year + 1, 1) if month == 12 else (year, month + 1)
 
     return render_template(
         'calendar_month.html',
         year=year,
         month=month,
-        month_days=month_days,
-        events_by_day=events_by_day
+        window=window,
+        mine=mine,
+        prev_month=prev_month,
+        next_month=next_month,
+        feed_url=ics_feed.feed_url('user', current_user.id, current_user),
     )
 
 
-@app.route('/calendar/events')
+@bp.route('/calendar/events')
 @login_required
+@replica_reads
 def events_list():
-    events = CalendarEvent.query.order_by(CalendarEvent.event_datetime.asc()).all()
+    events = (
+        CalendarEvent.query
+        .options(joinedload(CalendarEvent.case), joinedload(CalendarEvent.client),
+                 joinedload(CalendarEvent.document), joinedload(CalendarEvent.user))
+        .order_by(CalendarEvent.event_datetime.asc())
+        .all()
+    )
     return render_template('events_list.html', events=events)
 
 from datetime import datetime
 
-@app.route('/calendar/events/create', methods=['GET', 'POST'])
+@bp.route('/calendar/events/create', methods=['GET', 'POST'])
 @login_required
 def event_create():
     form = CalendarEventForm(request.form)
-    # ... set choices if needed ...
+    apply_choices(form.case_id, 'cases', blank=(0, ''))
+    apply_choices(form.client_id, 'clients', blank=(0, ''))
+    apply_choices(form.document_id, 'documents', blank=(0, ''))
+    apply_choices(form.user_id, 'users', blank=(0, ''))
     if request.method == 'POST' and form.validate():
         # Combine event date/time
         event_dt_str = f"{form.event_year.data}-{form.event_month.data}-{form.event_day.data} {form.event_hour.data}:{form.event_minute.data}"
@@ -541,149 +632,219 @@ def event_create():
         db.session.add(event)
         db.session.commit()
         flash('Event created!', 'success')
-        return redirect(url_for('events_list'))
+        return redirect(url_for('main.events_list'))
     return render_template('event_form.html', form=form)
-@app.route('/calendar/events/<int:event_id>/edit', methods=['GET', 'POST'])
+@bp.route('/calendar/events/<int:event_id>/edit', methods=['GET', 'POST'])
 @login_required
 def event_edit(event_id):
     event = CalendarEvent.query.get_or_404(event_id)
     form = CalendarEventForm(obj=event)
-    form.case_id.choices = [(0, '')] + [(c.id, c.style) for c in Case.query.all()]
-    form.client_id.choices = [(0, '')] + [(c.id, c.name) for c in Client.query.all()]
-    form.document_id.choices = [(0, '')] + [(d.id, d.filename) for d in Document.query.all()]
-    form.user_id.choices = [(0, '')] + [(u.id, u.name) for u in User.query.all()]
+    apply_choices(form.case_id, 'cases', blank=(0, ''))
+    apply_choices(form.client_id, 'clients', blank=(0, ''))
+    apply_choices(form.document_id, 'documents', blank=(0, ''))
+    apply_choices(form.user_id, 'users', blank=(0, ''))
     if form.validate_on_submit():
         form.populate_obj(event)
         db.session.commit()
         flash('Event updated!', 'success')
-        return redirect(url_for('events_list'))
+        return redirect(url_for('main.events_list'))
     return render_template('event_form.html', form=form, event=event)
 
-@app.route('/calendar/events/<int:event_id>/delete', methods=['POST'])
+@bp.route('/calendar/events/<int:event_id>/delete', methods=['POST'])
 @login_required
 def event_delete(event_id):
     event = CalendarEvent.query.get_or_404(event_id)
     db.session.delete(event)
     db.session.commit()
     flash('Event deleted.', 'info')
-    return redirect(url_for('events_list'))
+    return redirect(url_for('main.events_list'))
 
-@app.route('/calendar/events/<int:event_id>')
+@bp.route('/calendar/events/<int:event_id>')
 @login_required
+@replica_reads
 def event_detail(event_id):
     event = CalendarEvent.query.get_or_404(event_id)
     return render_template('event_detail.html', event=event)
 
-# Add upload folder config (near app.config lines)
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads', 'documents')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+@bp.route('/calendar/feed/reset', methods=['POST'])
+@login_required
+def calendar_feed_reset():
+    """Revoke every calendar feed URL issued to the current user (their calendar and case feeds)."""
+    user = db.session.get(User, current_user.id)
+    ics_feed.rotate_feed_urls(user)
+    db.session.commit()
+    flash('Your calendar feed links were reset. Subscribe again with the new links.', 'info')
+    return redirect(request.referrer or url_for('main.calendar_month'))
+
+@bp.route('/calendar/feed/<token>.ics')
+@replica_reads
+def calendar_feed(token):
+    # Subscribed to from calendar clients, so no login: the signed token in the URL is the credential
+    # (checked against its holder's account and feed version by read_feed_token)
+    try:
+        scope, ref_id = ics_feed.read_feed_token(token)
+    except ics_feed.InvalidFeedToken:
+        abort(404)
+    if scope == 'user':
+        owner = db.session.get(User, ref_id)
+        if owner is None or not owner.is_active:
+            abort(404)
+        name = f"{owner.name} - Law Firm CMS"
+    else:
+        owner = db.session.get(Case, ref_id)
+        if owner is None:
+            abort(404)
+        name = f"{owner.style} - Law Firm CMS"
+
+    sync_token = request.args.get('sync_token')
+    etag = ics_feed.feed_etag(scope, ref_id, sync_token)
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        body, next_token = ics_feed.build_feed(scope, ref_id, name, sync_token)
+        response = current_app.response_class(body, mimetype='text/calendar')
+        response.headers['X-Sync-Token'] = next_token
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 # --- Template management routes ---
-@app.route('/documents/templates')
+@bp.route('/documents/templates')
 @login_required
+@replica_reads
 def templates_list():
     templates = Template.query.order_by(Template.created_at.desc()).all()
     return render_template('templates_list.html', templates=templates)
 
-@app.route('/documents/templates/create', methods=['GET', 'POST'])
+@bp.route('/documents/templates/create', methods=['GET', 'POST'])
 @login_required
 def template_create():
     form = TemplateForm()
     if form.validate_on_submit():
-        t = Template(name=form.name.data, content=form.content.data)
+        slug = form.slug.data or slugify(form.name.data)
+        if Template.query.filter_by(slug=slug).first():
+            flash(f'Another template already uses the slug "{slug}".', 'danger')
+            return render_template('template_form.html', form=form)
+        t = Template(name=form.name.data, slug=slug, content=form.content.data)
         db.session.add(t)
         db.session.commit()
+        invalidate_template_cache(slug)
         flash('Template saved.', 'success')
-        return redirect(url_for('templates_list'))
+        return redirect(url_for('main.templates_list'))
     return render_template('template_form.html', form=form)
 
-@app.route('/documents/templates/<int:template_id>/edit', methods=['GET', 'POST'])
+@bp.route('/documents/templates/<int:template_id>/edit', methods=['GET', 'POST'])
 @login_required
 def template_edit(template_id):
     t = Template.query.get_or_404(template_id)
     form = TemplateForm(obj=t)
     if form.validate_on_submit():
+        old_slug = t.slug
+        slug = form.slug.data or slugify(form.name.data)
+        if Template.query.filter(Template.slug == slug, Template.id != t.id).first():
+            flash(f'Another template already uses the slug "{slug}".', 'danger')
+            return render_template('template_form.html', form=form, template=t)
         t.name = form.name.data
+        t.slug = slug
         t.content = form.content.data
         db.session.commit()
+        invalidate_template_cache(old_slug)
+        invalidate_template_cache(slug)
         flash('Template updated.', 'success')
-        return redirect(url_for('templates_list'))
+        return redirect(url_for('main.templates_list'))
     return render_template('template_form.html', form=form, template=t)
 
 # --- Generate a document from a template and a case ---
-@app.route('/documents/generate', methods=['GET', 'POST'])
+@bp.route('/documents/generate', methods=['GET', 'POST'])
 @login_required
 def documents_generate():
     form = GenerateDocumentForm()
     # populate choices
     form.template_id.choices = [(t.id, t.name) for t in Template.query.order_by(Template.name).all()]
-    form.case_id.choices = [(c.id, c.style) for c in Case.query.order_by(Case.created_at.desc()).all()]
+    form.case_id.choices = case_choices(order_by=Case.created_at.desc())
 
     if form.validate_on_submit():
         template = Template.query.get_or_404(form.template_id.data)
         case = Case.query.get_or_404(form.case_id.data)
-        client = case.client if hasattr(case, 'client') else None
-        # Render template content using Jinja2
-        try:
-            rendered = render_template_string(template.content, case=case, client=client, user=current_user, today=datetime.utcnow().date(), now=datetime.utcnow())
-        except Exception as e:
-            flash(f'Error rendering template: {e}', 'danger')
-            return render_template('generate_document.html', form=form)
-
-        # Save file
-        base_name = secure_filename(form.filename.data)
-        if not base_name:
-            base_name = f"{template.name}_{case.id}_{int(datetime.utcnow().timestamp())}"
-        filename = f"{base_name}.html"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        with open(filepath, 'w', encoding='utf-8') as fh:
-            fh.write(rendered)
-
-        # Create Document record
-        doc = Document(
-            filename=filename,
-            filepath=os.path.relpath(filepath, start=os.path.dirname(__file__)),
-            client_id=client.id if client else None,
-            case_id=case.id,
-            uploaded_at=datetime.utcnow()
-        )
-        db.session.add(doc)
-        db.session.commit()
-        flash('Document generated and saved.', 'success')
-        return redirect(url_for('document_detail', doc_id=doc.id))
+        # rendering and the disk write happen in `flask worker`; the job page polls for the result
+        job = jobs.enqueue('generate_document', {
+            'template_id': template.id,
+            'case_id': case.id,
+            'filename': form.filename.data,
+        }, user_id=current_user.id, total=1)
+        flash('Document generation queued.', 'info')
+        return redirect(url_for('main.job_status', job_id=job.id))
 
     return render_template('generate_document.html', form=form)
 
-@app.route('/documents/<int:doc_id>/preview')
+@bp.route('/documents/<int:doc_id>/preview')
 @login_required
+@replica_reads
 def document_preview(doc_id):
     doc = Document.query.get_or_404(doc_id)
 
     # Ensure we have a filepath
     if not getattr(doc, 'filepath', None):
         flash('No file available to preview.', 'warning')
-        return redirect(url_for('document_detail', doc_id=doc.id))
+        return redirect(url_for('main.document_detail', doc_id=doc.id))
+
+    # The page only embeds document_file; the file itself is never read here
+    return render_template('document_preview.html', doc=doc)
 
+def _stored_document_path(doc):
+    """Absolute path of doc's file, or abort: 404 if missing, 403 if outside the upload folder."""
+    if not getattr(doc, 'filepath', None):
+        abort(404)
     # Determine upload base directory
-    base_folder = app.config.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads', 'documents')
+    base_folder = current_app.config.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads', 'documents')
     # Resolve absolute paths to prevent directory traversal
     file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), doc.filepath))
     base_abs = os.path.abspath(base_folder)
 
     # Security check: only allow files inside the upload folder
-    if not file_path.startswith(base_abs):
+    if os.path.commonpath([file_path, base_abs]) != base_abs:
         abort(403)
+    if not os.path.isfile(file_path):
+        abort(404)
+    return file_path
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as fh:
-            content = fh.read()
-    except Exception as e:
-        flash(f'Could not read file: {e}', 'danger')
-        return redirect(url_for('document_detail', doc_id=doc.id))
-
-    # Render the HTML content inside a page
-    return render_template('document_preview.html', doc=doc, content=content)
+@bp.route('/documents/<int:doc_id>/file')
+@login_required
+@replica_reads
+def document_file(doc_id):
+    """
+    Stream a stored document from the storage backend (utils/storage.py). The local
+    backend uses send_file(), which handles Range requests (206), ETag and Last-Modified
+    conditional requests (304) and hands the open file to the server's wsgi.file_wrapper,
+    or to the front-end proxy when USE_X_SENDFILE is on; the S3 backend redirects to a
+    presigned URL. The content is never buffered in Python. ?download=1 serves it as an attachment.
+    """
+    doc = Document.query.get_or_404(doc_id)
+    as_attachment = request.args.get('download', type=int) == 1
+    key = storage.document_key(doc)
+    if key is not None:
+        mimetype = mimetypes.guess_type(doc.filename or '')[0] or 'text/html'
+        try:
+            response = storage.get_storage().send(key, doc.filename, mimetype, as_attachment=as_attachment)
+        except FileNotFoundError:
+            abort(404)
+    else:
+        # legacy rows from before the blob store: a path relative to the app, local disk only
+        file_path = _stored_document_path(doc)
+        mimetype = mimetypes.guess_type(doc.filename or file_path)[0] or 'application/octet-stream'
+        response = send_file(
+            file_path,
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=doc.filename,
+            conditional=True,
+            etag=True,
+            max_age=0,
+        )
+    # Stored HTML is user/template content: never let it run script on our origin
+    response.headers['Content-Security-Policy'] = 'sandbox'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
 
 # --- Bulk document generation (paste this into app.py near other document routes) ---
 # Required imports (add these to the top of app.py if they aren't already present):
@@ -766,87 +927,30 @@ DEFAULT_TEMPLATES = {
 }
 
 
-@app.route('/documents/bulk_generate', methods=['GET', 'POST'])
+@bp.route('/documents/bulk_generate', methods=['GET', 'POST'])
 @login_required
 def documents_bulk_generate():
     """
-    Bulk generate documents for a selected case.
-    Page shows checkboxes for each doc type in DOC_TYPE_CHOICES and a case selector.
-    After generation, created Document records are saved and user is redirected to documents list.
+    Bulk generate documents for one or more selected cases.
+    Page shows checkboxes for each doc type in DOC_TYPE_CHOICES and a multi-select of cases;
+    every selected doc type is generated for every selected case (see services.batch_generation).
+    The work is queued as a background job and the user is sent to its status page.
     """
-    form = BulkGenerateForm()
+    form = BatchGenerateForm()
 
     # populate choices
-    form.case_id.choices = [(c.id, f"{c.style} ({c.case_number})") for c in Case.query.order_by(Case.created_at.desc()).all()]
+    form.case_ids.choices = case_choices(label=case_label_with_number, order_by=Case.created_at.desc())
     form.doc_types.choices = DOC_TYPE_CHOICES
 
     if form.validate_on_submit():
-        case = Case.query.get_or_404(form.case_id.data)
-        client = getattr(case, 'client', None)
         selected = form.doc_types.data or []
-
         if not selected:
             flash('Please select at least one document type to generate.', 'warning')
             return render_template('bulk_generate.html', form=form)
 
-        # ensure upload folder exists
-        base_upload_folder = app.config.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads', 'documents')
-        os.makedirs(base_upload_folder, exist_ok=True)
-
-        generated_docs = []
-        for doc_type in selected:
-            label = dict(DOC_TYPE_CHOICES).get(doc_type, doc_type)
-
-            # Try to use a Template whose name contains the label (case-insensitive). Fallback to default.
-            template_obj = None
-            try:
-                template_obj = Template.query.filter(Template.name.ilike(f"%{label}%")).first()
-            except Exception:
-                template_obj = None
-
-            content_src = template_obj.content if template_obj else DEFAULT_TEMPLATES.get(doc_type, f"<p>{label} for {{ case.style }}</p>")
-
-            # Render template content (Jinja2)
-            try:
-                rendered = render_template_string(content_src, case=case, client=client, user=current_user, today=datetime.utcnow().date(), now=datetime.utcnow())
-            except Exception as e:
-                flash(f"Error rendering {label}: {e}", 'danger')
-                continue
-
-            # Build filename and save file
-            safe_case = secure_filename(case.case_number or case.style) or f"case_{case.id}"
-            base_name = f"{safe_case}_{doc_type}_{int(datetime.utcnow().timestamp())}"
-            filename = f"{base_name}.html"
-            filepath = os.path.join(base_upload_folder, filename)
-            try:
-                with open(filepath, 'w', encoding='utf-8') as fh:
-                    fh.write(rendered)
-            except Exception as e:
-                flash(f"Failed to write file for {label}: {e}", 'danger')
-                continue
-
-            # Create Document DB record
-            relpath = os.path.relpath(filepath, start=os.path.dirname(__file__))
-            doc = Document(
-                filename=filename,
-                filepath=relpath,
-                client_id=client.id if client else None,
-                case_id=case.id,
-                uploaded_at=datetime.utcnow()
-            )
-            db.session.add(doc)
-            generated_docs.append(doc)
-
-        # commit all created documents
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            flash(f"Error saving documents to DB: {e}", 'danger')
-            return render_template('bulk_generate.html', form=form)
-
-        flash(f"Generated {len(generated_docs)} document(s).", 'success')
-        return redirect(url_for('documents_list'))
+        job = enqueue_batch_generation(form.case_ids.data, selected)
+        flash(f"Queued {job.total} document(s) for generation.", 'info')
+        return redirect(url_for('main.job_status', job_id=job.id))
 
     return render_template('bulk_generate.html', form=form)
 
@@ -862,8 +966,8 @@ DOC_TYPE_CHOICES.extend([
     ('letter_of_representation', 'Letter of Representation (Personal Injury)'),
 ])
 
-# Default templates for the new document types. The generator will try to find a Template row
-# by name that matches the label; otherwise it uses these fallbacks.
+# Default templates for the new document types. The generator uses a Template row whose slug
+# is the doc type if one exists; otherwise it uses these fallbacks.
 DEFAULT_TEMPLATES.update({
     'notice_of_appearance': """<!doctype html>
 <html><head><meta charset="utf-8"><title>Notice of Appearance - {{ case.case_number }}</title></head>
@@ -970,11 +1074,10 @@ def generate_and_save_document(case, doc_type_slug, label=None, template_obj=Non
     """
     Renders and saves a document for `case`.
     - doc_type_slug: key from DOC_TYPE_CHOICES / DEFAULT_TEMPLATES
-    - label: human label used to search for Template rows (optional)
+    - label: human label used in the fallback template (optional)
     - template_obj: optional Template instance to use (skip DB lookup)
     Returns Document instance (not committed) or None on error.
     """
-    from flask import render_template_string
     import os
     from werkzeug.utils import secure_filename
     from datetime import datetime
@@ -983,36 +1086,29 @@ def generate_and_save_document(case, doc_type_slug, label=None, template_obj=Non
 
     label = label or dict(DOC_TYPE_CHOICES).get(doc_type_slug, doc_type_slug.replace('_', ' ').title())
 
-    # prefer passed-in template_obj; otherwise try to find Template row by label match
-    if not template_obj:
-        try:
-            template_obj = Template.query.filter(Template.name.ilike(f"%{label}%")).first()
-        except Exception:
-            template_obj = None
-
-    content_src = template_obj.content if template_obj else DEFAULT_TEMPLATES.get(doc_type_slug, f"<p>{label} for {{ case.style }}</p>")
+    # prefer passed-in template_obj; otherwise resolve the Template row by slug
+    if template_obj:
+        content_src = template_obj.content
+    else:
+        content_src, template_obj = resolve_template(doc_type_slug, DEFAULT_TEMPLATES, fallback=f"<p>{label} for {{ case.style }}</p>")
 
     try:
-        rendered = render_template_string(content_src, case=case, client=client, user=current_user, today=datetime.utcnow().date(), now=datetime.utcnow())
+        rendered = render_cached(content_src, template_obj=template_obj, slug=doc_type_slug, case=case, client=client, user=current_user, today=datetime.utcnow().date(), now=datetime.utcnow())
     except Exception as e:
         # calling code should flash or log the error
         return None
 
-    # ensure upload folder exists
-    base_upload_folder = app.config.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads', 'documents')
-    os.makedirs(base_upload_folder, exist_ok=True)
-
     safe_case = secure_filename(case.case_number or case.style) or f"case_{case.id}"
     base_name = f"{safe_case}_{doc_type_slug}_{int(datetime.utcnow().timestamp())}"
     filename = f"{base_name}.html"
-    filepath = os.path.join(base_upload_folder, filename)
-    with open(filepath, 'w', encoding='utf-8') as fh:
-        fh.write(rendered)
+    # identical output is stored once (content-addressed, see utils/storage.py)
+    digest, key, size = storage.put_blob(rendered)
 
-    relpath = os.path.relpath(filepath, start=os.path.dirname(__file__))
     doc = Document(
         filename=filename,
-        filepath=relpath,
+        filepath=key,
+        content_hash=digest,
+        size=size,
         client_id=client.id if client else None,
         case_id=case.id,
         uploaded_at=datetime.utcnow()
@@ -1021,7 +1117,7 @@ def generate_and_save_document(case, doc_type_slug, label=None, template_obj=Non
     # Note: do not commit here; caller may batch-commit.
     return doc
 
-@app.route('/documents/generate_for_case/<int:case_id>', methods=['GET', 'POST'])
+@bp.route('/documents/generate_for_case/<int:case_id>', methods=['GET', 'POST'])
 @login_required
 def documents_generate_for_case(case_id):
     """
@@ -1054,27 +1150,15 @@ def documents_generate_for_case(case_id):
         if not selected:
             flash('Please select at least one document to generate.', 'warning')
             return render_template('generate_for_case.html', form=form, case=case)
-        generated = []
-        for slug in selected:
-            doc = generate_and_save_document(case, slug, current_user=current_user)
-            if doc:
-                generated.append(doc)
-            else:
-                flash(f'Error generating {slug}.', 'danger')
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Error saving generated documents: {e}', 'danger')
-            return render_template('generate_for_case.html', form=form, case=case)
-
-        flash(f'Generated {len(generated)} document(s).', 'success')
-        return redirect(url_for('document_detail', doc_id=generated[0].id) if len(generated)==1 else url_for('documents_list'))
+        job = enqueue_batch_generation([case.id], selected)
+        flash(f"Queued {job.total} document(s) for generation.", 'info')
+        return redirect(url_for('main.job_status', job_id=job.id))
 
     return render_template('generate_for_case.html', form=form, case=case)
 
-@app.route('/documents/preview_template/<template_slug>')
+@bp.route('/documents/preview_template/<template_slug>')
 @login_required
+@replica_reads
 def documents_preview_template(template_slug):
     """
     Preview the default or Template content for a slug. Optional case_id query param to render with data.
@@ -1083,18 +1167,124 @@ def documents_preview_template(template_slug):
     case = Case.query.get(case_id) if case_id else None
     client = getattr(case, 'client', None) if case else None
 
-    # try find Template by matching label text
     label = dict(DOC_TYPE_CHOICES).get(template_slug, template_slug)
-    template_obj = None
+    content_src, template_obj = resolve_template(template_slug, DEFAULT_TEMPLATES, fallback=f"<p>{label}</p>")
+    rendered = render_cached(content_src, template_obj=template_obj, slug=template_slug, case=case, client=client, user=current_user, today=datetime.utcnow().date(), now=datetime.utcnow())
+    return render_template('document_preview.html', doc={'filename': f'Preview-{template_slug}.html'}, content=rendered)
+
+# --- Background jobs (run by `flask worker`, see services/jobs.py) ---
+def enqueue_batch_generation(case_ids, doc_types):
+    return jobs.enqueue('generate_batch', {'case_ids': list(case_ids), 'doc_types': list(doc_types)},
+                        user_id=current_user.id, total=len(case_ids) * len(doc_types))
+
+@jobs.job_handler('generate_batch')
+def run_generate_batch_job(job, payload):
+    """
+    Generate payload['doc_types'] for payload['case_ids'] in chunks of BATCH_JOB_CHUNK cases,
+    checkpointing after each chunk; a retried job resumes after the last committed chunk.
+    """
+    case_ids, doc_types = payload['case_ids'], payload['doc_types']
+    user = db.session.get(User, job.user_id) if job.user_id else None
+    result = job.get_result() or {'document_ids': [], 'failures': []}
+    chunk = current_app.config.get('BATCH_JOB_CHUNK', 100)
+    # this worker's template lookups may predate an edit made just before the job was queued:
+    # read the current rows, once, so every chunk renders the same versions
+    invalidate_template_cache()
+    sources = resolve_sources(doc_types, DEFAULT_TEMPLATES, dict(DOC_TYPE_CHOICES))
+    for start in range(job.completed // len(doc_types), len(case_ids), chunk):
+        batch = generate_batch(case_ids[start:start + chunk], doc_types, defaults=DEFAULT_TEMPLATES,
+                               labels=dict(DOC_TYPE_CHOICES), user=user,
+                               workers=current_app.config.get('BATCH_RENDER_WORKERS'), sources=sources)
+        result['document_ids'].extend(batch.document_ids)
+        result['failures'].extend(f.to_dict() for f in batch.failures)
+        jobs.checkpoint(job, completed=min(start + chunk, len(case_ids)) * len(doc_types), result=result)
+
+@jobs.job_handler('generate_document')
+def run_generate_document_job(job, payload):
+    """Render one Template (by id) for one case, as submitted from /documents/generate."""
+    # the row itself, not the slug cache; render_cached keys on (id, updated_at), so an edit misses
+    template = db.session.get(Template, payload['template_id'])
+    case = db.session.get(Case, payload['case_id'])
+    if template is None or case is None:
+        raise jobs.PermanentJobError('The template or case no longer exists.')
+    user = db.session.get(User, job.user_id) if job.user_id else None
+    client = getattr(case, 'client', None)
     try:
-        template_obj = Template.query.filter(Template.name.ilike(f"%{label}%")).first()
-    except Exception:
-        template_obj = None
+        rendered = render_cached(template.content, template_obj=template, case=case, client=client, user=user, today=datetime.utcnow().date(), now=datetime.utcnow())
+    except Exception as e:
+        raise jobs.PermanentJobError(f'Error rendering template: {e}')
 
-    content_src = template_obj.content if template_obj else DEFAULT_TEMPLATES.get(template_slug, f"<p>{label}</p>")
-    from flask import render_template_string
-    rendered = render_template_string(content_src, case=case, client=client, user=current_user, today=datetime.utcnow().date(), now=datetime.utcnow())
-    return render_template('document_preview.html', doc={'filename': f'Preview-{template_slug}.html'}, content=rendered)
+    base_name = secure_filename(payload.get('filename') or '')
+    if not base_name:
+        base_name = f"{template.name}_{case.id}_{int(datetime.utcnow().timestamp())}"
+    filename = f"{base_name}.html"
+    digest, key, size = storage.put_blob(rendered)
+
+    doc = Document(
+        filename=filename,
+        filepath=key,
+        content_hash=digest,
+        size=size,
+        client_id=client.id if client else None,
+        case_id=case.id,
+        uploaded_at=datetime.utcnow()
+    )
+    db.session.add(doc)
+    db.session.flush()
+    jobs.checkpoint(job, completed=1, result={'document_ids': [doc.id], 'failures': []})
+
+def _visible_job_or_404(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.user_id != current_user.id and not current_user.is_superuser():
+        abort(404)
+    return job
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Progress page for a background job; polls job_status_api until the job finishes."""
+    job = _visible_job_or_404(job_id)
+    return render_template('job_status.html', job=job)
+
+@bp.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status_api(job_id):
+    job = _visible_job_or_404(job_id)
+    data = job.to_dict()
+    document_ids = data['result'].get('document_ids') or []
+    if job.is_finished:
+        data['redirect'] = url_for('main.document_detail', doc_id=document_ids[0]) if len(document_ids) == 1 else url_for('main.documents_list')
+    return jsonify(data)
+
+@bp.route('/api/jobs/batch', methods=['POST'])
+@login_required
+def job_submit_batch():
+    """
+    Queue batch generation: JSON body {"case_ids": [...], "doc_types": [...]}.
+    Responds 202 with the job and its status URL; 400 for unknown cases or doc types.
+    """
+    body = request.get_json(silent=True) or {}
+    case_ids, doc_types = body.get('case_ids'), body.get('doc_types')
+    if not isinstance(case_ids, list) or not isinstance(doc_types, list) or not case_ids or not doc_types:
+        return jsonify(error='case_ids and doc_types must be non-empty lists'), 400
+    # bool is an int subclass, and set() below needs hashable entries
+    if not all(isinstance(case_id, int) and not isinstance(case_id, bool) for case_id in case_ids):
+        return jsonify(error='case_ids must be integers'), 400
+    if not all(isinstance(doc_type, str) for doc_type in doc_types):
+        return jsonify(error='doc_types must be strings'), 400
+    unknown_types = sorted(set(doc_types) - set(dict(DOC_TYPE_CHOICES)))
+    if unknown_types:
+        return jsonify(error='unknown doc_types', doc_types=unknown_types), 400
+    found = {row.id for row in db.session.query(Case.id).filter(Case.id.in_(case_ids))}
+    missing = [case_id for case_id in case_ids if case_id not in found]
+    if missing:
+        return jsonify(error='unknown case_ids', case_ids=missing), 400
+    job = enqueue_batch_generation(case_ids, doc_types)
+    data = job.to_dict()
+    data['status_url'] = url_for('main.job_status_api', job_id=job.id)
+    return jsonify(data), 202
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
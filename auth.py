@@ -7,9 +7,9 @@ def team_required(f):
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated:
             flash("You must log in to access this page.", "danger")
-            return redirect(url_for("login"))
+            return redirect(url_for("main.login"))
         if current_user.role.value not in ["attorney", "manager", "staff", "superuser"]:
             flash("Access denied.", "danger")
-            return redirect(url_for("dashboard"))
+            return redirect(url_for("main.dashboard"))
         return f(*args, **kwargs)
     return decorated_function
\ No newline at end of file
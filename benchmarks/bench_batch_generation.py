@@ -0,0 +1,102 @@
+# benchmarks/bench_batch_generation.py
+# Throughput (documents/second) of batch generation: the old per-document loop vs. generate_batch().
+# Run: python benchmarks/bench_batch_generation.py [--cases 1000] [--workers N]
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix='cms_bench_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench.db')
+
+from app import app, generate_and_save_document, DEFAULT_TEMPLATES, DOC_TYPE_CHOICES  # noqa: E402
+from models import db, Case, Document  # noqa: E402
+from services.batch_generation import generate_batch  # noqa: E402
+
+DOC_TYPES = ['letter_to_client', 'notice_of_appearance', 'written_plea_not_guilty',
+             'petition_for_administration', 'letter_of_representation']
+
+
+def seed(n_cases):
+    case_types = ('personal_injury', 'criminal', 'estate', 'other')
+    for i in range(n_cases):
+        case = Case(
+            style=f"Plaintiff {i} v. Defendant {i}",
+            case_number=f"FX-{i:07d}",
+            case_type=case_types[i % 4],
+            judge=f"Judge {i % 37}",
+            filed_date=date(2020, 1, 1) + timedelta(days=i % 1500),
+            created_at=datetime(2020, 1, 1) + timedelta(minutes=i),
+        )
+        if case.case_type == 'criminal':
+            case.defendant = f"Defendant {i}"
+            case.charges = 'Count I'
+        elif case.case_type == 'personal_injury':
+            case.accident_location = 'Main St.'
+        db.session.add(case)
+    db.session.commit()
+    return [row.id for row in db.session.query(Case.id).order_by(Case.id)]
+
+
+def fresh_upload_folder():
+    folder = os.path.join(_tmpdir, 'uploads')
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    app.config['UPLOAD_FOLDER'] = folder
+    return folder
+
+
+def report(label, generated, elapsed, failures=0):
+    print(f"  {label:<26} {generated:6d} docs  {elapsed:7.2f} s  {generated / elapsed:8.0f} docs/s  failures {failures}")
+
+
+def run_serial(case_ids):
+    """The pre-batch path: load, render, write and add one Document at a time."""
+    fresh_upload_folder()
+    db.session.expunge_all()
+    t0 = time.perf_counter()
+    generated = 0
+    for case_id in case_ids:
+        case = db.session.get(Case, case_id)
+        for doc_type in DOC_TYPES:
+            if generate_and_save_document(case, doc_type):
+                generated += 1
+    db.session.commit()
+    report('serial loop', generated, time.perf_counter() - t0)
+
+
+def run_batch(case_ids, workers):
+    fresh_upload_folder()
+    db.session.expunge_all()
+    t0 = time.perf_counter()
+    result = generate_batch(case_ids, DOC_TYPES, defaults=DEFAULT_TEMPLATES, labels=dict(DOC_TYPE_CHOICES),
+                            workers=workers)
+    db.session.commit()
+    report(f'generate_batch workers={workers}', result.generated, time.perf_counter() - t0, len(result.failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch document generation throughput.')
+    parser.add_argument('--cases', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with app.test_request_context():
+        case_ids = seed(args.cases)
+        print(f"{args.cases} cases x {len(DOC_TYPES)} templates = {args.cases * len(DOC_TYPES)} documents")
+        run_serial(case_ids)
+        Document.query.delete()
+        run_batch(case_ids, workers=1)
+        Document.query.delete()
+        run_batch(case_ids, workers=args.workers)
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_bootstrap.py
+# Requests/second on /cases with the legacy per-request bootstrap hook vs. the one-shot bootstrap.
+# Run: python benchmarks/bench_bootstrap.py [--requests 500] [--cases 50]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# point the app at a throwaway database before it is imported
+_tmpdir = tempfile.mkdtemp(prefix='cms_bench_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench.db')
+
+from app import app  # noqa: E402
+from models import db, Case, User  # noqa: E402
+from services.bootstrap import create_superuser, SUPERUSER_EMAIL  # noqa: E402
+
+
+def legacy_setup():
+    # what app.setup() used to do on every request
+    db.create_all()
+    create_superuser()
+
+
+def seed(n_cases):
+    with app.app_context():
+        for i in range(n_cases):
+            db.session.add(Case(style=f"Bench Plaintiff {i} v. Defendant", case_number=f"BENCH-{i:06d}"))
+        db.session.commit()
+        return User.query.filter_by(email=SUPERUSER_EMAIL).first().id
+
+
+def measure(client, n_requests):
+    client.get('/cases')  # warm-up
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        resp = client.get('/cases')
+        assert resp.status_code == 200, resp.status_code
+    return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /cases with and without the per-request bootstrap hook.')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--cases', type=int, default=50)
+    args = parser.parse_args()
+
+    user_id = seed(args.cases)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+
+    hooks = app.before_request_funcs.setdefault(None, [])
+    hooks.insert(0, legacy_setup)
+    before = measure(client, args.requests)
+    hooks.remove(legacy_setup)
+    after = measure(client, args.requests)
+
+    print(f"/cases with {args.cases} cases, {args.requests} requests each")
+    print(f"  per-request bootstrap : {before:8.1f} req/s")
+    print(f"  one-shot bootstrap    : {after:8.1f} req/s  ({after / before:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_case_projection.py
+# Memory/latency of loading every Case column vs. the summary projection used by lists and pickers.
+# Run: python benchmarks/bench_case_projection.py [--cases 50000]
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix='cms_bench_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench.db')
+
+from app import app  # noqa: E402
+from models import db, Case  # noqa: E402
+from services.case_queries import case_summary_query, case_choices  # noqa: E402
+
+
+def seed(n_cases, batch=5000):
+    start = datetime(2020, 1, 1)
+    rows = []
+    for i in range(n_cases):
+        rows.append({
+            'style': f"Plaintiff {i} v. Defendant {i}",
+            'case_number': f"FX-{i:07d}",
+            'case_type': ('personal_injury', 'criminal', 'estate', 'other')[i % 4],
+            'judge': f"Judge {i % 37}",
+            'filed_date': date(2020, 1, 1) + timedelta(days=i % 1500),
+            'jurisdiction': 'z' * 50,
+            'file_notes': 'y' * 200,
+            'created_at': start + timedelta(minutes=i),
+        })
+        if len(rows) == batch:
+            db.session.execute(Case.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Case.__table__.insert(), rows)
+    db.session.commit()
+
+
+def measure(label, fn):
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} {elapsed * 1000:9.1f} ms  peak {peak / 1024 / 1024:8.1f} MiB  rows {len(result)}")
+    del result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full Case loads against the summary projection.')
+    parser.add_argument('--cases', type=int, default=50000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(args.cases)
+        print(f"{args.cases} cases, {len(Case.__table__.columns)} columns on the case table")
+        measure('Case.query.all()', lambda: Case.query.all())
+        measure('case_summary_query().all()', lambda: case_summary_query().all())
+        measure('case_choices()', lambda: case_choices())
+
+
+if __name__ == '__main__':
+    main()
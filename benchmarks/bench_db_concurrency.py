@@ -0,0 +1,111 @@
+# benchmarks/bench_db_concurrency.py
+# Read/write throughput of a SQLite database under simultaneous clients, with SQLAlchemy's
+# default engine vs. the engine options and pragmas of utils/database.py (WAL, synchronous=NORMAL,
+# busy_timeout, mmap). Each client thread loops for --seconds, doing a notes-timeline page read
+# or, with probability --write-ratio, a note insert committed on its own.
+# Run: python benchmarks/bench_db_concurrency.py [--clients 16] [--seconds 10] [--write-ratio 0.2]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from models import db, Note, User, UserRole  # noqa: E402
+from utils.database import (DEFAULT_POOL, DEFAULT_SQLITE_PRAGMAS, engine_options,  # noqa: E402
+                            register_sqlite_pragmas, sqlite_pragmas)
+
+TIMELINE = (select(Note.id, Note.note, Note.created_at, User.name)
+            .join(User, Note.user_id == User.id)
+            .order_by(Note.created_at.desc(), Note.id.desc())
+            .limit(50))
+
+
+def make_engine(path, tuned):
+    url = 'sqlite:///' + path
+    if not tuned:
+        return create_engine(url)
+    config = {**DEFAULT_SQLITE_PRAGMAS, **DEFAULT_POOL}
+    engine = create_engine(url, **engine_options(url, config))
+    register_sqlite_pragmas(engine, sqlite_pragmas(config))
+    return engine
+
+
+def seed(engine, notes):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        user_id = conn.execute(insert(User.__table__).values(
+            name='Bench', email='bench@example.com', password_hash='x', role=UserRole.staff,
+            is_active=True)).inserted_primary_key[0]
+        conn.execute(insert(Note.__table__), [{'user_id': user_id, 'note': f'Seed note {i}'} for i in range(notes)])
+    return user_id
+
+
+def client_loop(engine, user_id, deadline, write_ratio, seed_value, stats, lock):
+    rng = random.Random(seed_value)
+    reads = writes = errors = 0
+    latencies = []
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                with engine.begin() as conn:
+                    conn.execute(insert(Note.__table__).values(user_id=user_id, note='Concurrent note'))
+                writes += 1
+            else:
+                with engine.connect() as conn:
+                    conn.execute(TIMELINE).all()
+                reads += 1
+        except OperationalError:
+            errors += 1  # "database is locked"
+        latencies.append(time.perf_counter() - t0)
+    with lock:
+        stats['reads'] += reads
+        stats['writes'] += writes
+        stats['errors'] += errors
+        stats['latencies'].extend(latencies)
+
+
+def run(label, tuned, args):
+    path = os.path.join(tempfile.mkdtemp(prefix='cms_bench_'), 'bench.db')
+    engine = make_engine(path, tuned)
+    user_id = seed(engine, args.notes)
+    stats = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=client_loop, args=(engine, user_id, deadline, args.write_ratio, i, stats, lock))
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+
+    latencies = sorted(stats['latencies'])
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0
+    print(f"{label:<8} reads/s {stats['reads'] / elapsed:8.1f}   writes/s {stats['writes'] / elapsed:7.1f}   "
+          f"p95 {p95:7.1f} ms   locked errors {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite throughput with simultaneous clients, default vs tuned engine.')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--notes', type=int, default=5000, help='notes seeded before the run')
+    args = parser.parse_args()
+    print(f"{args.clients} clients, {args.seconds:g}s each, {args.write_ratio:.0%} writes")
+    run('default', False, args)
+    run('tuned', True, args)
+
+
+if __name__ == '__main__':
+    main()
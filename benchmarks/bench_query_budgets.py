@@ -0,0 +1,94 @@
+# benchmarks/bench_query_budgets.py
+# Query counts of the list/detail views against VIEW_QUERY_BUDGETS (utils/query_count.py),
+# at a small and a large data size: an eager-loaded view costs the same number of queries at both.
+# Run: python benchmarks/bench_query_budgets.py [--rows 200]
+# Exits non-zero if a view goes over its budget.
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix='cms_bench_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'bench.db')
+
+from app import app  # noqa: E402
+from models import (db, User, Case, CaseParty, CasePartyRole, PersonEntity, Note, Document,  # noqa: E402
+                    CalendarEvent, Client)
+from utils.query_count import QueryCounter, QueryBudgetExceeded, VIEW_QUERY_BUDGETS  # noqa: E402
+
+VIEWS = [
+    ('cases_list', lambda case_id: '/cases'),
+    ('case_detail', lambda case_id: f'/cases/{case_id}'),
+    ('documents_list', lambda case_id: '/documents'),
+    ('events_list', lambda case_id: '/calendar/events'),
+    ('notes_list', lambda case_id: '/notes'),
+]
+
+
+def seed(rows, user_id, offset):
+    """One case with `rows` parties/notes/documents/events, plus `rows` more cases for the lists."""
+    start = datetime(2024, 1, 1)
+    client = Client(name=f'Client {offset}', email=f'client{offset}@example.com')
+    db.session.add(client)
+    cases = [Case(style=f'Plaintiff {offset + i} v. Defendant', case_number=f'QB-{offset + i:07d}',
+                  client_name=client.name, assigned_attorney='A. Attorney') for i in range(rows)]
+    db.session.add_all(cases)
+    db.session.flush()
+    case = cases[0]
+    for i in range(rows):
+        person = PersonEntity(full_name=f'Person {offset + i}')
+        db.session.add(CaseParty(case=case, person_entity=person, role=CasePartyRole.WITNESS))
+        db.session.add(Note(case_id=case.id, user_id=user_id, note=f'Note {i}'))
+        doc = Document(filename=f'doc_{offset + i}.html', case_id=cases[i].id, client=client)
+        db.session.add(doc)
+        db.session.add(CalendarEvent(name=f'Event {i}', case_id=cases[i].id, client=client, document=doc,
+                                     user_id=user_id, event_datetime=start + timedelta(hours=i)))
+    db.session.commit()
+    return case.id
+
+
+def run_views(client, case_id):
+    counts = {}
+    for endpoint, url in VIEWS:
+        with app.app_context(), QueryCounter(db.engine) as counter:
+            t0 = time.perf_counter()
+            response = client.get(url(case_id))
+            elapsed = time.perf_counter() - t0
+        counts[endpoint] = (response.status_code, counter.statements, elapsed)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check list/detail views against their query budgets.')
+    parser.add_argument('--rows', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user_id = User.query.first().id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+    over = []
+    for label, rows, offset in (('small', 2, 0), ('large', args.rows, 100000)):
+        with app.app_context():
+            case_id = seed(rows, user_id, offset)
+        print(f"{label}: case {case_id} with {rows} parties/notes/documents/events")
+        for endpoint, (status, statements, elapsed) in run_views(client, case_id).items():
+            budget = VIEW_QUERY_BUDGETS[endpoint]
+            print(f"  {endpoint:<16} HTTP {status}  {len(statements):3d} queries (budget {budget})  {elapsed * 1000:7.1f} ms")
+            if len(statements) > budget:
+                over.append(QueryBudgetExceeded(budget, statements, f"{endpoint} ({label})"))
+
+    for error in over:
+        print(error, file=sys.stderr)
+    sys.exit(1 if over else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import db, Case, Client, User
 from forms import CaseForm
+from services.pagination import keyset_paginate, clamp_page_size, InvalidCursor
+from services.case_queries import case_summary_query
 
 cases_bp = Blueprint('cases_bp', __name__, template_folder='templates')
 
@@ -9,11 +11,17 @@ cases_bp = Blueprint('cases_bp', __name__, template_folder='templates')
 @login_required
 def cases_list():
     q = request.args.get('q', '')
+    page_size = clamp_page_size(request.args.get('page_size'))
+    query = case_summary_query()
     if q:
-        cases = Case.query.filter(Case.style.ilike(f'%{q}%')).order_by(Case.created_at.desc()).all()
-    else:
-        cases = Case.query.order_by(Case.created_at.desc()).all()
-    return render_template('cases_list.html', cases=cases, q=q)
+        query = query.filter(Case.style.ilike(f'%{q}%'))
+    try:
+        page = keyset_paginate(query, [Case.created_at, Case.id],
+                               after=request.args.get('after'), before=request.args.get('before'),
+                               page_size=page_size)
+    except InvalidCursor:
+        page = keyset_paginate(query, [Case.created_at, Case.id], page_size=page_size)
+    return render_template('cases_list.html', cases=page.items, page=page, q=q, search=q, page_size=page_size)
 
 @cases_bp.route('/cases/new', methods=['GET', 'POST'])
 @login_required
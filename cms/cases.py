@@ -1,10 +1,6 @@
-from flask import Blueprint, render_template
-from flask_login import login_required
+from flask import Blueprint
 
 cases_bp = Blueprint('cases_bp', __name__, template_folder='templates')
 
-@cases_bp.route('/cases')
-@login_required
-def cases_list():
-    # placeholder implementation - replace with your real view
-    return render_template('cases_list.html', cases=[])
\ No newline at end of file
+# The paginated /cases list is served by app.cases_list; a placeholder route here
+# would shadow it because this blueprint is registered first.
@@ -2,6 +2,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import db, CustomField
+from services.custom_fields import invalidate_custom_form_cache
 from wtforms import Form, StringField, SelectField, TextAreaField, BooleanField, IntegerField
 from wtforms.validators import DataRequired, Optional
 
@@ -43,6 +44,7 @@ def create_custom_field():
         )
         db.session.add(cf)
         db.session.commit()
+        invalidate_custom_form_cache(cf.target)
         flash('Custom field created.', 'success')
         return redirect(url_for('custom_fields_admin.list_custom_fields'))
     return render_template('admin_custom_field_form.html', form=form)
\ No newline at end of file
@@ -1,13 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
-import os
-from werkzeug.utils import secure_filename
-from datetime import datetime
 
-from models import db, Case, Client, Document, Template
-from forms import BulkGenerateForm
-
-from flask import render_template_string
+from models import db, Case
+from forms import BatchGenerateForm
+from services.case_queries import case_choices, case_label_with_number
+from services.batch_generation import generate_batch
 
 documents_bulk_bp = Blueprint('documents_bulk_bp', __name__)
 
@@ -23,7 +20,7 @@ DOC_TYPE_CHOICES = [
     ('billing', 'Billing'),
 ]
 
-# Default fallback templates (simple HTML) used if no Template by name is found
+# Default fallback templates (simple HTML) used if no Template with the doc-type slug exists
 DEFAULT_TEMPLATES = {
     'letter_to_client': """<!doctype html><html><body>
 <h1>Letter to Client - {{ case.style }}</h1>
@@ -86,76 +83,32 @@ DEFAULT_TEMPLATES = {
 @login_required
 def documents_bulk_generate():
     """
-    Bulk generate documents for a selected case.
+    Bulk generate documents for one or more selected cases.
     URL (after registering blueprint with url_prefix='/documents'):
       /documents/bulk_generate
     """
-    form = BulkGenerateForm()
+    form = BatchGenerateForm()
 
     # populate case choices
-    form.case_id.choices = [(c.id, f"{c.style} ({c.case_number})") for c in Case.query.order_by(Case.created_at.desc()).all()]
+    form.case_ids.choices = case_choices(label=case_label_with_number, order_by=Case.created_at.desc())
     # set doc type choices for checkbox list
     form.doc_types.choices = DOC_TYPE_CHOICES
 
     if form.validate_on_submit():
-        case = Case.query.get_or_404(form.case_id.data)
-        client = getattr(case, 'client', None)
         selected_types = form.doc_types.data or []
 
         if not selected_types:
             flash('Please select at least one document type to generate.', 'warning')
             return render_template('bulk_generate.html', form=form)
 
-        # Ensure upload folder exists
-        base_upload_folder = current_app.config.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), '..', 'uploads', 'documents')
-        os.makedirs(base_upload_folder, exist_ok=True)
-
-        generated = []
-        for doc_type in selected_types:
-            label = dict(DOC_TYPE_CHOICES).get(doc_type, doc_type)
-
-            # Try to find a Template with a name that matches the intended label (case-insensitive)
-            template_obj = None
-            try:
-                template_obj = Template.query.filter(Template.name.ilike(f"%{label}%")).first()
-            except Exception:
-                template_obj = None
-
-            if template_obj:
-                content_src = template_obj.content
-            else:
-                content_src = DEFAULT_TEMPLATES.get(doc_type, f"<p>{label} for {{ case.style }}</p>")
-
-            # Render using Jinja2 (flask render_template_string is fine here)
-            try:
-                rendered = render_template_string(content_src, case=case, client=client, user=current_user, today=datetime.utcnow().date(), now=datetime.utcnow())
-            except Exception as e:
-                flash(f"Error rendering {label}: {e}", 'danger')
-                continue
-
-            # Create filename
-            safe_case = secure_filename(case.case_number or case.style) or f"case_{case.id}"
-            base_name = f"{safe_case}_{doc_type}_{int(datetime.utcnow().timestamp())}"
-            filename = f"{base_name}.html"
-            filepath = os.path.join(base_upload_folder, filename)
-            try:
-                with open(filepath, 'w', encoding='utf-8') as fh:
-                    fh.write(rendered)
-            except Exception as e:
-                flash(f"Failed to write file for {label}: {e}", 'danger')
-                continue
-
-            # create Document DB record
-            relpath = os.path.relpath(filepath, start=os.path.dirname(__file__))
-            doc = Document(
-                filename=filename,
-                filepath=relpath,
-                client_id=client.id if client else None,
-                case_id=case.id,
-                uploaded_at=datetime.utcnow()
-            )
-            db.session.add(doc)
-            generated.append(doc)
+        labels = dict(DOC_TYPE_CHOICES)
+        result = generate_batch(form.case_ids.data, selected_types, defaults=DEFAULT_TEMPLATES, labels=labels,
+                                user=current_user, workers=current_app.config.get('BATCH_RENDER_WORKERS'))
+        for failure in result.failures[:10]:
+            what = labels.get(failure.doc_type, failure.doc_type) or 'case'
+            flash(f"Case {failure.case_id} ({what}): {failure.error}", 'danger')
+        if len(result.failures) > 10:
+            flash(f"...and {len(result.failures) - 10} more failure(s).", 'danger')
 
         # commit all generated documents
         try:
@@ -165,8 +118,8 @@ def documents_bulk_generate():
             flash(f"Error saving documents to DB: {e}", 'danger')
             return render_template('bulk_generate.html', form=form)
 
-        flash(f"Generated {len(generated)} document(s).", 'success')
+        flash(f"Generated {result.generated} document(s).", 'success')
         # redirect to documents home (documents blueprint is named documents_bp)
         return redirect(url_for('documents_bp.documents_list'))
 
-    return render_template('bulk_generate.html', form=form)
\ No newline at end of file
+    return render_template('bulk_generate.html', form=form)
@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, DateField, SelectField, PasswordField, DateTimeField, SubmitField, FileField, TextAreaField, BooleanField, EmailField, FieldList, FormField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, Regexp
 import datetime
 now = datetime.datetime.utcnow()
 
@@ -861,6 +861,7 @@ class CalendarEventForm(FlaskForm):
 # -----------------------
 class TemplateForm(FlaskForm):
     name = StringField('Template Name', validators=[DataRequired(), Length(max=200)])
+    slug = StringField('Slug', validators=[Optional(), Length(max=100), Regexp(r'^[a-z0-9_]+$', message='Use lowercase letters, digits and underscores.')])
     content = TextAreaField('Template Content (Jinja2)', validators=[DataRequired()])
     submit = SubmitField('Save Template')
 
@@ -879,4 +880,9 @@ class MultiCheckboxField(SelectMultipleField):
 class BulkGenerateForm(FlaskForm):
     case_id = SelectField('Case', coerce=int, validators=[DataRequired()])
     doc_types = MultiCheckboxField('Documents to Generate', choices=[])
+    submit = SubmitField('Generate Selected Documents')
+
+class BatchGenerateForm(FlaskForm):
+    case_ids = SelectMultipleField('Cases', coerce=int, validators=[DataRequired()])
+    doc_types = MultiCheckboxField('Documents to Generate', choices=[])
     submit = SubmitField('Generate Selected Documents')
\ No newline at end of file
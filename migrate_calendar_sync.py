@@ -0,0 +1,65 @@
+# Schema migration for the ICS feeds: add CalendarEvent.created_at/updated_at and
+# User.calendar_feed_version, create the calendar_event_tombstone table and the CalendarEvent
+# indexes.
+# Run: python migrate_calendar_sync.py [--dry-run]
+# Existing events get the migration time as created_at/updated_at, so sync tokens issued
+# before it see them once more (harmless: clients update events by UID). Feed URLs issued
+# before calendar_feed_version existed no longer validate; users copy the new link from the
+# calendar or case page. Safe to re-run.
+import os
+import sys
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+# startup bootstrap reads "user", which lacks calendar_feed_version until this has run
+os.environ['CMS_AUTO_BOOTSTRAP'] = '0'
+
+from app import app, db  # noqa: E402
+from models import CalendarEvent, CalendarEventTombstone  # noqa: E402
+
+def add_timestamp_columns(conn):
+    existing = {c["name"] for c in inspect(conn).get_columns("calendar_event")}
+    added = []
+    for column in ("created_at", "updated_at"):
+        if column not in existing:
+            conn.execute(text(f'ALTER TABLE "calendar_event" ADD COLUMN {column} TIMESTAMP'))
+            added.append(column)
+    return added
+
+def add_feed_version_column(conn):
+    existing = {c["name"] for c in inspect(conn).get_columns("user")}
+    if "calendar_feed_version" in existing:
+        return False
+    conn.execute(text('ALTER TABLE "user" ADD COLUMN calendar_feed_version INTEGER NOT NULL DEFAULT 0'))
+    return True
+
+def backfill_timestamps(conn, now):
+    result = conn.execute(text('UPDATE "calendar_event" SET created_at = COALESCE(created_at, :now), '
+                               'updated_at = COALESCE(updated_at, :now) '
+                               'WHERE created_at IS NULL OR updated_at IS NULL'), {"now": now})
+    return result.rowcount
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv[1:]
+    with app.app_context():
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            for column in add_timestamp_columns(conn):
+                print(f'Added column "calendar_event".{column}')
+            if add_feed_version_column(conn):
+                print('Added column "user".calendar_feed_version')
+            print(f"Backfilled timestamps of {backfill_timestamps(conn, datetime.utcnow())} event(s)")
+            if dry_run:
+                trans.rollback()
+                print("Dry run: nothing written")
+            else:
+                CalendarEventTombstone.__table__.create(conn, checkfirst=True)
+                for index in CalendarEvent.__table__.indexes:
+                    index.create(conn, checkfirst=True)
+                trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,57 @@
+# Data migration: fill in Case.created_at where it is NULL and make the column NOT NULL.
+# Run: python migrate_case_created_at.py [--dry-run]
+# The /cases list pages by (created_at, id), and a keyset comparison never matches NULL, so
+# those cases would not be listed. A case without created_at gets its updated_at, else the
+# migration time. On SQLite the NOT NULL constraint needs a table rebuild (Alembic batch mode);
+# on PostgreSQL it is one ALTER COLUMN ... SET NOT NULL. Safe to re-run.
+import os
+import sys
+from datetime import datetime
+from sqlalchemy import DateTime, inspect, text
+
+# startup bootstrap is not needed here and checks a schema this script may run before
+os.environ['CMS_AUTO_BOOTSTRAP'] = '0'
+
+from app import app, db  # noqa: E402
+
+def backfill_created_at(conn, now):
+    result = conn.execute(text('UPDATE "case" SET created_at = COALESCE(updated_at, :now) '
+                               'WHERE created_at IS NULL'), {"now": now})
+    return result.rowcount
+
+def created_at_nullable(conn):
+    return next(c["nullable"] for c in inspect(conn).get_columns("case") if c["name"] == "created_at")
+
+def set_not_null(conn):
+    """Add the NOT NULL constraint; returns False if the column already has it."""
+    if not created_at_nullable(conn):
+        return False
+    if conn.dialect.name == "sqlite":
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+        operations = Operations(MigrationContext.configure(conn))
+        with operations.batch_alter_table("case", recreate="always") as batch:
+            batch.alter_column("created_at", existing_type=DateTime(), nullable=False)
+    else:
+        conn.execute(text('ALTER TABLE "case" ALTER COLUMN created_at SET NOT NULL'))
+    return True
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv[1:]
+    with app.app_context():
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            print(f"Backfilled created_at of {backfill_created_at(conn, datetime.utcnow())} case(s)")
+            if dry_run:
+                trans.rollback()
+                print("Dry run: nothing written")
+            else:
+                if set_not_null(conn):
+                    print('"case".created_at is now NOT NULL')
+                trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+        finally:
+            conn.close()
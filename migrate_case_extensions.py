@@ -0,0 +1,62 @@
+# Data migration: move practice-area columns from the wide "case" table into the
+# 1:1 extension tables (case_pi, case_criminal, case_estate, case_other).
+# Run: python migrate_case_extensions.py [--drop-columns]
+#   --drop-columns  afterwards drop the moved columns from "case" (SQLite >= 3.35 or PostgreSQL)
+# Safe to re-run: cases that already have an extension row are skipped.
+import os
+import sys
+from sqlalchemy import MetaData, Table, Boolean, and_, or_, select, inspect, text
+
+# no startup bootstrap: it checks a schema this script runs before (README, Upgrading)
+os.environ['CMS_AUTO_BOOTSTRAP'] = '0'
+
+from app import app, db  # noqa: E402
+from models import PRACTICE_AREA_EXTENSIONS  # noqa: E402
+
+def legacy_case_table(conn):
+    return Table("case", MetaData(), autoload_with=conn)
+
+def has_data(legacy_col):
+    # Boolean checklist columns were written as False by default, so only True counts as data
+    if isinstance(legacy_col.type, Boolean):
+        return legacy_col == True  # noqa: E712
+    return legacy_col.isnot(None)
+
+def copy_extension(conn, legacy, ext_cls):
+    ext_table = ext_cls.__table__
+    cols = [c.key for c in ext_table.columns if c.key != "case_id" and c.key in legacy.c]
+    if not cols:
+        return 0
+    already = select(ext_table.c.case_id)
+    src = (
+        select(legacy.c.id, *[legacy.c[c] for c in cols])
+        .where(and_(or_(*[has_data(legacy.c[c]) for c in cols]), legacy.c.id.not_in(already)))
+    )
+    result = conn.execute(ext_table.insert().from_select(["case_id"] + cols, src))
+    return result.rowcount
+
+def drop_moved_columns(conn, legacy):
+    moved = set()
+    for ext_cls in PRACTICE_AREA_EXTENSIONS.values():
+        moved.update(c.key for c in ext_cls.__table__.columns if c.key != "case_id")
+    dropped = []
+    for col in legacy.columns:
+        if col.key in moved:
+            conn.execute(text(f'ALTER TABLE "case" DROP COLUMN "{col.key}"'))
+            dropped.append(col.key)
+    return dropped
+
+if __name__ == "__main__":
+    drop = "--drop-columns" in sys.argv[1:]
+    with app.app_context():
+        db.create_all()  # make sure the extension tables exist
+        with db.engine.begin() as conn:
+            legacy = legacy_case_table(conn)
+            for rel_name, ext_cls in PRACTICE_AREA_EXTENSIONS.items():
+                copied = copy_extension(conn, legacy, ext_cls)
+                print(f"{ext_cls.__tablename__}: copied {copied} case(s)")
+            if drop:
+                dropped = drop_moved_columns(conn, legacy)
+                print(f"Dropped {len(dropped)} column(s) from \"case\"")
+        remaining = len(inspect(db.engine).get_columns("case"))
+        print(f"\"case\" now has {remaining} column(s)")
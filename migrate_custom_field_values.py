@@ -0,0 +1,70 @@
+# Data migration: remove duplicate custom field values, then add the unique indexes
+# uq_custom_field_value_case / uq_custom_field_value_client that save_custom_field_values'
+# ON CONFLICT upsert needs (the app refuses to start without them).
+# Run: python migrate_custom_field_values.py [--dry-run]
+# Per (field_id, case_id) and (field_id, client_id) the most recently updated row is kept (the
+# value the edit form showed last); the others are deleted. --dry-run lists what would be
+# deleted and the DDL without writing anything. Safe to re-run.
+import os
+import sys
+from sqlalchemy import func, inspect, select
+from sqlalchemy.schema import CreateIndex
+
+# the startup index check would stop the import below; this script is how that check is satisfied
+os.environ['CMS_AUTO_BOOTSTRAP'] = '0'
+
+from app import app, db  # noqa: E402
+from models import CustomFieldValue  # noqa: E402
+
+UNIQUE_INDEXES = ('uq_custom_field_value_case', 'uq_custom_field_value_client')
+
+def duplicate_ids(conn, owner_col):
+    """Ids of every row but the newest in each (field_id, owner) group with more than one row."""
+    table = CustomFieldValue.__table__
+    owner = table.c[owner_col]
+    groups = (select(table.c.field_id, owner)
+              .where(owner.isnot(None))
+              .group_by(table.c.field_id, owner)
+              .having(func.count() > 1)
+              .subquery())
+    rows = conn.execute(
+        select(table.c.id, table.c.field_id, owner)
+        .join(groups, (table.c.field_id == groups.c.field_id) & (owner == groups.c[owner_col]))
+        .order_by(table.c.field_id, owner, table.c.updated_at.desc(), table.c.id.desc())
+    ).fetchall()
+    doomed, seen = [], set()
+    for row in rows:
+        key = (row.field_id, row[2])
+        if key in seen:
+            doomed.append(row.id)
+        seen.add(key)
+    return doomed
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv[1:]
+    table = CustomFieldValue.__table__
+    with app.app_context():
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            for owner_col in ("case_id", "client_id"):
+                doomed = duplicate_ids(conn, owner_col)
+                print(f"{owner_col}: {len(doomed)} duplicate value(s) to delete")
+                if doomed:
+                    conn.execute(table.delete().where(table.c.id.in_(doomed)))
+            existing = {ix["name"] for ix in inspect(conn).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in UNIQUE_INDEXES and index.name not in existing:
+                    print(f"{str(CreateIndex(index).compile(dialect=conn.dialect)).strip()};")
+                    index.create(conn)
+            if dry_run:
+                trans.rollback()
+                print("Dry run: nothing written")
+            else:
+                trans.commit()
+                print("Done")
+        except Exception:
+            trans.rollback()
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,96 @@
+# Data migration: move existing document files into the content-addressed blob store on the
+# configured storage backend (STORAGE_BACKEND, see utils/storage.py), fill in
+# Document.content_hash/size and point Document.filepath at the storage key.
+# Run: python migrate_document_blobs.py [--dry-run]
+# Files with identical bytes end up as one blob; the now-redundant local copies are removed.
+# Also moves blobs written by earlier versions (filepath 'uploads/documents/blobs/...') onto
+# the backend, so switching STORAGE_BACKEND to 's3' is: configure, re-run this script.
+# Safe to re-run: documents whose filepath already is their storage key are skipped.
+import hashlib
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# startup bootstrap would query columns this script may still have to add
+os.environ['CMS_AUTO_BOOTSTRAP'] = '0'
+
+from app import app, db  # noqa: E402
+from models import Document  # noqa: E402
+from utils.storage import LocalStorage, blob_key, get_storage, get_upload_folder, put_blob  # noqa: E402
+
+CHUNK = 1024 * 1024
+
+def add_columns(conn):
+    existing = {c["name"] for c in inspect(conn).get_columns("document")}
+    added = []
+    for col, typ in (("content_hash", "VARCHAR(64)"), ("size", "INTEGER")):
+        if col not in existing:
+            conn.execute(text(f'ALTER TABLE "document" ADD COLUMN {col} {typ}'))
+            added.append(col)
+    return added
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def migrate(conn, dry_run=False):
+    backend = get_storage()
+    base = os.path.abspath(get_upload_folder())
+    stored, seen, copied_from = 0, set(), set()
+    missing = 0
+    rows = conn.execute(text('SELECT id, filepath, content_hash FROM "document" WHERE filepath IS NOT NULL')).fetchall()
+    rows = [row for row in rows if not row.content_hash or row.filepath != blob_key(row.content_hash)]
+    for row in rows:
+        src = os.path.abspath(os.path.join(app.root_path, row.filepath))
+        local = os.path.commonpath([src, base]) == base and os.path.isfile(src)
+        if row.content_hash and (row.content_hash in seen or backend.exists(blob_key(row.content_hash))):
+            # already on the backend (e.g. an earlier blob under the same local root); just re-point the row
+            digest, size = row.content_hash, None
+        elif not local:
+            missing += 1
+            continue
+        elif dry_run:
+            digest, size = file_digest(src), None
+            if digest not in seen and not backend.exists(blob_key(digest)):
+                stored += 1
+        else:
+            with open(src, "rb") as fh:
+                digest, _, size = put_blob(fh, backend=backend)
+            if digest not in seen:
+                stored += 1
+        seen.add(digest)
+        if dry_run:
+            continue
+        key = blob_key(digest)
+        conn.execute(
+            text('UPDATE "document" SET content_hash = :h, size = COALESCE(:s, size), filepath = :fp WHERE id = :id'),
+            {"h": digest, "s": size, "fp": key, "id": row.id},
+        )
+        # with the local backend an old blob may already sit at the key's path
+        if local and not (isinstance(backend, LocalStorage) and backend.path(key) == src):
+            copied_from.add((src, row.filepath))
+    # old copies go only once no document points at them any more
+    removed = 0
+    for src, relpath in copied_from:
+        if not conn.execute(text('SELECT 1 FROM "document" WHERE filepath = :fp'), {"fp": relpath}).first():
+            os.remove(src)
+            removed += 1
+    return len(rows) - missing, stored, removed, missing
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv[1:]
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for col in add_columns(conn):
+                print(f'Added column "document".{col}')
+        with db.engine.begin() as conn:
+            documents, stored, removed, missing = migrate(conn, dry_run=dry_run)
+        for index in Document.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        print(f"{documents} document(s) -> {stored} new blob(s) on the '{app.config['STORAGE_BACKEND']}' backend; "
+              f"removed {removed} old file(s); skipped {missing} missing or outside the upload folder")
+        if dry_run:
+            print("Dry run: no files moved and no rows updated")
@@ -0,0 +1,52 @@
+# Schema migration: create every index declared in models.py that the database lacks
+# (foreign keys and sort columns; `flask check-indexes` lists what the models still miss).
+# Run: python migrate_indexes.py [--dry-run]
+# --dry-run prints the CREATE INDEX statements for review without running them. Safe to re-run:
+# existing indexes are skipped. On a large PostgreSQL table consider running the printed
+# statement by hand as CREATE INDEX CONCURRENTLY instead.
+import os
+import sys
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+
+# the startup index check fails on exactly the databases this script is for
+os.environ['CMS_AUTO_BOOTSTRAP'] = '0'
+
+from app import app, db  # noqa: E402
+
+def missing_indexes(conn):
+    """(index, DDL) for model indexes not present in the database, in table dependency order."""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue  # created with all its indexes by db.create_all()
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                missing.append((index, str(CreateIndex(index).compile(dialect=conn.dialect)).strip()))
+    return missing
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv[1:]
+    with app.app_context():
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            missing = missing_indexes(conn)
+            for index, ddl in missing:
+                print(f"{ddl};")
+                if not dry_run:
+                    index.create(conn)
+            if dry_run:
+                trans.rollback()
+                print(f"Dry run: {len(missing)} index(es) to create, nothing written")
+            else:
+                trans.commit()
+                print(f"Created {len(missing)} index(es)")
+        except Exception:
+            trans.rollback()
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,61 @@
+# Data migration: add Template.slug, backfill it from template names and add its unique index.
+# Run: python migrate_template_slugs.py [--dry-run]
+# A name containing a doc-type label (e.g. "Notice of Appearance (Criminal)") gets that doc
+# type's key, which is what the old ilike(name) lookup would have matched; any other name
+# is slugified. Safe to re-run: templates that already have a slug are left alone.
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# skip the startup bootstrap: it checks a schema this script runs before
+os.environ['CMS_AUTO_BOOTSTRAP'] = '0'
+
+from app import app, db, DOC_TYPE_CHOICES  # noqa: E402
+from models import Template  # noqa: E402
+from services.template_resolver import slug_for_name, invalidate_template_cache  # noqa: E402
+
+def add_slug_column(conn):
+    existing = {c["name"] for c in inspect(conn).get_columns("template")}
+    if "slug" not in existing:
+        conn.execute(text('ALTER TABLE "template" ADD COLUMN slug VARCHAR(100)'))
+        return True
+    return False
+
+def backfill_slugs(conn):
+    taken = {row.slug for row in conn.execute(text('SELECT slug FROM "template" WHERE slug IS NOT NULL'))}
+    # oldest first, so the template that used to win the ilike lookup keeps the doc-type slug
+    rows = conn.execute(text('SELECT id, name FROM "template" WHERE slug IS NULL ORDER BY id')).fetchall()
+    assigned = []
+    for row in rows:
+        base = slug_for_name(row.name, DOC_TYPE_CHOICES) or f"template_{row.id}"
+        slug, n = base, 2
+        while slug in taken:
+            slug, n = f"{base}_{n}", n + 1
+        taken.add(slug)
+        conn.execute(text('UPDATE "template" SET slug = :slug WHERE id = :id'), {"slug": slug, "id": row.id})
+        assigned.append((row.id, row.name, slug))
+    return assigned
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv[1:]
+    with app.app_context():
+        conn = db.engine.connect()
+        trans = conn.begin()
+        try:
+            if add_slug_column(conn):
+                print('Added column "template".slug')
+            for template_id, name, slug in backfill_slugs(conn):
+                print(f"{template_id}: {name!r} -> {slug}")
+            if dry_run:
+                trans.rollback()
+                print("Dry run: nothing written")
+            else:
+                for index in Template.__table__.indexes:
+                    index.create(conn, checkfirst=True)
+                trans.commit()
+                invalidate_template_cache()
+        except Exception:
+            trans.rollback()
+            raise
+        finally:
+            conn.close()
@@ -1,11 +1,14 @@
 # Full models.py with added case-type specific nullable columns
 import enum
+import json
 from flask_sqlalchemy import SQLAlchemy
+from utils.db_routing import RoutingSession
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from flask_login import UserMixin
 
-db = SQLAlchemy()
+# reads of @replica_reads views may go to a replica (utils/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class UserRole(enum.Enum):
     superuser = "superuser"
@@ -17,11 +20,13 @@ class UserRole(enum.Enum):
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(120), nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     role = db.Column(db.Enum(UserRole), default=UserRole.pending, nullable=False)
     is_active = db.Column(db.Boolean, default=False)
+    # signed into this user's calendar feed URLs; bumping it revokes them (services/ics_feed.py)
+    calendar_feed_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -71,40 +76,122 @@ class CasePartyRole(enum.Enum):
 class CaseParty(db.Model):
     __tablename__ = "case_party"
     id = db.Column(db.Integer, primary_key=True)
-    case_id = db.Column(db.Integer, db.ForeignKey("case.id"), nullable=False)
-    person_entity_id = db.Column(db.Integer, db.ForeignKey("person_entity.id"), nullable=False)
+    case_id = db.Column(db.Integer, db.ForeignKey("case.id"), nullable=False, index=True)
+    person_entity_id = db.Column(db.Integer, db.ForeignKey("person_entity.id"), nullable=False, index=True)
     role = db.Column(db.Enum(CasePartyRole), nullable=False)
     notes = db.Column(db.Text, nullable=True)
 
     case = db.relationship("Case", back_populates="parties")
     person_entity = db.relationship("PersonEntity")
 
+class PracticeAreaAttribute:
+    """
+    Exposes a column of a practice-area extension table (case_pi, case_criminal, ...)
+    as a plain attribute on Case, so `case.def_insurer` and `form.populate_obj(case)` keep working.
+    - Reading never loads an extension the case type does not use; it returns the column default.
+    - Writing an empty value (None, '', False) never creates an extension row.
+    At class level (Case.def_insurer) it returns the extension column for use in joined filters.
+    """
+    def __init__(self, relationship_name, extension_cls, column):
+        self.relationship_name = relationship_name
+        self.extension_cls = extension_cls
+        self.key = column.key
+        self.default = column.default.arg if column.default is not None and column.default.is_scalar else None
+
+    def _loaded_extension(self, case):
+        state = db.inspect(case)
+        if self.relationship_name in state.dict:
+            return state.dict[self.relationship_name]
+        wanted = PRACTICE_AREA_BY_CASE_TYPE.get(case.case_type)
+        if wanted is not None and wanted != self.relationship_name:
+            return None
+        return getattr(case, self.relationship_name)
+
+    def __get__(self, case, owner):
+        if case is None:
+            return getattr(self.extension_cls, self.key)
+        ext = self._loaded_extension(case)
+        return getattr(ext, self.key) if ext is not None else self.default
+
+    def __set__(self, case, value):
+        if value is None or value == '' or value is False:
+            ext = self._loaded_extension(case)
+            if ext is None:
+                return
+        else:
+            ext = getattr(case, self.relationship_name)
+            if ext is None:
+                ext = self.extension_cls()
+                setattr(case, self.relationship_name, ext)
+        setattr(ext, self.key, value)
+
 class Case(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     parties = db.relationship("CaseParty", back_populates="case", cascade="all, delete-orphan")
     # -----------------------
-    # Personal Injury fields
+    # Core fields
     # -----------------------
-    id = db.Column(db.Integer, primary_key=True)
-    style = db.Column(db.String(200), nullable=False)
+    style = db.Column(db.String(200), nullable=False, index=True)
     case_number = db.Column(db.String(100), unique=True, nullable=False)
-    case_type = db.Column(db.String(100), nullable=True)
+    case_type = db.Column(db.String(50), nullable=True)
     filed_date = db.Column(db.Date, nullable=True)
     judge = db.Column(db.String(100), nullable=True)
-    # --- Add new personal injury fields below ---
+    # Fields shared by more than one practice area
+    jurisdiction = db.Column(db.String(100), nullable=True)
+    client_name = db.Column(db.String(120), nullable=True)
+    client_address = db.Column(db.String(200), nullable=True)
+    client_phone = db.Column(db.String(50), nullable=True)
+    client_email = db.Column(db.String(120), nullable=True)
+    doc_retainer = db.Column(db.Boolean, default=False)
+    court_case_number = db.Column(db.String(100), nullable=True)
+    division = db.Column(db.String(100), nullable=True)
+    opposing_counsel = db.Column(db.String(100), nullable=True)
+    service_status = db.Column(db.String(30), nullable=True)
+    trial_date = db.Column(db.Date, nullable=True)
+    assigned_attorney = db.Column(db.String(120), nullable=True)
+    assigned_paralegal = db.Column(db.String(120), nullable=True)
+    case_status = db.Column(db.String(30), nullable=True)
+    case_title = db.Column(db.String(200), nullable=True)
+    internal_case_number = db.Column(db.String(100), nullable=True)
+    evidence_photos = db.Column(db.Boolean, default=False)
+    evidence_other = db.Column(db.Boolean, default=False)
+    file_status = db.Column(db.String(30), nullable=True)
+    file_notes = db.Column(db.Text, nullable=True)
+    followup_tasks = db.Column(db.Text, nullable=True)
+    referral_source = db.Column(db.String(100), nullable=True)
+    primary_contact_phone = db.Column(db.String(50), nullable=True)
+    primary_contact_email = db.Column(db.String(120), nullable=True)
+
+    # -----------------------
+    # Practice-area extensions (1:1, loaded on first access; see PracticeAreaAttribute)
+    # -----------------------
+    pi_details = db.relationship("CasePersonalInjury", uselist=False, back_populates="case", cascade="all, delete-orphan")
+    criminal_details = db.relationship("CaseCriminal", uselist=False, back_populates="case", cascade="all, delete-orphan")
+    estate_details = db.relationship("CaseEstate", uselist=False, back_populates="case", cascade="all, delete-orphan")
+    other_details = db.relationship("CaseOther", uselist=False, back_populates="case", cascade="all, delete-orphan")
+
+    # Relationships
+    notes = db.relationship('Note', backref='case', lazy=True, cascade="all, delete-orphan")
+    documents = db.relationship('Document', backref='case', lazy=True, cascade="all, delete-orphan")
+
+    # the /cases keyset pagination key with id, so never NULL (migrate_case_created_at.py)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CasePersonalInjury(db.Model):
+    # Personal Injury fields (1:1 with Case)
+    __tablename__ = "case_pi"
+    case_id = db.Column(db.Integer, db.ForeignKey("case.id"), primary_key=True)
+    case = db.relationship("Case", back_populates="pi_details")
+
     incident_address = db.Column(db.String(200), nullable=True)
     incident_city_county = db.Column(db.String(100), nullable=True)
-    jurisdiction = db.Column(db.String(100), nullable=True)
     police_report_number = db.Column(db.String(50), nullable=True)
     law_enforcement_agency = db.Column(db.String(100), nullable=True)
     liability_admitted = db.Column(db.String(20), nullable=True)
     # Client
-    client_name = db.Column(db.String(120), nullable=True)
     client_dob = db.Column(db.Date, nullable=True)
-    client_address = db.Column(db.String(250), nullable=True)
-    client_phone = db.Column(db.String(30), nullable=True)
     client_alt_phone = db.Column(db.String(30), nullable=True)
-    client_email = db.Column(db.String(120), nullable=True)
     client_dl = db.Column(db.String(30), nullable=True)
     client_insurer = db.Column(db.String(100), nullable=True)
     client_policy = db.Column(db.String(60), nullable=True)
@@ -175,7 +262,6 @@ class Case(db.Model):
     bi_disclosure_received = db.Column(db.String(10), nullable=True)
     negotiation_notes = db.Column(db.Text, nullable=True)
     # Document Tracking
-    doc_retainer = db.Column(db.Boolean, default=False)
     doc_hipaa = db.Column(db.Boolean, default=False)
     doc_lops = db.Column(db.Boolean, default=False)
     doc_med_records = db.Column(db.Boolean, default=False)
@@ -184,15 +270,10 @@ class Case(db.Model):
     doc_ins_correspondence = db.Column(db.Boolean, default=False)
     doc_lien_letters = db.Column(db.Boolean, default=False)
     # Litigation
-    court_case_number = db.Column(db.String(100), nullable=True)
-    division = db.Column(db.String(50), nullable=True)
-    opposing_counsel = db.Column(db.String(120), nullable=True)
     opp_counsel_contact = db.Column(db.String(100), nullable=True)
     complaint_filed_date = db.Column(db.Date, nullable=True)
-    service_status = db.Column(db.String(30), nullable=True)
     answer_filed_date = db.Column(db.Date, nullable=True)
     mediation_date = db.Column(db.Date, nullable=True)
-    trial_date = db.Column(db.Date, nullable=True)
     litigation_notes = db.Column(db.Text, nullable=True)
     # Settlement/Closing
     gross_settlement = db.Column(db.String(100), nullable=True)
@@ -204,28 +285,22 @@ class Case(db.Model):
     release_signed = db.Column(db.String(10), nullable=True)
     settlement_check_received = db.Column(db.String(15), nullable=True)
     # File Management
-    assigned_attorney = db.Column(db.String(120), nullable=True)
-    assigned_paralegal = db.Column(db.String(120), nullable=True)
-    case_status = db.Column(db.String(30), nullable=True)
     important_notes = db.Column(db.Text, nullable=True)
     followup_reminders = db.Column(db.Text, nullable=True)
-    # -----------------------
-    # Criminal fields
-    # -----------------------
- # Core Case Info
-    case_title = db.Column(db.String(200), nullable=True)
-    court_case_number = db.Column(db.String(100), nullable=True)
-    internal_case_number = db.Column(db.String(100), nullable=True)
-    jurisdiction = db.Column(db.String(100), nullable=True)
+
+
+class CaseCriminal(db.Model):
+    # Criminal fields (1:1 with Case)
+    __tablename__ = "case_criminal"
+    case_id = db.Column(db.Integer, db.ForeignKey("case.id"), primary_key=True)
+    case = db.relationship("Case", back_populates="criminal_details")
+
+    # Core Case Info
     case_level = db.Column(db.String(30), nullable=True)
-    case_type = db.Column(db.String(50), nullable=True)
-    division = db.Column(db.String(50), nullable=True)
-    judge = db.Column(db.String(100), nullable=True)
     prosecutor = db.Column(db.String(100), nullable=True)
     arresting_agency = db.Column(db.String(100), nullable=True)
     offense_date = db.Column(db.Date, nullable=True)
     arrest_date = db.Column(db.Date, nullable=True)
-    case_status = db.Column(db.String(30), nullable=True)
 
     # Defendant Info
     def_name = db.Column(db.String(120), nullable=True)
@@ -282,10 +357,8 @@ class Case(db.Model):
     evidence_911 = db.Column(db.Boolean, default=False)
     evidence_witness_statements = db.Column(db.Boolean, default=False)
     evidence_lab_reports = db.Column(db.Boolean, default=False)
-    evidence_photos = db.Column(db.Boolean, default=False)
     evidence_search_warrants = db.Column(db.Boolean, default=False)
     evidence_phone_records = db.Column(db.Boolean, default=False)
-    evidence_other = db.Column(db.Boolean, default=False)
     evidence_summary = db.Column(db.Text, nullable=True)
 
     # Prior Criminal History
@@ -311,7 +384,6 @@ class Case(db.Model):
     offer_expiration = db.Column(db.Date, nullable=True)
     plea_discussion_notes = db.Column(db.Text, nullable=True)
     trial_setting = db.Column(db.String(30), nullable=True)
-    trial_date = db.Column(db.Date, nullable=True)
     jury_or_bench = db.Column(db.String(20), nullable=True)
 
     # Sentencing / Post-Judgment
@@ -325,25 +397,15 @@ class Case(db.Model):
     special_conditions = db.Column(db.String(120), nullable=True)
     postconviction_issues = db.Column(db.Text, nullable=True)
 
-    # File Management
-    assigned_attorney = db.Column(db.String(100), nullable=True)
-    assigned_paralegal = db.Column(db.String(100), nullable=True)
-    file_status = db.Column(db.String(30), nullable=True)
-    file_notes = db.Column(db.Text, nullable=True)
-    followup_tasks = db.Column(db.Text, nullable=True)        # e.g., 'open','plea','dismissed','closed'
 
-    # -----------------------
-    # Probate / Estate Planning fields
+class CaseEstate(db.Model):
+    # Probate / Estate Planning fields (1:1 with Case)
+    __tablename__ = "case_estate"
+    case_id = db.Column(db.Integer, db.ForeignKey("case.id"), primary_key=True)
+    case = db.relationship("Case", back_populates="estate_details")
+
     # Core probate info
-    case_title = db.Column(db.String(200), nullable=True)
-    court_case_number = db.Column(db.String(100), nullable=True)
-    internal_case_number = db.Column(db.String(100), nullable=True)
-    jurisdiction = db.Column(db.String(100), nullable=True)
-    case_type = db.Column(db.String(50), nullable=True)
-    referral_source = db.Column(db.String(100), nullable=True)
     primary_contact = db.Column(db.String(100), nullable=True)
-    primary_contact_phone = db.Column(db.String(50), nullable=True)
-    primary_contact_email = db.Column(db.String(120), nullable=True)
     matter_notes = db.Column(db.Text, nullable=True)
 
     # Decedent Info
@@ -420,7 +482,6 @@ class Case(db.Model):
     tax_notes = db.Column(db.Text, nullable=True)
 
     # Documents & Deadlines
-    doc_retainer = db.Column(db.Boolean, default=False)
     doc_original_will = db.Column(db.Boolean, default=False)
     doc_death_certificate = db.Column(db.Boolean, default=False)
     doc_petition_admin = db.Column(db.Boolean, default=False)
@@ -434,38 +495,21 @@ class Case(db.Model):
     claims_deadline = db.Column(db.Date, nullable=True)
     doc_deadline_notes = db.Column(db.Text, nullable=True)
 
-    # File Management
-    assigned_attorney = db.Column(db.String(120), nullable=True)
-    assigned_paralegal = db.Column(db.String(120), nullable=True)
-    file_status = db.Column(db.String(30), nullable=True)
-    file_notes = db.Column(db.Text, nullable=True)
-    followup_tasks = db.Column(db.Text, nullable=True)
 
-    # -----------------------
-    # Other / generic matter fields
-    # -----------------------
+class CaseOther(db.Model):
+    # Other / generic matter fields (1:1 with Case)
+    __tablename__ = "case_other"
+    case_id = db.Column(db.Integer, db.ForeignKey("case.id"), primary_key=True)
+    case = db.relationship("Case", back_populates="other_details")
+
     # Miscellaneous case fields
-    case_title = db.Column(db.String(200), nullable=True)
-    court_case_number = db.Column(db.String(100), nullable=True)
-    internal_case_number = db.Column(db.String(100), nullable=True)
     case_category = db.Column(db.String(50), nullable=True)
-    jurisdiction = db.Column(db.String(100), nullable=True)
-    division = db.Column(db.String(100), nullable=True)
-    judge = db.Column(db.String(100), nullable=True)
-    referral_source = db.Column(db.String(100), nullable=True)
     case_description = db.Column(db.Text, nullable=True)
-    case_status = db.Column(db.String(30), nullable=True)
 
     # Client Information
-    client_name = db.Column(db.String(120), nullable=True)
     client_type = db.Column(db.String(50), nullable=True)
     client_role = db.Column(db.String(50), nullable=True)
-    client_address = db.Column(db.String(200), nullable=True)
-    client_phone = db.Column(db.String(50), nullable=True)
-    client_email = db.Column(db.String(120), nullable=True)
     primary_contact_person = db.Column(db.String(100), nullable=True)
-    primary_contact_phone = db.Column(db.String(50), nullable=True)
-    primary_contact_email = db.Column(db.String(120), nullable=True)
     client_notes = db.Column(db.Text, nullable=True)
 
     # Opposing Party Info
@@ -475,7 +519,6 @@ class Case(db.Model):
     opposing_address = db.Column(db.String(200), nullable=True)
     opposing_phone = db.Column(db.String(50), nullable=True)
     opposing_email = db.Column(db.String(120), nullable=True)
-    opposing_counsel = db.Column(db.String(100), nullable=True)
     opposing_counsel_firm = db.Column(db.String(100), nullable=True)
     opposing_counsel_contact = db.Column(db.String(100), nullable=True)
     opposing_notes = db.Column(db.Text, nullable=True)
@@ -483,11 +526,9 @@ class Case(db.Model):
     # Court & Procedural
     case_stage = db.Column(db.String(30), nullable=True)
     filing_date = db.Column(db.Date, nullable=True)
-    service_status = db.Column(db.String(30), nullable=True)
     answer_due_date = db.Column(db.Date, nullable=True)
     discovery_cutoff = db.Column(db.Date, nullable=True)
     pretrial_date = db.Column(db.Date, nullable=True)
-    trial_date = db.Column(db.Date, nullable=True)
     procedural_notes = db.Column(db.Text, nullable=True)
 
     # Key Facts & Issues
@@ -508,8 +549,6 @@ class Case(db.Model):
     evidence_emails = db.Column(db.Boolean, default=False)
     evidence_witnesses = db.Column(db.Boolean, default=False)
     evidence_experts = db.Column(db.Boolean, default=False)
-    evidence_photos = db.Column(db.Boolean, default=False)
-    evidence_other = db.Column(db.Boolean, default=False)
     evidence_notes = db.Column(db.Text, nullable=True)
 
     # Deadlines & Events
@@ -538,7 +577,6 @@ class Case(db.Model):
     billing_notes = db.Column(db.Text, nullable=True)
 
     # Document Checklist
-    doc_retainer = db.Column(db.Boolean, default=False)
     doc_client_intake = db.Column(db.Boolean, default=False)
     doc_key_pleadings = db.Column(db.Boolean, default=False)
     doc_evidence_uploaded = db.Column(db.Boolean, default=False)
@@ -546,50 +584,75 @@ class Case(db.Model):
     doc_correspondence = db.Column(db.Boolean, default=False)
     document_notes = db.Column(db.Text, nullable=True)
 
-    # File Management
-    assigned_attorney = db.Column(db.String(120), nullable=True)
-    assigned_paralegal = db.Column(db.String(120), nullable=True)
-    file_status = db.Column(db.String(30), nullable=True)
-    file_notes = db.Column(db.Text, nullable=True)
-    followup_tasks = db.Column(db.Text, nullable=True)
-
-    # Relationships
-    notes = db.relationship('Note', backref='case', lazy=True, cascade="all, delete-orphan")
-    documents = db.relationship('Document', backref='case', lazy=True, cascade="all, delete-orphan")
-
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
+# case_type -> relationship holding that practice area's columns
+PRACTICE_AREA_BY_CASE_TYPE = {
+    'personal_injury': 'pi_details',
+    'criminal': 'criminal_details',
+    'estate': 'estate_details',
+    'other': 'other_details',
+}
+
+PRACTICE_AREA_EXTENSIONS = {
+    'pi_details': CasePersonalInjury,
+    'criminal_details': CaseCriminal,
+    'estate_details': CaseEstate,
+    'other_details': CaseOther,
+}
+
+for _rel_name, _ext_cls in PRACTICE_AREA_EXTENSIONS.items():
+    for _col in _ext_cls.__table__.columns:
+        if _col.key != 'case_id':
+            setattr(Case, _col.key, PracticeAreaAttribute(_rel_name, _ext_cls, _col))
 
 class Client(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(120), nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     address = db.Column(db.String(250), nullable=True)
     # ... other fields ...
 
 
 class Note(db.Model):
+    # the notes timeline filtered by case or by user, newest first (services/note_queries.py)
+    __table_args__ = (
+        db.Index('ix_note_case_created_at', 'case_id', 'created_at'),
+        db.Index('ix_note_user_created_at', 'user_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     case_id = db.Column(db.Integer, db.ForeignKey('case.id'), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     note = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     user = db.relationship('User', backref='notes')
 
 
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=False, index=True)
+    # storage key on the configured backend (utils/storage.py); legacy rows hold a path relative to the app
     filepath = db.Column(db.String(255), nullable=True)
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_viewed_at = db.Column(db.DateTime)
-    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=True)
-    case_id = db.Column(db.Integer, db.ForeignKey('case.id'), nullable=True)
+    # sha256 of the stored blob; Documents with equal content share one object
+    content_hash = db.Column(db.String(64), index=True)
+    size = db.Column(db.Integer)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_viewed_at = db.Column(db.DateTime, index=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=True, index=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('case.id'), nullable=True, index=True)
     client = db.relationship('Client', backref='documents')
 
 
 class CalendarEvent(db.Model):
+    # calendar windows read by date range, optionally for one user or case (services/calendar_windows.py);
+    # ICS feeds read what changed since a sync token (services/ics_feed.py)
+    __table_args__ = (
+        db.Index('ix_calendar_event_event_datetime', 'event_datetime'),
+        db.Index('ix_calendar_event_deadline_datetime', 'deadline_datetime'),
+        db.Index('ix_calendar_event_user_event_datetime', 'user_id', 'event_datetime'),
+        db.Index('ix_calendar_event_user_deadline_datetime', 'user_id', 'deadline_datetime'),
+        db.Index('ix_calendar_event_case_event_datetime', 'case_id', 'event_datetime'),
+        db.Index('ix_calendar_event_user_updated_at', 'user_id', 'updated_at'),
+        db.Index('ix_calendar_event_case_updated_at', 'case_id', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     time_length = db.Column(db.String(50), nullable=True)
@@ -600,10 +663,10 @@ class CalendarEvent(db.Model):
     case_id = db.Column(db.Integer, db.ForeignKey('case.id'), nullable=True)
     case = db.relationship('Case', backref='calendar_events')
 
-    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=True, index=True)
     client = db.relationship('Client', backref='calendar_events')
 
-    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=True, index=True)
     document = db.relationship('Document', backref='calendar_events')
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -611,24 +674,110 @@ class CalendarEvent(db.Model):
 
     event_datetime = db.Column(db.DateTime, nullable=False)
 
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CalendarEventTombstone(db.Model):
+    """
+    An event that left a feed: deleted, or moved to another user/case (user_id/case_id are the
+    old values). Lets incremental ICS syncs cancel it on the client; see services/ics_feed.py.
+    """
+    __tablename__ = 'calendar_event_tombstone'
+    __table_args__ = (
+        db.Index('ix_calendar_event_tombstone_user_removed_at', 'user_id', 'removed_at'),
+        db.Index('ix_calendar_event_tombstone_case_removed_at', 'case_id', 'removed_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    case_id = db.Column(db.Integer, nullable=True)
+    event_datetime = db.Column(db.DateTime, nullable=False)
+    removed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
 
 class Template(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
+    name = db.Column(db.String(200), nullable=False, index=True)
+    # doc-type key (see DOC_TYPE_CHOICES) this template overrides; resolved by services.template_resolver
+    slug = db.Column(db.String(100), unique=True, index=True)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class JobStatus(enum.Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+class Job(db.Model):
+    """Background job (document generation, ...) run by `flask worker`; see services/jobs.py."""
+    __tablename__ = 'job'
+    # workers poll for the oldest queued job that is due
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.Enum(JobStatus), default=JobStatus.queued, nullable=False)
+    payload = db.Column(db.Text, nullable=False)   # JSON arguments for the handler
+    result = db.Column(db.Text, nullable=True)     # JSON, updated at every checkpoint
+    error = db.Column(db.Text, nullable=True)      # last failure, kept while retrying
+    total = db.Column(db.Integer, default=0)       # progress: units of work (e.g. documents)
+    completed = db.Column(db.Integer, default=0)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    user = db.relationship('User')
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else {}
+
+    @property
+    def is_finished(self):
+        return self.status in (JobStatus.succeeded, JobStatus.failed)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status.value,
+            'total': self.total,
+            'completed': self.completed,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'error': self.error,
+            'result': self.get_result(),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
 # Add these classes into your models.py (near other SQLAlchemy models)
 
 import json
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
 # Custom Field metadata (one per field)
 class CustomField(db.Model):
     __tablename__ = 'custom_field'
+    # a target's fields in display order (services/custom_fields.py, the admin list)
+    __table_args__ = (
+        Index('ix_custom_field_target_order', 'target', 'order'),
+    )
     id = Column(Integer, primary_key=True)
     name = Column(String(120), nullable=False)      # internal name
     slug = Column(String(120), nullable=False, unique=True)  # stable key used in templates & storage
@@ -671,11 +820,17 @@ class CustomField(db.Model):
 # CustomFieldValue stores a value for a specific resource (case or client)
 class CustomFieldValue(db.Model):
     __tablename__ = 'custom_field_value'
+    # one value per (field, owner); also the conflict targets for bulk upserts, and the
+    # index for field_id lookups (field_id leads both)
+    __table_args__ = (
+        Index('uq_custom_field_value_case', 'field_id', 'case_id', unique=True),
+        Index('uq_custom_field_value_client', 'field_id', 'client_id', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     field_id = Column(Integer, ForeignKey('custom_field.id'), nullable=False)
     # link to case or client (use nullable ints and only one used depending on target)
-    case_id = Column(Integer, ForeignKey('case.id'), nullable=True)
-    client_id = Column(Integer, ForeignKey('client.id'), nullable=True)
+    case_id = Column(Integer, ForeignKey('case.id'), nullable=True, index=True)
+    client_id = Column(Integer, ForeignKey('client.id'), nullable=True, index=True)
     # store as text; for multiple choices store JSON-encoded array
     value = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,215 @@
+# services/batch_generation.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import current_app
+from jinja2 import Environment
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+from werkzeug.utils import secure_filename
+from models import db, Case, CaseParty, Document, PRACTICE_AREA_EXTENSIONS
+from services.template_resolver import resolve_template
+from utils.storage import put_blob, create_backend, get_storage, storage_settings
+
+# Below this many documents a process pool costs more to start than it saves,
+# so smaller batches render in the calling process.
+MIN_PARALLEL_ITEMS = 50
+
+class BatchFailure:
+    def __init__(self, case_id, doc_type, error):
+        self.case_id = case_id
+        self.doc_type = doc_type
+        self.error = error
+
+    def to_dict(self):
+        return {'case_id': self.case_id, 'doc_type': self.doc_type, 'error': self.error}
+
+    def __repr__(self):
+        return f"<BatchFailure case={self.case_id} doc_type={self.doc_type}: {self.error}>"
+
+class BatchResult:
+    """Outcome of generate_batch(): inserted Document ids, per-item failures and timing."""
+    def __init__(self, document_ids, failures, elapsed):
+        self.document_ids = document_ids
+        self.failures = failures
+        self.elapsed = elapsed
+
+    @property
+    def generated(self):
+        return len(self.document_ids)
+
+    @property
+    def per_second(self):
+        return self.generated / self.elapsed if self.elapsed else 0.0
+
+# ---------------------------------------------------------------------------
+# Rendering (runs in pool workers, so everything it touches must be picklable)
+# ---------------------------------------------------------------------------
+
+class _Renderer:
+    """
+    Renders one document per item into the blob store, compiling each doc type's source once.
+    Uses a plain autoescaping Jinja environment (what render_template_string() does for
+    string templates), so batch templates see case/client/user/today/now but no Flask globals.
+    Returns (index, (digest, key, size), None) or (index, None, error).
+    """
+    def __init__(self, sources, backend):
+        self.sources = sources
+        self.backend = backend
+        self.env = Environment(autoescape=True)
+        self.compiled = {}
+
+    def __call__(self, item):
+        index, doc_type, context = item
+        try:
+            template = self.compiled.get(doc_type)
+            if template is None:
+                template = self.compiled[doc_type] = self.env.from_string(self.sources[doc_type])
+            rendered = template.render(context)
+        except Exception as e:
+            return index, None, f"render failed: {e}"
+        try:
+            return index, put_blob(rendered, backend=self.backend), None
+        except Exception as e:
+            return index, None, f"write failed: {e}"
+
+_worker_renderer = None
+
+def _init_worker(sources, settings):
+    global _worker_renderer
+    _worker_renderer = _Renderer(sources, create_backend(settings))
+
+def _render_in_worker(item):
+    return _worker_renderer(item)
+
+# ---------------------------------------------------------------------------
+# Snapshots: ORM objects become plain dicts that pickle cheaply and that Jinja
+# reads with the same `case.style` syntax (attribute lookup falls back to items).
+# ---------------------------------------------------------------------------
+
+def _row_dict(obj, exclude=()):
+    if obj is None:
+        return None
+    return {attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs if attr.key not in exclude}
+
+# relationship name -> the practice-area column names it proxies onto Case
+_EXTENSION_KEYS = {
+    rel: [col.key for col in ext_cls.__table__.columns if col.key != 'case_id']
+    for rel, ext_cls in PRACTICE_AREA_EXTENSIONS.items()
+}
+# what PracticeAreaAttribute returns when a case has no row in that extension
+_EXTENSION_DEFAULTS = {
+    attr.key: attr.default
+    for keys in _EXTENSION_KEYS.values() for attr in (Case.__dict__[key] for key in keys)
+}
+
+def _case_snapshot(case):
+    """
+    Case columns plus its practice-area columns, as `case.<column>` reads them. Reads the
+    (prefetched) extension rows directly; going through PracticeAreaAttribute for all
+    ~300 proxied names per case would cost more than rendering the documents.
+    """
+    data = _row_dict(case)
+    data.update(_EXTENSION_DEFAULTS)
+    for rel, keys in _EXTENSION_KEYS.items():
+        ext = getattr(case, rel)
+        if ext is not None:
+            data.update((key, getattr(ext, key)) for key in keys)
+    data['parties'] = [dict(_row_dict(p), person=_row_dict(p.person_entity)) for p in case.parties]
+    return data
+
+def _user_snapshot(user):
+    if user is None or not getattr(user, 'is_authenticated', True):
+        return None
+    return _row_dict(user, exclude=('password_hash',))
+
+def _prefetch_cases(case_ids):
+    """All requested cases with their extension rows and parties in a fixed number of queries."""
+    options = [selectinload(getattr(Case, rel)) for rel in PRACTICE_AREA_EXTENSIONS]
+    options.append(selectinload(Case.parties).selectinload(CaseParty.person_entity))
+    cases = Case.query.options(*options).filter(Case.id.in_(case_ids)).all()
+    return {case.id: case for case in cases}
+
+def resolve_sources(doc_types, defaults=None, labels=None):
+    """{doc_type: template source}: the Template override for each doc type, else its default."""
+    labels = labels or {}
+    sources = {}
+    for doc_type in doc_types:
+        label = labels.get(doc_type, doc_type.replace('_', ' ').title())
+        sources[doc_type], _ = resolve_template(doc_type, defaults, fallback=f"<p>{label} for {{{{ case.style }}}}</p>")
+    return sources
+
+def generate_batch(case_ids, doc_types, defaults=None, labels=None, user=None,
+                   workers=None, min_parallel=MIN_PARALLEL_ITEMS, sources=None):
+    """
+    Generate every doc type in `doc_types` for every case in `case_ids`.
+    - defaults: DEFAULT_TEMPLATES used when no Template row has the doc type's slug
+    - labels: {doc_type: label} for the bare-bones fallback template
+    - workers: render processes (default os.cpu_count()); 1 renders in this process
+    - sources: resolve_sources() output to render from, so every chunk of a job uses the same
+      template versions; resolved here when omitted
+    Cases and templates are loaded up front, documents are rendered into the blob store
+    (utils/storage.py: identical output is stored once, on the configured backend) by a
+    process pool, and the Document rows go in with one bulk INSERT. Nothing is committed.
+    Missing cases and render/write errors are reported per item instead of aborting the batch.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    if sources is None:
+        sources = resolve_sources(doc_types, defaults, labels)
+
+    cases = _prefetch_cases(case_ids)
+    failures = [BatchFailure(case_id, None, "case not found") for case_id in case_ids if case_id not in cases]
+
+    user_data = _user_snapshot(user)
+    now = datetime.utcnow()
+    timestamp = int(now.timestamp())
+    items, pending = [], []
+    for case_id in case_ids:
+        case = cases.get(case_id)
+        if case is None:
+            continue
+        client = getattr(case, 'client', None)
+        context = {
+            'case': _case_snapshot(case),
+            'client': _row_dict(client),
+            'user': user_data,
+            'today': now.date(),
+            'now': now,
+        }
+        safe_case = secure_filename(case.case_number or case.style) or f"case_{case.id}"
+        for doc_type in doc_types:
+            filename = f"{safe_case}_{case.id}_{doc_type}_{timestamp}.html"
+            items.append((len(items), doc_type, context))
+            pending.append({
+                'case_id': case.id,
+                'client_id': client.id if client else None,
+                'filename': filename,
+                'uploaded_at': now,
+                'doc_type': doc_type,
+            })
+
+    if workers > 1 and len(items) >= min_parallel:
+        chunksize = max(1, len(items) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(sources, storage_settings(current_app.config))) as pool:
+            outcomes = list(pool.map(_render_in_worker, items, chunksize=chunksize))
+    else:
+        renderer = _Renderer(sources, get_storage())
+        outcomes = [renderer(item) for item in items]
+
+    rows = []
+    for index, blob, error in outcomes:
+        row = pending[index]
+        doc_type = row.pop('doc_type')
+        if error:
+            failures.append(BatchFailure(row['case_id'], doc_type, error))
+            continue
+        digest, key, size = blob
+        row.update(content_hash=digest, size=size, filepath=key)
+        rows.append(row)
+
+    document_ids = []
+    if rows:
+        document_ids = list(db.session.scalars(insert(Document).returning(Document.id, sort_by_parameter_order=True), rows))
+    return BatchResult(document_ids, failures, time.perf_counter() - started)
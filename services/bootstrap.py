@@ -0,0 +1,130 @@
+# services/bootstrap.py
+import click
+from datetime import datetime
+from sqlalchemy import inspect
+from models import db, User, UserRole
+from services import search
+
+SUPERUSER_NAME = "Super User"
+SUPERUSER_EMAIL = "admin@lawfirm.com"
+SUPERUSER_PASSWORD = "supersecret"
+
+# key under app.extensions where bootstrap completion is recorded
+EXTENSION_KEY = 'cms_bootstrap'
+
+def create_superuser():
+    """Ensure the default super user exists. Must run inside an app context."""
+    superuser = User.query.filter_by(email=SUPERUSER_EMAIL).first()
+    if not superuser:
+        su = User(
+            name=SUPERUSER_NAME,
+            email=SUPERUSER_EMAIL,
+            role=UserRole.superuser,
+            is_active=True
+        )
+        su.set_password(SUPERUSER_PASSWORD)
+        db.session.add(su)
+        db.session.commit()
+
+# Unique indexes that ON CONFLICT upserts name as their conflict target: without one, every save
+# through that upsert fails, so startup refuses to run. index name -> how to create it safely
+REQUIRED_INDEXES = {
+    'uq_custom_field_value_case': 'python migrate_custom_field_values.py',
+    'uq_custom_field_value_client': 'python migrate_custom_field_values.py',
+}
+
+def missing_indexes():
+    """Model indexes absent from existing tables (create_all() only adds them to new tables)."""
+    inspector = inspect(db.engine)
+    live_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in live_tables:
+            continue
+        live = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        missing.extend(ix for ix in sorted(table.indexes, key=lambda ix: ix.name) if ix.name not in live)
+    return missing
+
+def check_indexes(app):
+    """
+    Indexes are not created here: a plain CREATE INDEX on every process start takes write locks
+    on PostgreSQL. `flask schema-evolve --all` builds them (CONCURRENTLY there). Missing
+    REQUIRED_INDEXES raise RuntimeError; any other missing index is logged.
+    """
+    missing = missing_indexes()
+    required = [ix.name for ix in missing if ix.name in REQUIRED_INDEXES]
+    optional = [ix.name for ix in missing if ix.name not in REQUIRED_INDEXES]
+    if optional:
+        app.logger.warning("Missing indexes %s; create them with `flask schema-evolve --all`", ', '.join(optional))
+    if required:
+        fixes = sorted({REQUIRED_INDEXES[name] for name in required})
+        raise RuntimeError(f"Missing required indexes {', '.join(required)}; run {' and '.join(fixes)}")
+
+# Columns added after a release, and the script that adds them to an existing database.
+# create_all() only creates missing tables, and every ORM query on a model selects all of its
+# columns, so startup refuses to run without them (before create_superuser() queries "user").
+COLUMN_MIGRATIONS = {
+    ('template', 'slug'): 'python migrate_template_slugs.py',
+    ('document', 'content_hash'): 'python migrate_document_blobs.py',
+    ('document', 'size'): 'python migrate_document_blobs.py',
+    ('calendar_event', 'created_at'): 'python migrate_calendar_sync.py',
+    ('calendar_event', 'updated_at'): 'python migrate_calendar_sync.py',
+    ('user', 'calendar_feed_version'): 'python migrate_calendar_sync.py',
+}
+
+def missing_columns():
+    """(table, column) pairs the models have and existing tables lack."""
+    inspector = inspect(db.engine)
+    live_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in live_tables:
+            continue
+        live = {c['name'] for c in inspector.get_columns(table.name)}
+        missing.extend((table.name, c.name) for c in table.columns if c.name not in live)
+    return missing
+
+def check_columns():
+    """Raise RuntimeError naming the migration(s) to run when a model column is missing."""
+    missing = missing_columns()
+    if missing:
+        fixes = sorted({COLUMN_MIGRATIONS.get(key, 'flask schema-evolve --all') for key in missing})
+        names = ', '.join(f"{table}.{column}" for table, column in missing)
+        raise RuntimeError(f"Missing columns {names}; run {' and '.join(fixes)}")
+
+def is_bootstrapped(app):
+    return bool(app.extensions.get(EXTENSION_KEY, {}).get('completed_at'))
+
+def bootstrap_app(app, force=False):
+    """
+    Create the schema and seed the super user once per process.
+    Returns True if the bootstrap ran, False if it was already recorded as done.
+    """
+    state = app.extensions.setdefault(EXTENSION_KEY, {})
+    if state.get('completed_at') and not force:
+        return False
+    with app.app_context():
+        db.create_all()
+        check_columns()
+        check_indexes(app)
+        if search.create_index():
+            search.rebuild_index()
+        create_superuser()
+    state['completed_at'] = datetime.utcnow()
+    return True
+
+def init_app(app):
+    """
+    Startup hook: register the `flask bootstrap` CLI command and, unless
+    CMS_AUTO_BOOTSTRAP is disabled, bootstrap immediately so the request path never has to.
+    """
+    app.config.setdefault('CMS_AUTO_BOOTSTRAP', True)
+
+    @app.cli.command('bootstrap')
+    def bootstrap_command():
+        """Create database tables and seed the super user."""
+        bootstrap_app(app, force=True)
+        click.echo('Bootstrap complete.')
+
+    if app.config['CMS_AUTO_BOOTSTRAP']:
+        bootstrap_app(app)
@@ -0,0 +1,157 @@
+# services/calendar_windows.py
+# Month/week calendar data, bucketed by day. A window is loaded with one indexed range query
+# over CalendarEvent.event_datetime / deadline_datetime (see the CalendarEvent indexes), reading
+# only the columns the calendar templates show, and cached per (user, case, window) until a
+# commit writes a CalendarEvent (session hooks below) or CALENDAR_CACHE_SECONDS passes.
+import calendar as pycal
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dtime, timedelta
+from flask import current_app
+from sqlalchemy import and_, event, or_
+from models import db, CalendarEvent
+from utils.db_routing import primary
+
+DEFAULT_CACHE_SECONDS = 60
+CACHE_MAXSIZE = 256
+
+CALENDAR_COLUMNS = (
+    CalendarEvent.id,
+    CalendarEvent.name,
+    CalendarEvent.event_datetime,
+    CalendarEvent.deadline,
+    CalendarEvent.deadline_datetime,
+    CalendarEvent.completed,
+)
+
+class CalendarEntry:
+    """One line in a day cell: the event itself (kind 'event') or its deadline (kind 'deadline')."""
+    __slots__ = ('id', 'name', 'at', 'kind', 'deadline', 'completed')
+
+    def __init__(self, id, name, at, kind, deadline, completed):
+        self.id = id
+        self.name = name
+        self.at = at
+        self.kind = kind
+        self.deadline = deadline
+        self.completed = completed
+
+class CalendarWindow:
+    """Entries for the days in [start, end), keyed by date. Shared between requests: treat as read-only."""
+    def __init__(self, start, end, days):
+        self.start = start
+        self.end = end
+        self.days = days
+
+    @property
+    def day_list(self):
+        return list(self.days)
+
+    def events_on(self, day):
+        return self.days.get(day, ())
+
+    def weeks(self, firstweekday=pycal.SUNDAY):
+        """Rows of 7 dates covering the window for a grid; days outside the window are None."""
+        first = self.start - timedelta(days=(self.start.weekday() - firstweekday) % 7)
+        rows, day = [], first
+        while day < self.end:
+            rows.append([d if self.start <= d < self.end else None for d in (day + timedelta(days=i) for i in range(7))])
+            day += timedelta(days=7)
+        return rows
+
+# (user_id, case_id, start, end) -> (loaded_at, CalendarWindow); LRU, see invalidate_calendar_cache
+_window_cache = OrderedDict()
+_generation = 0
+_lock = threading.Lock()
+
+def _load_window(start, end, user_id=None, case_id=None):
+    start_dt, end_dt = datetime.combine(start, dtime.min), datetime.combine(end, dtime.min)
+    query = db.session.query(*CALENDAR_COLUMNS).filter(or_(
+        and_(CalendarEvent.event_datetime >= start_dt, CalendarEvent.event_datetime < end_dt),
+        and_(CalendarEvent.deadline_datetime >= start_dt, CalendarEvent.deadline_datetime < end_dt),
+    ))
+    if user_id is not None:
+        query = query.filter(CalendarEvent.user_id == user_id)
+    if case_id is not None:
+        query = query.filter(CalendarEvent.case_id == case_id)
+
+    days = OrderedDict((start + timedelta(days=i), []) for i in range((end - start).days))
+    for row in query:
+        event_day = row.event_datetime.date() if row.event_datetime else None
+        if event_day in days:
+            days[event_day].append(CalendarEntry(row.id, row.name, row.event_datetime, 'event', row.deadline, row.completed))
+        if row.deadline and row.deadline_datetime:
+            deadline_day = row.deadline_datetime.date()
+            # a deadline on the event's own day is already shown by the event's badge
+            if deadline_day in days and deadline_day != event_day:
+                days[deadline_day].append(CalendarEntry(row.id, row.name, row.deadline_datetime, 'deadline', True, row.completed))
+    for entries in days.values():
+        entries.sort(key=lambda e: (e.at, e.id))
+    return CalendarWindow(start, end, days)
+
+def get_window(start, end, user_id=None, case_id=None):
+    """Day-bucketed entries for [start, end) (dates), optionally limited to one user's or case's events."""
+    key = (user_id, case_id, start, end)
+    ttl = current_app.config.get('CALENDAR_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    with _lock:
+        entry = _window_cache.get(key)
+        generation = _generation
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            _window_cache.move_to_end(key)
+            return entry[1]
+    with primary():  # never cache a lagging replica's rows
+        window = _load_window(start, end, user_id, case_id)
+    with _lock:
+        if generation == _generation:
+            _window_cache[key] = (time.monotonic(), window)
+            _window_cache.move_to_end(key)
+            while len(_window_cache) > CACHE_MAXSIZE:
+                _window_cache.popitem(last=False)
+    return window
+
+def month_window(year, month, user_id=None, case_id=None):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return get_window(start, end, user_id, case_id)
+
+def week_window(day, user_id=None, case_id=None, firstweekday=pycal.MONDAY):
+    start = day - timedelta(days=(day.weekday() - firstweekday) % 7)
+    return get_window(start, start + timedelta(days=7), user_id, case_id)
+
+def invalidate_calendar_cache():
+    global _generation
+    with _lock:
+        _window_cache.clear()
+        _generation += 1
+
+# --- Invalidation hooks ---
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CalendarEvent):
+            session.info['calendar_dirty'] = True
+            return
+
+def _do_orm_execute(orm_execute_state):
+    # bulk insert/update/delete statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is CalendarEvent:
+            orm_execute_state.session.info['calendar_dirty'] = True
+
+def _after_commit(session):
+    if session.info.pop('calendar_dirty', False):
+        invalidate_calendar_cache()
+
+def _after_rollback(session):
+    session.info.pop('calendar_dirty', None)
+
+def init_app(app):
+    """Register the cache invalidation hooks. Setting: CALENDAR_CACHE_SECONDS."""
+    app.config.setdefault('CALENDAR_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
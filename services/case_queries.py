@@ -0,0 +1,54 @@
+# services/case_queries.py
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, Case, CaseParty, Note
+
+# Columns the list pages and pickers actually display (created_at is the pagination key).
+CASE_SUMMARY_COLUMNS = (
+    Case.id,
+    Case.style,
+    Case.case_number,
+    Case.judge,
+    Case.filed_date,
+    Case.case_type,
+    Case.client_name,
+    Case.assigned_attorney,
+    Case.created_at,
+)
+
+def case_summary_query():
+    """
+    Query returning read-only summary rows (CASE_SUMMARY_COLUMNS) instead of Case entities.
+    Rows support attribute access (row.id, row.style, ...) so list templates work unchanged,
+    but nothing is hydrated into the session. Note that load_only() is not a substitute here:
+    it still installs a deferred loader for each of the ~330 unloaded Case attributes per row.
+    Compose filters/order_by on the result like any other query.
+    """
+    return db.session.query(*CASE_SUMMARY_COLUMNS)
+
+def case_choices(label=None, order_by=None):
+    """
+    (id, label) tuples for SelectField choices.
+    - label: callable(row) -> str, defaults to the case style
+    - order_by: optional column/expression to sort by
+    """
+    label = label or (lambda row: row.style)
+    q = case_summary_query()
+    if order_by is not None:
+        q = q.order_by(order_by)
+    return [(row.id, label(row)) for row in q.all()]
+
+def case_label_with_number(row):
+    return f"{row.style} ({row.case_number})"
+
+def case_detail_loaders():
+    """
+    Loader options for the case detail page. Each collection the page shows arrives in one
+    SELECT ... WHERE case_id IN (...) (many-to-one hops are joined onto it), so the page
+    costs the same handful of queries however many parties, notes or documents a case has.
+    """
+    return [
+        selectinload(Case.parties).joinedload(CaseParty.person_entity),
+        selectinload(Case.notes).joinedload(Note.user),
+        selectinload(Case.documents),
+        selectinload(Case.calendar_events),
+    ]
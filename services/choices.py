@@ -0,0 +1,155 @@
+# services/choices.py
+# (id, label) choice lists for form dropdowns, cached per process. A commit that inserts, updates
+# or deletes rows of a source's model drops that source's cached list (session hooks below, which
+# also see bulk insert/update/delete statements); other processes pick changes up within
+# CHOICES_CACHE_SECONDS. Tables with more than CHOICES_INLINE_LIMIT rows are not embedded in the
+# page at all: the field only carries its current selection and the browser looks rows up
+# through /api/choices/<name>?q= as the user types (templates/_choice_typeahead.html).
+import threading
+import time
+from flask import current_app, url_for
+from sqlalchemy import event, or_
+from models import db, User, Case, Client, Document, CalendarEvent
+from services import search as search_index
+from utils.db_routing import primary
+
+DEFAULT_INLINE_LIMIT = 500
+DEFAULT_CACHE_SECONDS = 300
+TYPEAHEAD_LIMIT = 20
+
+class ChoiceSource:
+    """
+    One dropdown's rows: `label` is the column shown, `search` the columns a type-ahead query
+    matches (ILIKE), `search_kind` a services.search kind to use the full-text index instead.
+    """
+    def __init__(self, model, label, order_by, search=None, search_kind=None):
+        self.model = model
+        self.label = label
+        self.order_by = order_by
+        self.search = search or (label,)
+        self.search_kind = search_kind
+
+    def query(self):
+        return db.session.query(self.model.id, self.label).order_by(self.order_by, self.model.id)
+
+    def search_filter(self, q):
+        fallback = or_(*(col.ilike(f"%{q}%") for col in self.search))
+        if self.search_kind:
+            return search_index.search_condition(self.search_kind, self.model.id, q, fallback=fallback)
+        return fallback
+
+CHOICE_SOURCES = {
+    'clients': ChoiceSource(Client, Client.name, Client.name, search=(Client.name, Client.email)),
+    'users': ChoiceSource(User, User.name, User.name, search=(User.name, User.email)),
+    'cases': ChoiceSource(Case, Case.style, Case.created_at.desc(), search=(Case.style, Case.case_number), search_kind='case'),
+    'documents': ChoiceSource(Document, Document.filename, Document.uploaded_at.desc()),
+    'events': ChoiceSource(CalendarEvent, CalendarEvent.name, CalendarEvent.event_datetime.desc()),
+}
+
+# name -> (loaded_at, [(id, label), ...] or None when the table is too large to inline)
+_choice_cache = {}
+# name -> number of invalidations, so a list loaded while a commit invalidated it is not stored
+_generations = {}
+_lock = threading.Lock()
+
+def get_choices(name):
+    """Cached [(id, label), ...] for a source, or None if it has more rows than CHOICES_INLINE_LIMIT."""
+    ttl = current_app.config.get('CHOICES_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    with _lock:
+        entry = _choice_cache.get(name)
+        generation = _generations.get(name, 0)
+    if entry is not None and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+    limit = current_app.config.get('CHOICES_INLINE_LIMIT', DEFAULT_INLINE_LIMIT)
+    with primary():  # never cache a lagging replica's rows
+        rows = CHOICE_SOURCES[name].query().limit(limit + 1).all()
+    choices = [(row[0], row[1]) for row in rows] if len(rows) <= limit else None
+    with _lock:
+        if _generations.get(name, 0) == generation:
+            _choice_cache[name] = (time.monotonic(), choices)
+    return choices
+
+def invalidate_choices(name=None):
+    """Forget cached lists for name (or all sources)."""
+    with _lock:
+        for key in (CHOICE_SOURCES if name is None else (name,)):
+            _choice_cache.pop(key, None)
+            _generations[key] = _generations.get(key, 0) + 1
+
+def lookup_choices(name, ids):
+    """[(id, label), ...] for the given ids (the current selection of a type-ahead field)."""
+    ids = [i for i in ids if isinstance(i, int)]
+    if not ids:
+        return []
+    source = CHOICE_SOURCES[name]
+    return [(row[0], row[1]) for row in source.query().filter(source.model.id.in_(ids))]
+
+def search_choices(name, q, limit=TYPEAHEAD_LIMIT):
+    """Type-ahead matches for q, in the source's display order."""
+    source = CHOICE_SOURCES[name]
+    query = source.query()
+    if q:
+        query = query.filter(source.search_filter(q))
+    return [(row[0], row[1]) for row in query.limit(limit)]
+
+def choice_options(name, selected=()):
+    """
+    (choices, typeahead_url) for a dropdown: the cached list and None, or, for a source too
+    large to inline, just the `selected` ids' rows and the /api/choices URL to search the rest.
+    """
+    choices = get_choices(name)
+    if choices is not None:
+        return choices, None
+    return lookup_choices(name, selected), url_for('main.choices_api', name=name)
+
+def apply_choices(field, name, blank=None):
+    """
+    Fill a SelectField's choices from the named source, preceded by `blank` (e.g. (0, '')) if
+    given. For a source too large to inline, only the field's current selection is listed and
+    the field is marked for type-ahead; validation still works because a submitted id that
+    exists is looked up and becomes a valid choice.
+    """
+    selected = field.data if isinstance(field.data, (list, tuple)) else [field.data]
+    choices, typeahead_url = choice_options(name, selected)
+    if typeahead_url:
+        field.render_kw = dict(field.render_kw or {}, **{'data-choices-url': typeahead_url})
+    field.choices = ([blank] if blank else []) + list(choices)
+
+# --- Invalidation hooks ---
+
+_model_sources = {}
+for _name, _source in CHOICE_SOURCES.items():
+    _model_sources.setdefault(_source.model, set()).add(_name)
+
+def _mark(session, model):
+    names = _model_sources.get(model)
+    if names:
+        session.info.setdefault('choices_dirty', set()).update(names)
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        _mark(session, type(obj))
+
+def _do_orm_execute(orm_execute_state):
+    # bulk insert(Model) / query.update() / query.delete() bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _mark(orm_execute_state.session, mapper.class_)
+
+def _after_commit(session):
+    for name in session.info.pop('choices_dirty', ()):
+        invalidate_choices(name)
+
+def _after_rollback(session):
+    session.info.pop('choices_dirty', None)
+
+def init_app(app):
+    """Register the invalidation hooks. Settings: CHOICES_INLINE_LIMIT, CHOICES_CACHE_SECONDS."""
+    app.config.setdefault('CHOICES_INLINE_LIMIT', DEFAULT_INLINE_LIMIT)
+    app.config.setdefault('CHOICES_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
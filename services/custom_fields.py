@@ -1,10 +1,14 @@
 # services/custom_fields.py
 import json
+import threading
+import time
 from wtforms import StringField, TextAreaField, SelectField, RadioField, BooleanField, DateField, IntegerField, FieldList
 from wtforms.validators import InputRequired, Optional
-from models import CustomField, CustomFieldValue
+from models import db, CustomField, CustomFieldValue
+from sqlalchemy.dialects import sqlite, postgresql
 from flask import current_app
 from datetime import datetime
+from utils.db_routing import primary
 
 FIELD_TYPE_MAPPING = {
     'text': StringField,
@@ -22,69 +26,135 @@ def get_custom_fields_for(target):
     q = CustomField.query.filter_by(target=target, visible=True).order_by(CustomField.order.asc(), CustomField.id.asc())
     return q.all()
 
-def attach_custom_fields_to_form(form, target, owner=None):
+def _owner_column(target):
+    return 'case_id' if target == 'case' else 'client_id'
+
+def load_custom_field_values(target, owner):
+    """Return {field_id: CustomFieldValue} for every value stored for owner, in one query."""
+    owner_id = getattr(owner, 'id', None)
+    if owner_id is None:
+        return {}
+    rows = CustomFieldValue.query.filter_by(**{_owner_column(target): owner_id}).all()
+    return {v.field_id: v for v in rows}
+
+class CustomFieldSpec:
+    """Detached snapshot of a CustomField, safe to keep in a process-wide cache."""
+    __slots__ = ('id', 'slug', 'label', 'field_type', 'required', 'help_text', 'choices')
+
+    def __init__(self, cf):
+        self.id = cf.id
+        self.slug = cf.slug
+        self.label = cf.label
+        self.field_type = cf.field_type
+        self.required = bool(cf.required)
+        self.help_text = cf.help_text
+        # options JSON is parsed once here, not on every form build
+        self.choices = cf.get_options_list() if cf.field_type in ('select', 'radio', 'checkbox') else None
+
+def _build_field(spec):
+    """Unbound WTForms field for a custom field definition."""
+    wtfield_cls = FIELD_TYPE_MAPPING.get(spec.field_type, StringField)
+    validators = [InputRequired()] if spec.required else [Optional()]
+
+    # choices for select/radio/checkbox:
+    if spec.choices is not None:
+        choices = list(spec.choices)
+        # For SelectField with no default, add an empty choice if not required
+        if not spec.required:
+            choices = [('', '')] + choices
+        return wtfield_cls(spec.label, choices=choices, validators=validators, description=spec.help_text)
+    if spec.field_type == 'date':
+        return wtfield_cls(spec.label, format='%Y-%m-%d', validators=validators, description=spec.help_text)
+    # text/textarea/number/boolean
+    return wtfield_cls(spec.label, validators=validators, description=spec.help_text)
+
+DEFAULT_CACHE_SECONDS = 30
+
+# target -> (loaded_at, specs, {base form class: compiled subclass}). An entry lives for
+# CUSTOM_FORM_CACHE_SECONDS: the process that edits a definition drops it at once
+# (invalidate_custom_form_cache), other processes rebuild within the TTL
+_form_cache = {}
+# bumped by every invalidation, so definitions read while an edit invalidated them are not stored
+_generation = 0
+_lock = threading.Lock()
+
+def get_custom_form(base_form_cls, target):
     """
-    Given an existing WTForms form instance, attach dynamic fields to it in-memory.
-    - form: instance (not class) of your form
-    - target: 'case' or 'client'
-    - owner: an existing Case/Client instance for edit (optional) to populate current values
-    Returns: list of CustomField objects attached (in order)
+    Return (form_class, specs): a cached subclass of base_form_cls with one `custom_<slug>`
+    field per visible custom field of target, plus the field specs in display order.
+    Only the first call per TTL loads CustomField rows or parses options; the others
+    run no query.
     """
-    fields = get_custom_fields_for(target)
-    for cf in fields:
-        field_name = f'custom_{cf.slug}'
-        wtfield_cls = FIELD_TYPE_MAPPING.get(cf.field_type, StringField)
-
-        validators = [InputRequired()] if cf.required else [Optional()]
-
-        # choices for select/radio/checkbox:
-        if cf.field_type in ('select', 'radio', 'checkbox'):
-            choices = cf.get_options_list()
-            # For SelectField with no default, add an empty choice if not required
-            if not cf.required:
-                choices = [('', '')] + choices
-            wtfield = wtfield_cls(cf.label, choices=choices, validators=validators, description=cf.help_text)
-        elif cf.field_type == 'boolean':
-            wtfield = wtfield_cls(cf.label, validators=validators, description=cf.help_text)
-        elif cf.field_type == 'date':
-            wtfield = wtfield_cls(cf.label, format='%Y-%m-%d', validators=validators, description=cf.help_text)
+    ttl = current_app.config.get('CUSTOM_FORM_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    with _lock:
+        entry = _form_cache.get(target)
+        generation = _generation
+    if entry is None or time.monotonic() - entry[0] >= ttl:
+        with primary():  # never cache a lagging replica's definitions
+            specs = [CustomFieldSpec(cf) for cf in get_custom_fields_for(target)]
+        entry = (time.monotonic(), specs, {})
+        with _lock:
+            if ttl > 0 and _generation == generation:
+                _form_cache[target] = entry
+    _, specs, classes = entry
+    form_cls = classes.get(base_form_cls)
+    if form_cls is None:
+        attrs = {f'custom_{spec.slug}': _build_field(spec) for spec in specs}
+        form_cls = type(f'{base_form_cls.__name__}_{target}_custom', (base_form_cls,), attrs)
+        classes[base_form_cls] = form_cls
+    return form_cls, specs
+
+def invalidate_custom_form_cache(target=None):
+    """Drop compiled forms for target (or all targets); other processes rebuild within the TTL."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if target is None:
+            _form_cache.clear()
         else:
-            # text/textarea/number fallback
-            wtfield = wtfield_cls(cf.label, validators=validators, description=cf.help_text)
-
-        # attach to form instance
-        setattr(form, field_name, wtfield)
-
-        # populate existing value if owner provided
-        if owner:
-            val = None
-            if target == 'case':
-                existing = CustomFieldValue.query.filter_by(field_id=cf.id, case_id=getattr(owner, 'id', None)).first()
-            else:
-                existing = CustomFieldValue.query.filter_by(field_id=cf.id, client_id=getattr(owner, 'id', None)).first()
-            if existing:
-                # decode JSON arrays for checkbox fields
-                v = existing.value
-                try:
-                    parsed = json.loads(v)
-                    form_field_value = parsed
-                except Exception:
-                    form_field_value = v
-                # set attribute value on field (WTForms expects .data)
-                getattr(form, field_name).data = form_field_value
-
-    return fields
+            _form_cache.pop(target, None)
+
+def init_app(app):
+    """Setting: CUSTOM_FORM_CACHE_SECONDS (0 disables the cache)."""
+    app.config.setdefault('CUSTOM_FORM_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+
+def populate_custom_field_values(form, target, owner, specs):
+    """Fill custom_<slug> fields of a form from owner's stored values (one query)."""
+    values = load_custom_field_values(target, owner)
+    for spec in specs:
+        existing = values.get(spec.id)
+        field = getattr(form, f'custom_{spec.slug}', None)
+        if existing is None or field is None:
+            continue
+        # decode JSON values (arrays for checkbox fields, booleans, numbers)
+        try:
+            field.data = json.loads(existing.value)
+        except Exception:
+            field.data = existing.value
+
+def _upsert_statement(dialect_name, target):
+    """INSERT .. ON CONFLICT (field_id, owner) DO UPDATE, or None if the dialect lacks it."""
+    insert = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}.get(dialect_name)
+    if insert is None:
+        return None
+    stmt = insert(CustomFieldValue.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=['field_id', _owner_column(target)],
+        set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at},
+    )
 
 def save_custom_field_values(owner, target, custom_fields, form):
     """
     Persist custom field values from form to CustomFieldValue rows for owner (Case/Client).
     - owner: Case or Client model instance
     - target: 'case' or 'client'
-    - custom_fields: list of CustomField objects (as returned by get_custom_fields_for)
+    - custom_fields: CustomFieldSpec list (as returned by get_custom_form) or CustomField objects
     - form: the form instance that now has fields attached
+    All values are written with a single bulk upsert keyed on (field_id, case_id/client_id).
     """
-    # helper to pick owner id field name
-    owner_id_name = 'case_id' if target == 'case' else 'client_id'
+    owner_id_name = _owner_column(target)
+    now = datetime.utcnow()
+    rows = []
     for cf in custom_fields:
         field_name = f'custom_{cf.slug}'
         if not hasattr(form, field_name):
@@ -97,31 +167,29 @@ def save_custom_field_values(owner, target, custom_fields, form):
             # Expect raw to be list-like. Save as JSON
             to_store = json.dumps(raw if raw is not None else [])
         else:
-            # boolean -> '1'/'0' or store JSON true/false? We'll store as string via json to preserve types
             # Use json.dumps to preserve booleans and numbers consistently
             try:
                 to_store = json.dumps(raw)
             except Exception:
                 to_store = str(raw) if raw is not None else None
 
-        # find existing value
-        filters = {'field_id': cf.id}
-        if target == 'case':
-            filters['case_id'] = owner.id
-            existing = CustomFieldValue.query.filter_by(**filters).first()
-        else:
-            filters['client_id'] = owner.id
-            existing = CustomFieldValue.query.filter_by(**filters).first()
+        rows.append({'field_id': cf.id, owner_id_name: owner.id, 'value': to_store,
+                     'created_at': now, 'updated_at': now})
+    if not rows:
+        return
+
+    stmt = _upsert_statement(db.session.get_bind().dialect.name, target)
+    if stmt is not None:
+        db.session.execute(stmt, rows)
+        return
 
-        if existing:
-            existing.value = to_store
-            existing.updated_at = datetime.utcnow()
+    # fallback for dialects without ON CONFLICT: update loaded rows, add the rest
+    existing = load_custom_field_values(target, owner)
+    for row in rows:
+        current = existing.get(row['field_id'])
+        if current:
+            current.value = row['value']
+            current.updated_at = now
         else:
-            kwargs = {'field_id': cf.id, 'value': to_store}
-            if target == 'case':
-                kwargs['case_id'] = owner.id
-            else:
-                kwargs['client_id'] = owner.id
-            newv = CustomFieldValue(**kwargs)
-            db.session.add(newv)
-    # commit is caller's responsibility
\ No newline at end of file
+            db.session.add(CustomFieldValue(**row))
+    # commit is caller's responsibility
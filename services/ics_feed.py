@@ -0,0 +1,246 @@
+# services/ics_feed.py
+# iCalendar (RFC 5545) feeds of CalendarEvents for one user or one case, for subscribing from
+# Outlook/Google/Apple calendars. Feed URLs carry a signed, revocable token instead of a login.
+# - A full feed has every event (and deadline) from FEED_PAST_DAYS ago onwards.
+# - ?sync_token=<X-Sync-Token of a previous pull> returns only the events changed since then,
+#   plus STATUS:CANCELLED entries for events deleted or moved out of the feed (tombstones).
+# - The ETag is computed from a count/max(updated_at) query, so an unchanged feed answers
+#   If-None-Match with a 304 without loading a single event.
+import hashlib
+import re
+from datetime import datetime, timedelta
+import click
+from flask import current_app, url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import event, func, or_
+from models import db, CalendarEvent, CalendarEventTombstone, User, UserRole
+from services.pagination import encode_cursor, decode_cursor, InvalidCursor
+from utils.db_routing import primary
+
+FEED_SCOPES = ('user', 'case')
+DEFAULT_PAST_DAYS = 90
+# tombstones older than this are pruned (`flask calendar-prune`); older sync tokens get a full feed
+DEFAULT_TOMBSTONE_DAYS = 90
+# a change stamped just before a token was issued but committed after it is still picked up
+SYNC_OVERLAP = timedelta(seconds=60)
+PRODID = '-//Law Firm CMS//Calendar Feed//EN'
+
+class InvalidFeedToken(ValueError):
+    pass
+
+# --- Feed URLs ---
+# A token signs [scope, id, holder user id, holder's calendar_feed_version]. It stops working
+# when the holder is deactivated, loses the role that may read case calendars, or rotates
+# their feed URLs (bumping calendar_feed_version revokes every URL issued to them).
+
+# roles that may subscribe to a case's calendar (the team roles of auth.team_required)
+CASE_FEED_ROLES = (UserRole.attorney, UserRole.manager, UserRole.staff, UserRole.superuser)
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='calendar-feed')
+
+def feed_token(scope, ref_id, holder):
+    return _serializer().dumps([scope, ref_id, holder.id, holder.calendar_feed_version])
+
+def _may_subscribe(holder, scope, ref_id):
+    if holder is None or not holder.is_active:
+        return False
+    if scope == 'user':
+        return holder.id == ref_id
+    return holder.role in CASE_FEED_ROLES
+
+def read_feed_token(token):
+    """
+    (scope, id) from a feed URL token; raises InvalidFeedToken if it was not issued by us,
+    was revoked, or its holder may no longer read that calendar.
+    """
+    try:
+        scope, ref_id, holder_id, version = _serializer().loads(token)
+    except (BadSignature, TypeError, ValueError):
+        raise InvalidFeedToken(token)
+    if scope not in FEED_SCOPES or not all(isinstance(v, int) for v in (ref_id, holder_id, version)):
+        raise InvalidFeedToken(token)
+    with primary():  # a rotation must take effect at once, not after replication lag
+        holder = db.session.get(User, holder_id)
+    if not _may_subscribe(holder, scope, ref_id) or holder.calendar_feed_version != version:
+        raise InvalidFeedToken(token)
+    return scope, ref_id
+
+def feed_url(scope, ref_id, holder):
+    return url_for('main.calendar_feed', token=feed_token(scope, ref_id, holder), _external=True)
+
+def rotate_feed_urls(user):
+    """Revoke every feed URL issued to user; the caller commits."""
+    user.calendar_feed_version = (user.calendar_feed_version or 0) + 1
+
+# --- Queries ---
+
+def _in_scope(model, scope, ref_id):
+    return (model.user_id if scope == 'user' else model.case_id) == ref_id
+
+def _read_sync_token(sync_token):
+    """The datetime a token was issued at, or None (no token, malformed or past retention: full feed)."""
+    if not sync_token:
+        return None
+    try:
+        (issued_at,) = decode_cursor(sync_token, [CalendarEvent.updated_at])
+    except InvalidCursor:
+        return None
+    retention = timedelta(days=current_app.config.get('FEED_TOMBSTONE_DAYS', DEFAULT_TOMBSTONE_DAYS))
+    if not isinstance(issued_at, datetime) or issued_at < datetime.utcnow() - retention:
+        return None
+    return issued_at
+
+def feed_etag(scope, ref_id, sync_token=None):
+    """Fingerprint of everything the feed would contain, from two aggregate queries."""
+    events = (db.session.query(func.count(CalendarEvent.id), func.max(CalendarEvent.updated_at))
+              .filter(_in_scope(CalendarEvent, scope, ref_id)).one())
+    removed = (db.session.query(func.count(CalendarEventTombstone.id), func.max(CalendarEventTombstone.removed_at))
+               .filter(_in_scope(CalendarEventTombstone, scope, ref_id)).one())
+    since = _read_sync_token(sync_token)
+    # the full feed's window moves daily
+    parts = (scope, ref_id, since, datetime.utcnow().date() if since is None else None) + tuple(events) + tuple(removed)
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def _changes(scope, ref_id, since):
+    if since is None:
+        start = datetime.utcnow() - timedelta(days=current_app.config.get('FEED_PAST_DAYS', DEFAULT_PAST_DAYS))
+        events = (CalendarEvent.query.filter(_in_scope(CalendarEvent, scope, ref_id))
+                  .filter(or_(CalendarEvent.event_datetime >= start, CalendarEvent.deadline_datetime >= start))
+                  .order_by(CalendarEvent.event_datetime).all())
+        return events, []
+    after = since - SYNC_OVERLAP
+    events = (CalendarEvent.query.filter(_in_scope(CalendarEvent, scope, ref_id), CalendarEvent.updated_at > after)
+              .order_by(CalendarEvent.event_datetime).all())
+    removed = (CalendarEventTombstone.query
+               .filter(_in_scope(CalendarEventTombstone, scope, ref_id), CalendarEventTombstone.removed_at > after)
+               .all())
+    # an event moved away and back again is live, not cancelled
+    live = {e.id for e in events}
+    return events, [t for t in removed if t.event_id not in live]
+
+# --- iCalendar serialization ---
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(h|hrs?|hours?|m|mins?|minutes?)?\b', re.IGNORECASE)
+
+def parse_duration(text):
+    """timedelta for free-text lengths like '1 hour', '90 min', '1h 30m' or '45'; None if unparseable."""
+    minutes = 0.0
+    for number, unit in _DURATION_RE.findall(text or ''):
+        minutes += float(number) * (60 if unit.lower().startswith('h') else 1)
+    return timedelta(minutes=minutes) if minutes > 0 else None
+
+def _escape(text):
+    return (str(text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def _fold(line):
+    # content lines are at most 75 octets; continuations start with a space (RFC 5545 3.1)
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts)
+
+def _local(dt):
+    # stored datetimes are wall-clock times, so they go out as floating times
+    return dt.strftime('%Y%m%dT%H%M%S')
+
+def _utc(dt):
+    return (dt or datetime.utcnow()).strftime('%Y%m%dT%H%M%SZ')
+
+def _vevent(uid, start, summary, stamp, end=None, description=None, url=None, cancelled=False):
+    lines = ['BEGIN:VEVENT', f'UID:{uid}', f'DTSTAMP:{_utc(stamp)}', f'LAST-MODIFIED:{_utc(stamp)}',
+             f'DTSTART:{_local(start)}']
+    if end is not None:
+        lines.append(f'DTEND:{_local(end)}')
+    lines.append(f'SUMMARY:{_escape(summary)}')
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    if url:
+        lines.append(f'URL:{url}')
+    lines.append('STATUS:CANCELLED' if cancelled else 'STATUS:CONFIRMED')
+    lines.append('END:VEVENT')
+    return lines
+
+def _event_lines(ev, domain, incremental):
+    url = url_for('main.event_detail', event_id=ev.id, _external=True)
+    duration = parse_duration(ev.time_length)
+    lines = _vevent(f'event-{ev.id}@{domain}', ev.event_datetime, ev.name, ev.updated_at,
+                    end=ev.event_datetime + duration if duration else None,
+                    description='Completed' if ev.completed else None, url=url)
+    if ev.deadline and ev.deadline_datetime:
+        lines += _vevent(f'deadline-{ev.id}@{domain}', ev.deadline_datetime, f'Due: {ev.name}', ev.updated_at,
+                         description='Completed' if ev.completed else None, url=url)
+    elif incremental:
+        # the deadline may just have been removed
+        lines += _vevent(f'deadline-{ev.id}@{domain}', ev.event_datetime, f'Due: {ev.name}', ev.updated_at,
+                         cancelled=True)
+    return lines
+
+def build_feed(scope, ref_id, name, sync_token=None):
+    """Return (ics_text, next_sync_token) for the feed, incremental if sync_token is still valid."""
+    issued_at = datetime.utcnow()
+    since = _read_sync_token(sync_token)
+    events, removed = _changes(scope, ref_id, since)
+    domain = current_app.config.get('FEED_UID_DOMAIN') or 'lawfirm-cms'
+    next_token = encode_cursor([issued_at])
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+             f'X-WR-CALNAME:{_escape(name)}', f'X-CMS-SYNC-TOKEN:{next_token}']
+    for ev in events:
+        lines += _event_lines(ev, domain, incremental=since is not None)
+    for t in removed:
+        for kind in ('event', 'deadline'):
+            lines += _vevent(f'{kind}-{t.event_id}@{domain}', t.event_datetime, '', t.removed_at, cancelled=True)
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n', next_token
+
+# --- Tombstones ---
+
+def _previous(obj, attr):
+    history = db.inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else None
+
+def _before_flush(session, flush_context, instances):
+    for obj in session.deleted:
+        if isinstance(obj, CalendarEvent) and obj.id is not None:
+            session.add(CalendarEventTombstone(event_id=obj.id, user_id=obj.user_id, case_id=obj.case_id,
+                                               event_datetime=obj.event_datetime))
+    for obj in session.dirty:
+        if not isinstance(obj, CalendarEvent) or obj.id is None:
+            continue
+        # moved to another user or case: cancel it in the feed it left
+        for attr in ('user_id', 'case_id'):
+            old = _previous(obj, attr)
+            if old is not None and old != getattr(obj, attr):
+                session.add(CalendarEventTombstone(event_id=obj.id, event_datetime=obj.event_datetime, **{attr: old}))
+
+def prune_tombstones(days=None):
+    days = current_app.config.get('FEED_TOMBSTONE_DAYS', DEFAULT_TOMBSTONE_DAYS) if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = CalendarEventTombstone.query.filter(CalendarEventTombstone.removed_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+def init_app(app):
+    """Register the tombstone hook and the `flask calendar-prune` command."""
+    app.config.setdefault('FEED_PAST_DAYS', DEFAULT_PAST_DAYS)
+    app.config.setdefault('FEED_TOMBSTONE_DAYS', DEFAULT_TOMBSTONE_DAYS)
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
+
+    @app.cli.command('calendar-prune')
+    @click.option('--days', type=int, default=None, help='Keep tombstones newer than this (default FEED_TOMBSTONE_DAYS).')
+    def calendar_prune_command(days):
+        """Delete ICS feed tombstones older than the sync-token retention."""
+        with app.app_context():
+            removed = prune_tombstones(days)
+        click.echo(f'Removed {removed} tombstone(s).')
@@ -0,0 +1,164 @@
+# services/jobs.py
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from sqlalchemy import update
+from models import db, Job, JobStatus
+
+POLL_INTERVAL = 1.0
+# retry n waits RETRY_BASE_SECONDS * 2**(n-1)
+RETRY_BASE_SECONDS = 10
+# a running job whose worker has not checkpointed for this long is assumed dead and requeued
+STALE_AFTER = timedelta(minutes=10)
+
+# kind -> callable(job, payload)
+_handlers = {}
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures a retry cannot fix (e.g. the case was deleted)."""
+
+def job_handler(kind):
+    """
+    Register the function that runs jobs of `kind`. The handler receives the claimed
+    Job and its decoded payload, does its work and calls checkpoint() as it goes.
+    Raising retries the job (up to max_attempts) unless the error is a PermanentJobError.
+    """
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+def enqueue(kind, payload, user_id=None, total=0, max_attempts=3):
+    """Queue a job and commit it so workers can see it. Returns the Job."""
+    if kind not in _handlers:
+        raise ValueError(f"No job handler registered for {kind!r}")
+    job = Job(kind=kind, payload=json.dumps(payload), user_id=user_id, total=total,
+              max_attempts=max_attempts, run_after=datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+    if current_app.config.get('JOBS_RUN_INLINE'):
+        # development/testing without a worker: run it now, in this request
+        if claim(job.id, 'inline'):
+            run_job(job)
+    return job
+
+def checkpoint(job, completed=None, result=None):
+    """
+    Record progress and commit, together with whatever the handler added to the session,
+    so a retry can resume from `completed` without redoing committed work.
+    """
+    if completed is not None:
+        job.completed = completed
+    if result is not None:
+        job.result = json.dumps(result)
+    job.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+
+def claim(job_id, worker_id):
+    """Atomically move a queued job to running; False if another worker got there first."""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.queued)
+        .values(status=JobStatus.running, locked_by=worker_id, started_at=now,
+                heartbeat_at=now, attempts=Job.attempts + 1)
+    )
+    db.session.commit()
+    return claimed.rowcount == 1
+
+def claim_next(worker_id):
+    """Claim the oldest due job, or return None if there is nothing to do."""
+    due = (
+        db.session.query(Job.id)
+        .filter(Job.status == JobStatus.queued, Job.run_after <= datetime.utcnow())
+        .order_by(Job.run_after, Job.id)
+        .limit(5)
+        .all()
+    )
+    for (job_id,) in due:
+        if claim(job_id, worker_id):
+            return db.session.get(Job, job_id)
+    return None
+
+def _finish(job, status, error=None):
+    job.status = status
+    job.error = error
+    job.locked_by = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def _fail(job, error, permanent=False):
+    if permanent or job.attempts >= job.max_attempts:
+        _finish(job, JobStatus.failed, error)
+        return
+    job.status = JobStatus.queued
+    job.error = error
+    job.locked_by = None
+    job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+    db.session.commit()
+
+def run_job(job):
+    """Run a claimed job to completion, scheduling a retry or marking it failed on error."""
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        _finish(job, JobStatus.failed, f"No job handler registered for {job.kind!r}")
+        return False
+    try:
+        handler(job, job.get_payload())
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+        _fail(job, f"{type(e).__name__}: {e}", permanent=isinstance(e, PermanentJobError))
+        return False
+    _finish(job, JobStatus.succeeded)
+    return True
+
+def requeue_stale():
+    """Put running jobs whose worker stopped checkpointing back in the queue."""
+    cutoff = datetime.utcnow() - STALE_AFTER
+    stale = Job.query.filter(Job.status == JobStatus.running, Job.heartbeat_at < cutoff).all()
+    for job in stale:
+        _fail(job, f"Worker {job.locked_by} stopped responding")
+    return len(stale)
+
+def work(app, worker_id=None, poll_interval=POLL_INTERVAL, burst=False):
+    """
+    Worker loop: claim and run due jobs until interrupted (or, with burst=True,
+    until the queue is empty). Returns the number of jobs run.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    ran = 0
+    last_stale_check = 0.0
+    while True:
+        with app.app_context():
+            if time.monotonic() - last_stale_check > STALE_AFTER.total_seconds() / 2:
+                requeue_stale()
+                last_stale_check = time.monotonic()
+            job = claim_next(worker_id)
+            if job is not None:
+                app.logger.info("Worker %s running job %s (%s)", worker_id, job.id, job.kind)
+                run_job(job)
+                ran += 1
+                continue
+        if burst:
+            return ran
+        time.sleep(poll_interval)
+
+def init_app(app):
+    """Register the `flask worker` CLI command."""
+    @app.cli.command('worker')
+    @click.option('--poll-interval', default=POLL_INTERVAL, show_default=True, help='Seconds to wait when the queue is empty.')
+    @click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+    def worker_command(poll_interval, burst):
+        """Run queued background jobs (document generation, ...)."""
+        click.echo('Worker started; press Ctrl+C to stop.')
+        try:
+            ran = work(app, poll_interval=poll_interval, burst=burst)
+        except KeyboardInterrupt:
+            click.echo('Worker stopped.')
+            return
+        click.echo(f'Ran {ran} job(s).')
@@ -0,0 +1,53 @@
+# services/note_queries.py
+# The notes timeline: notes newest first, keyset-paginated on (created_at, id), optionally
+# filtered by text search, user and case. Each filter combination is served by an index
+# (Note: created_at, (user_id, created_at), (case_id, created_at); search by the services.search
+# index), and rows are read as column projections with the user name and case style joined
+# on, so a page costs one query however many notes it shows.
+from models import db, Note, User, Case
+from services import search as search_index
+from services.pagination import keyset_paginate
+
+NOTE_TIMELINE_COLUMNS = (
+    Note.id,
+    Note.note,
+    Note.created_at,
+    Note.user_id,
+    User.name.label('user_name'),
+    Note.case_id,
+    Case.style.label('case_style'),
+)
+
+# unique, non-null pagination key (newest first)
+NOTE_TIMELINE_KEY = (Note.created_at, Note.id)
+
+def notes_timeline_query(search=None, user_id=None, case_id=None):
+    """Timeline rows (NOTE_TIMELINE_COLUMNS) matching every given filter; compose further as needed."""
+    query = (db.session.query(*NOTE_TIMELINE_COLUMNS)
+             .outerjoin(User, Note.user_id == User.id)
+             .outerjoin(Case, Note.case_id == Case.id))
+    if search:
+        query = query.filter(search_index.search_condition(
+            'note', Note.id, search, fallback=Note.note.ilike(f"%{search}%")))
+    if user_id:
+        query = query.filter(Note.user_id == user_id)
+    if case_id:
+        query = query.filter(Note.case_id == case_id)
+    return query
+
+def notes_timeline_page(search=None, user_id=None, case_id=None, after=None, before=None, page_size=None):
+    """One KeysetPage of the timeline. Raises InvalidCursor for malformed cursors."""
+    query = notes_timeline_query(search, user_id, case_id)
+    kwargs = {'page_size': page_size} if page_size else {}
+    return keyset_paginate(query, list(NOTE_TIMELINE_KEY), after=after, before=before, **kwargs)
+
+def note_row_to_dict(row):
+    return {
+        'id': row.id,
+        'note': row.note,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'user_id': row.user_id,
+        'user_name': row.user_name,
+        'case_id': row.case_id,
+        'case_style': row.case_style,
+    }
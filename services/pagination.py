@@ -0,0 +1,113 @@
+# services/pagination.py
+import base64
+import json
+from datetime import datetime, date
+from sqlalchemy import and_, or_, DateTime, Date
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class InvalidCursor(ValueError):
+    pass
+
+class KeysetPage:
+    """One page of keyset-paginated results plus opaque cursors for its neighbours."""
+    def __init__(self, items, page_size, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, maximum))
+
+def encode_cursor(values):
+    """Encode the sort-key values of a row into an opaque, URL-safe token."""
+    raw = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, columns):
+    """Decode a token produced by encode_cursor() back into values typed for `columns`."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise InvalidCursor(token)
+        values = []
+        for col, v in zip(columns, raw):
+            if v is not None and isinstance(col.type, DateTime):
+                v = datetime.fromisoformat(v)
+            elif v is not None and isinstance(col.type, Date):
+                v = date.fromisoformat(v)
+            values.append(v)
+        return values
+    except InvalidCursor:
+        raise
+    except Exception:
+        raise InvalidCursor(token)
+
+def _seek_condition(columns, values, descending):
+    """
+    Row-value comparison `(c1, c2, ...) < (v1, v2, ...)` (or `>`) spelled out with
+    AND/OR so it works on every backend and can use a composite index.
+    """
+    clauses = []
+    for i, col in enumerate(columns):
+        cmp = col < values[i] if descending else col > values[i]
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], cmp))
+    return or_(*clauses)
+
+def keyset_paginate(query, columns, after=None, before=None, page_size=DEFAULT_PAGE_SIZE, descending=True, row_key=None):
+    """
+    Paginate `query` by the unique, non-null sort key `columns` (e.g. created_at, id).
+    - after: cursor of the last row of the previous page (move forward)
+    - before: cursor of the first row of the next page (move backward)
+    - row_key: callable(row) -> key values; defaults to reading the column names off the row
+    Any filters already applied to `query` (search, owner, ...) are preserved, so callers
+    compose filtering and pagination freely. Raises InvalidCursor for malformed tokens.
+    """
+    row_key = row_key or (lambda row: [getattr(row, c.key) for c in columns])
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+
+    q = query
+    if cursor:
+        q = q.filter(_seek_condition(columns, decode_cursor(cursor, columns), descending != backwards))
+    if descending != backwards:
+        q = q.order_by(*[c.desc() for c in columns])
+    else:
+        q = q.order_by(*[c.asc() for c in columns])
+
+    rows = q.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    # Moving forward we know whether more rows follow; moving backward we know whether
+    # more rows precede. The other direction is implied by having arrived via a cursor.
+    next_cursor = prev_cursor = None
+    if rows:
+        if (has_more and not backwards) or backwards:
+            next_cursor = encode_cursor(row_key(rows[-1]))
+        if (has_more and backwards) or (cursor and not backwards):
+            prev_cursor = encode_cursor(row_key(rows[0]))
+    return KeysetPage(rows, page_size, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,201 @@
+# services/profiling.py
+# Per-request database profiling. Engine events time every statement and attribute it to the
+# current request (query count, DB time, rows); statements slower than SLOW_QUERY_MS are logged
+# with their endpoint. Finished requests feed per-endpoint aggregates (p50/p95 latency,
+# queries/request) shown on /admin/profiling, and PROFILE_SERVER_TIMING adds a Server-Timing
+# response header so the numbers show up in the browser's network panel.
+import threading
+import time
+from collections import deque
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db
+
+DEFAULT_SLOW_QUERY_MS = 250
+# most recent requests kept per endpoint for the percentiles
+DEFAULT_SAMPLES = 500
+SLOW_QUERY_LOG_SIZE = 50
+EXTENSION_KEY = 'cms_profiling'
+
+class RequestProfile:
+    __slots__ = ('started', 'queries', 'db_seconds', 'rows', 'recorded')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.recorded = False
+
+class EndpointStats:
+    def __init__(self, samples):
+        self.count = 0
+        self.errors = 0
+        # (elapsed ms, queries, db ms, rows) of the most recent requests
+        self.recent = deque(maxlen=samples)
+
+def _percentile(sorted_values, pct):
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class Profiler:
+    """Thread-safe per-endpoint aggregates plus a ring buffer of recent slow queries."""
+    def __init__(self, samples=DEFAULT_SAMPLES):
+        self.samples = samples
+        self._endpoints = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, profile, elapsed_ms, error=False):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(self.samples)
+            stats.count += 1
+            stats.errors += int(error)
+            stats.recent.append((elapsed_ms, profile.queries, profile.db_seconds * 1000, profile.rows))
+
+    def record_slow_query(self, endpoint, elapsed_ms, statement):
+        with self._lock:
+            self.slow_queries.appendleft({'endpoint': endpoint, 'ms': elapsed_ms, 'statement': statement,
+                                          'at': time.time()})
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.slow_queries.clear()
+
+    def stats(self):
+        """One dict per endpoint, slowest p95 first."""
+        with self._lock:
+            snapshot = [(name, s.count, s.errors, list(s.recent)) for name, s in self._endpoints.items()]
+        rows = []
+        for name, count, errors, recent in snapshot:
+            latencies = sorted(r[0] for r in recent)
+            n = len(recent)
+            rows.append({
+                'endpoint': name,
+                'requests': count,
+                'errors': errors,
+                'p50_ms': _percentile(latencies, 50),
+                'p95_ms': _percentile(latencies, 95),
+                'max_ms': latencies[-1] if latencies else 0.0,
+                'queries_avg': sum(r[1] for r in recent) / n if n else 0.0,
+                'queries_max': max((r[1] for r in recent), default=0),
+                'db_ms_avg': sum(r[2] for r in recent) / n if n else 0.0,
+                'rows_avg': sum(r[3] for r in recent) / n if n else 0.0,
+            })
+        rows.sort(key=lambda r: r['p95_ms'], reverse=True)
+        return rows
+
+def current_profile():
+    """The RequestProfile of the request being handled, or None (no request, profiling off)."""
+    if has_request_context():
+        return g.get('_profile')
+    return None
+
+def get_profiler(app=None):
+    return (app or current_app).extensions[EXTENSION_KEY]
+
+def _endpoint():
+    if not has_request_context():
+        return '-'
+    return request.endpoint or 'unmatched'
+
+# ---------------------------------------------------------------------------
+# Engine / ORM hooks (registered on the Engine class, so every engine is covered)
+# ---------------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('cms_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('cms_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if not has_request_context():
+        return
+    profile = g.get('_profile')
+    if profile is None:
+        return
+    profile.queries += 1
+    profile.db_seconds += elapsed
+    if not statement.lstrip()[:6].upper().startswith('SELECT') and cursor.rowcount > 0:
+        profile.rows += cursor.rowcount  # rows written; rows read are counted as they load
+    app = current_app
+    threshold = app.config['SLOW_QUERY_MS']
+    if threshold is not None and elapsed * 1000 >= threshold:
+        endpoint = _endpoint()
+        app.logger.warning("Slow query (%.1f ms) in %s: %s", elapsed * 1000, endpoint, statement)
+        get_profiler(app).record_slow_query(endpoint, elapsed * 1000, statement)
+
+def _handle_error(exception_context):
+    # the statement failed, so after_cursor_execute will not pop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('cms_query_start'):
+        conn.info['cms_query_start'].pop()
+
+def _on_load(target, context):
+    profile = current_profile()
+    if profile is not None:
+        profile.rows += 1
+
+# ---------------------------------------------------------------------------
+# Request hooks
+# ---------------------------------------------------------------------------
+
+def _server_timing(profile, elapsed_ms):
+    return (f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.queries} queries", '
+            f'app;dur={elapsed_ms:.1f}')
+
+def init_app(app):
+    """
+    Register the engine and request hooks. Settings:
+    - PROFILE_REQUESTS (default True): collect per-request numbers and endpoint aggregates
+    - SLOW_QUERY_MS (default 250, None disables): log statements at least this slow
+    - PROFILE_SERVER_TIMING (default False): add a Server-Timing header to responses
+    - PROFILE_SAMPLES (default 500): recent requests per endpoint used for percentiles
+    """
+    app.config.setdefault('PROFILE_REQUESTS', True)
+    app.config.setdefault('SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+    app.config.setdefault('PROFILE_SERVER_TIMING', False)
+    app.config.setdefault('PROFILE_SAMPLES', DEFAULT_SAMPLES)
+    app.extensions[EXTENSION_KEY] = Profiler(app.config['PROFILE_SAMPLES'])
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        event.listen(db.Model, 'load', _on_load, propagate=True)
+
+    @app.before_request
+    def start_profile():
+        if app.config['PROFILE_REQUESTS'] and request.endpoint != 'static':
+            g._profile = RequestProfile()
+
+    def finish(profile, status_code, error=False):
+        profile.recorded = True
+        elapsed_ms = (time.perf_counter() - profile.started) * 1000
+        get_profiler(app).record(_endpoint(), profile, elapsed_ms, error=error or status_code >= 500)
+        return elapsed_ms
+
+    @app.after_request
+    def record_profile(response):
+        profile = current_profile()
+        if profile is not None and not profile.recorded:
+            elapsed_ms = finish(profile, response.status_code)
+            if app.config['PROFILE_SERVER_TIMING']:
+                response.headers['Server-Timing'] = _server_timing(profile, elapsed_ms)
+        return response
+
+    @app.teardown_request
+    def record_failed_profile(exc):
+        # after_request does not run when the view raised
+        profile = current_profile()
+        if profile is not None and not profile.recorded:
+            finish(profile, 500, error=True)
@@ -0,0 +1,322 @@
+# services/search.py
+# Full-text search over cases, notes and people.
+# SQLite uses an FTS5 virtual table (search_index); PostgreSQL uses a table with a generated
+# tsvector column and a GIN index (search_document). Other backends, or a SQLite build without
+# FTS5, fall back to the callers' ILIKE filters. The index is kept in sync from session flush
+# hooks, inside the same transaction as the change that triggered it.
+import re
+import click
+from sqlalchemy import event, select, text, bindparam, literal_column
+from models import db, Case, CaseParty, Note, PersonEntity
+
+KIND_CODES = {'case': 1, 'note': 2, 'person': 3}
+KIND_NAMES = {v: k for k, v in KIND_CODES.items()}
+
+# weight of the title column relative to the body column when ranking (bm25)
+TITLE_WEIGHT = 10.0
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+)
+POSTGRES_DDL = (
+    """CREATE TABLE IF NOT EXISTS search_document (
+        kind VARCHAR(20) NOT NULL,
+        ref_id INTEGER NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        body TEXT NOT NULL DEFAULT '',
+        tsv TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+        ) STORED,
+        PRIMARY KEY (kind, ref_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING GIN (tsv)",
+)
+
+# engine url -> backend name ('sqlite', 'postgresql' or None when unavailable)
+_backends = {}
+
+class SearchHit:
+    def __init__(self, kind, ref_id, title, rank):
+        self.kind = kind
+        self.ref_id = ref_id
+        self.title = title
+        self.rank = rank
+
+    def to_dict(self):
+        return {'kind': self.kind, 'id': self.ref_id, 'title': self.title, 'rank': self.rank}
+
+def _rowid(kind, ref_id):
+    # FTS5 rows are addressed by rowid, so encode (kind, id) into it to keep
+    # single-document updates and deletes an O(log n) rowid lookup.
+    return ref_id * 4 + KIND_CODES[kind]
+
+def _tokens(q):
+    return re.findall(r'\w+', q or '', flags=re.UNICODE)
+
+def _sqlite_match(q):
+    return ' '.join('"%s"*' % t.replace('"', '') for t in _tokens(q))
+
+def _postgres_tsquery(q):
+    return ' & '.join('%s:*' % t for t in _tokens(q))
+
+def _join(*parts):
+    return ' '.join(p for p in parts if p)
+
+def backend(connection=None):
+    """Return the active search backend for the current engine, or None if unavailable."""
+    engine = connection.engine if connection is not None else db.engine
+    key = str(engine.url)
+    if key not in _backends:
+        _backends[key] = _detect_backend(connection or engine)
+    return _backends[key]
+
+def _detect_backend(bind):
+    dialect = bind.dialect.name
+    if dialect == 'sqlite':
+        with _connect(bind) as conn:
+            found = conn.execute(text("SELECT name FROM sqlite_master WHERE name = 'search_index'")).first()
+        return 'sqlite' if found else None
+    if dialect == 'postgresql':
+        with _connect(bind) as conn:
+            found = conn.execute(text("SELECT to_regclass('search_document')")).scalar()
+        return 'postgresql' if found else None
+    return None
+
+class _connect:
+    """Use a given Connection as-is, or open (and close) one from an Engine."""
+    def __init__(self, bind):
+        self.bind = bind
+        self.conn = None
+
+    def __enter__(self):
+        if hasattr(self.bind, 'connect'):
+            self.conn = self.bind.connect()
+            return self.conn
+        return self.bind
+
+    def __exit__(self, *exc):
+        if self.conn is not None:
+            self.conn.close()
+
+# --- Document builders (Core queries, safe to run inside after_flush) ---
+
+def _case_documents(conn, case_ids=None):
+    cases = select(Case.id, Case.style, Case.case_number)
+    parties = (
+        select(CaseParty.case_id, PersonEntity.full_name, PersonEntity.business_name)
+        .join(PersonEntity, PersonEntity.id == CaseParty.person_entity_id)
+    )
+    notes = select(Note.case_id, Note.note).where(Note.case_id.isnot(None))
+    if case_ids is not None:
+        cases = cases.where(Case.id.in_(case_ids))
+        parties = parties.where(CaseParty.case_id.in_(case_ids))
+        notes = notes.where(Note.case_id.in_(case_ids))
+    body = {}
+    for case_id, full_name, business_name in conn.execute(parties):
+        body.setdefault(case_id, []).append(_join(full_name, business_name))
+    for case_id, note in conn.execute(notes):
+        body.setdefault(case_id, []).append(note or '')
+    for case_id, style, case_number in conn.execute(cases):
+        yield 'case', case_id, _join(style, case_number), ' '.join(body.get(case_id, []))
+
+def _note_documents(conn, note_ids=None):
+    q = select(Note.id, Note.note)
+    if note_ids is not None:
+        q = q.where(Note.id.in_(note_ids))
+    for note_id, note in conn.execute(q):
+        note = note or ''
+        # a short title gives type-ahead something to display
+        yield 'note', note_id, note[:80], note
+
+def _person_documents(conn, person_ids=None):
+    q = select(PersonEntity.id, PersonEntity.full_name, PersonEntity.business_name)
+    if person_ids is not None:
+        q = q.where(PersonEntity.id.in_(person_ids))
+    for person_id, full_name, business_name in conn.execute(q):
+        yield 'person', person_id, _join(full_name, business_name), ''
+
+_BUILDERS = {'case': _case_documents, 'note': _note_documents, 'person': _person_documents}
+
+# --- Index writes ---
+
+def _delete(conn, name, kind, ids):
+    if not ids:
+        return
+    if name == 'sqlite':
+        conn.execute(text("DELETE FROM search_index WHERE rowid = :rid"), [{'rid': _rowid(kind, i)} for i in ids])
+    else:
+        conn.execute(text("DELETE FROM search_document WHERE kind = :kind AND ref_id IN :ids")
+                     .bindparams(bindparam('ids', expanding=True)), {'kind': kind, 'ids': list(ids)})
+
+def _write(conn, name, docs):
+    docs = list(docs)
+    if not docs:
+        return
+    if name == 'sqlite':
+        conn.execute(text("INSERT OR REPLACE INTO search_index (rowid, title, body) VALUES (:rid, :title, :body)"),
+                     [{'rid': _rowid(k, i), 'title': t, 'body': b} for k, i, t, b in docs])
+    else:
+        conn.execute(text(
+            "INSERT INTO search_document (kind, ref_id, title, body) VALUES (:kind, :ref_id, :title, :body) "
+            "ON CONFLICT (kind, ref_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body"),
+            [{'kind': k, 'ref_id': i, 'title': t, 'body': b} for k, i, t, b in docs])
+
+def reindex(conn, kind, ids):
+    """Rebuild the index entries for the given ids of `kind`; ids that no longer exist are removed."""
+    name = backend(conn)
+    if name is None or not ids:
+        return
+    ids = set(ids)
+    _delete(conn, name, kind, ids)
+    _write(conn, name, _BUILDERS[kind](conn, ids))
+
+def create_index(engine=None):
+    """Create the search table for the current backend. Returns True if it did not exist before."""
+    engine = engine or db.engine
+    dialect = engine.dialect.name
+    existed = _detect_backend(engine) is not None
+    try:
+        with engine.begin() as conn:
+            if dialect == 'sqlite':
+                conn.execute(text(SQLITE_DDL))
+            elif dialect == 'postgresql':
+                for ddl in POSTGRES_DDL:
+                    conn.execute(text(ddl))
+            else:
+                return False
+    except Exception:
+        # e.g. SQLite compiled without FTS5: searches fall back to ILIKE
+        return False
+    finally:
+        _backends.pop(str(engine.url), None)
+    return not existed
+
+def rebuild_index(engine=None):
+    """Drop and re-populate every entry in the index."""
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        name = backend(conn)
+        if name is None:
+            return 0
+        conn.execute(text("DELETE FROM search_index" if name == 'sqlite' else "DELETE FROM search_document"))
+        count = 0
+        for build in _BUILDERS.values():
+            docs = list(build(conn))
+            _write(conn, name, docs)
+            count += len(docs)
+    return count
+
+# --- Queries ---
+
+def search(q, kinds=None, limit=20):
+    """Ranked hits for `q` (prefix-matched on every word); best matches first."""
+    name = backend()
+    kinds = kinds or list(KIND_CODES)
+    if name is None or not _tokens(q):
+        return []
+    if name == 'sqlite':
+        codes = [KIND_CODES[k] for k in kinds]
+        rows = db.session.execute(text(
+            "SELECT rowid, title, bm25(search_index, :tw, 1.0) AS rank FROM search_index "
+            "WHERE search_index MATCH :q AND (rowid % 4) IN :codes ORDER BY rank LIMIT :limit"
+        ).bindparams(bindparam('codes', expanding=True)),
+            {'q': _sqlite_match(q), 'tw': TITLE_WEIGHT, 'codes': codes, 'limit': limit})
+        return [SearchHit(KIND_NAMES[rid % 4], rid // 4, title, -rank) for rid, title, rank in rows]
+    rows = db.session.execute(text(
+        "SELECT kind, ref_id, title, ts_rank(tsv, to_tsquery('simple', :q)) AS rank FROM search_document "
+        "WHERE tsv @@ to_tsquery('simple', :q) AND kind IN :kinds ORDER BY rank DESC LIMIT :limit"
+    ).bindparams(bindparam('kinds', expanding=True)),
+        {'q': _postgres_tsquery(q), 'kinds': list(kinds), 'limit': limit})
+    return [SearchHit(kind, ref_id, title, rank) for kind, ref_id, title, rank in rows]
+
+def search_condition(kind, id_column, q, fallback):
+    """
+    SQL condition limiting `id_column` to index matches for `q`, for composing with other
+    filters and pagination. `fallback` (e.g. an ILIKE expression) is returned when no
+    search backend is available, or when `q` has no words to match (an empty MATCH is a
+    syntax error in FTS5).
+    """
+    name = backend()
+    if name is None or not _tokens(q):
+        return fallback
+    if name == 'sqlite':
+        ids = (select(literal_column('rowid / 4'))
+               .select_from(text('search_index'))
+               .where(text('search_index MATCH :fts_q AND rowid % 4 = :fts_kind')
+                      .bindparams(fts_q=_sqlite_match(q), fts_kind=KIND_CODES[kind])))
+    else:
+        ids = (select(literal_column('ref_id'))
+               .select_from(text('search_document'))
+               .where(text("kind = :fts_kind AND tsv @@ to_tsquery('simple', :fts_q)")
+                      .bindparams(fts_q=_postgres_tsquery(q), fts_kind=kind)))
+    return id_column.in_(ids)
+
+# --- Sync hook ---
+
+def _previous(obj, attr):
+    """Old value of a changed foreign key, so the case it pointed at is refreshed too."""
+    history = db.inspect(obj).attrs[attr].history
+    return [v for v in history.deleted if v is not None]
+
+def _affected(objects):
+    """Map kind -> ids whose index entries are stale, plus ids of changed people."""
+    stale = {'case': set(), 'note': set(), 'person': set()}
+    person_ids = set()
+    for obj in objects:
+        if isinstance(obj, Case):
+            stale['case'].add(obj.id)
+        elif isinstance(obj, Note):
+            stale['note'].add(obj.id)
+            stale['case'].add(obj.case_id)
+            stale['case'].update(_previous(obj, 'case_id'))
+        elif isinstance(obj, CaseParty):
+            stale['case'].add(obj.case_id)
+            stale['case'].update(_previous(obj, 'case_id'))
+        elif isinstance(obj, PersonEntity):
+            stale['person'].add(obj.id)
+            person_ids.add(obj.id)
+    return stale, person_ids
+
+def _before_flush(session, flush_context, instances):
+    # ids of new objects are only known after the flush, and attribute history is reset
+    # by then, so collect the affected ids for existing objects now and the objects themselves
+    pending = session.info.setdefault('search_pending', [])
+    pending.extend(list(session.new))
+    stale, person_ids = _affected(list(session.dirty) + list(session.deleted))
+    session.info.setdefault('search_stale', []).append((stale, person_ids))
+
+def _after_flush(session, flush_context):
+    new_objects = session.info.pop('search_pending', [])
+    collected = session.info.pop('search_stale', [])
+    stale, person_ids = _affected(new_objects)
+    for more_stale, more_people in collected:
+        for kind, ids in more_stale.items():
+            stale[kind].update(ids)
+        person_ids.update(more_people)
+    if not any(stale.values()):
+        return
+    conn = session.connection()
+    if backend(conn) is None:
+        return
+    if person_ids:
+        # party names are part of the case document
+        rows = conn.execute(select(CaseParty.case_id).where(CaseParty.person_entity_id.in_(person_ids)))
+        stale['case'].update(r[0] for r in rows)
+    for kind, ids in stale.items():
+        reindex(conn, kind, {i for i in ids if i is not None})
+
+def init_app(app):
+    """Register the index sync hooks and the `flask search-reindex` command."""
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
+        event.listen(db.session, 'after_flush', _after_flush)
+
+    @app.cli.command('search-reindex')
+    def search_reindex_command():
+        """Create the full-text index if needed and rebuild it from the database."""
+        with app.app_context():
+            create_index()
+            count = rebuild_index()
+        click.echo(f'Indexed {count} document(s).')
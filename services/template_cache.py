@@ -0,0 +1,73 @@
+# services/template_cache.py
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+DEFAULT_MAXSIZE = 256
+
+class CompiledTemplateCache:
+    """
+    LRU cache of compiled Jinja templates for document generation.
+    Keys identify a template version: ('template', Template.id, Template.updated_at) for
+    DB templates and ('default', slug, hash(source)) for DEFAULT_TEMPLATES fallbacks,
+    so editing a Template naturally misses and the stale entry ages out.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, source, env):
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+        # compile outside the lock; a concurrent miss on the same key just compiles twice
+        template = env.from_string(source)
+        with self._lock:
+            self._entries[key] = template
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+template_cache = CompiledTemplateCache()
+
+def cache_key(source, template_obj=None, slug=None):
+    # only trust the row's version when the source really is its content (not a fallback)
+    if template_obj is not None and template_obj.content is source:
+        return ('template', template_obj.id, template_obj.updated_at)
+    # str caches its hash, so hashing the same DEFAULT_TEMPLATES string again is free
+    return ('default', slug, hash(source))
+
+def render_cached(source, template_obj=None, slug=None, **context):
+    """
+    Drop-in for render_template_string(source, **context) that compiles each template
+    version once per process. Pass the Template row the source came from, or the slug
+    of the default template, so the compiled result can be reused.
+    """
+    app = current_app._get_current_object()
+    template = template_cache.get(cache_key(source, template_obj, slug), source, app.jinja_env)
+    app.update_template_context(context)
+    return template.render(context)
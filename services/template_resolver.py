@@ -0,0 +1,97 @@
+# services/template_resolver.py
+# Template overrides by doc-type slug, cached per process. An entry, including "no override",
+# lives for TEMPLATE_CACHE_SECONDS: the process that saves a Template drops its entry at once
+# (invalidate_template_cache), other web workers and `flask worker` see the change within the TTL,
+# and jobs that must not render an old body call invalidate_template_cache() before resolving.
+# At most TEMPLATE_CACHE_MAXSIZE slugs are kept, least recently used first out: misses are
+# cached too, and slugs come from URLs (/documents/preview_template/<slug>).
+import re
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from models import Template
+from utils.db_routing import primary
+
+DEFAULT_CACHE_SECONDS = 30
+DEFAULT_MAXSIZE = 256
+
+class TemplateSpec:
+    """Detached snapshot of a Template row, safe to keep in a process-wide cache."""
+    __slots__ = ('id', 'slug', 'name', 'content', 'updated_at')
+
+    def __init__(self, t):
+        self.id = t.id
+        self.slug = t.slug
+        self.name = t.name
+        self.content = t.content
+        self.updated_at = t.updated_at
+
+# slug -> (loaded_at, TemplateSpec), or (loaded_at, None) when no row overrides the default
+_template_cache = OrderedDict()
+# bumped by every invalidation, so a row read while a save invalidated it is not stored
+_generation = 0
+_lock = threading.Lock()
+
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '_', (text or '').lower()).strip('_')
+
+def get_template(slug):
+    """Template override for a doc-type slug (one indexed lookup, then cached), or None."""
+    ttl = current_app.config.get('TEMPLATE_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    with _lock:
+        entry = _template_cache.get(slug)
+        if entry is not None:
+            _template_cache.move_to_end(slug)
+        generation = _generation
+    if entry is not None and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+    with primary():  # never cache a lagging replica's row
+        t = Template.query.filter_by(slug=slug).first()
+    spec = TemplateSpec(t) if t is not None else None
+    with _lock:
+        if ttl > 0 and _generation == generation:
+            _template_cache[slug] = (time.monotonic(), spec)
+            _template_cache.move_to_end(slug)
+            maxsize = current_app.config.get('TEMPLATE_CACHE_MAXSIZE', DEFAULT_MAXSIZE)
+            while len(_template_cache) > maxsize:
+                _template_cache.popitem(last=False)
+    return spec
+
+def resolve_template(slug, defaults=None, fallback=''):
+    """
+    Return (source, template) for a doc-type slug: the Template row with that slug if one
+    exists, otherwise defaults[slug] (DEFAULT_TEMPLATES) or `fallback` with template=None.
+    Pass both straight to render_cached() so the compiled template is reused too.
+    """
+    template = get_template(slug)
+    if template is not None and template.content:
+        return template.content, template
+    return (defaults or {}).get(slug, fallback), None
+
+def invalidate_template_cache(slug=None):
+    """Forget cached lookups for slug (or all slugs) after a Template is created, edited or deleted."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if slug is None:
+            _template_cache.clear()
+        else:
+            _template_cache.pop(slug, None)
+
+def slug_for_name(name, doc_types=()):
+    """
+    Slug for a template name under the old substring matching: the key of the (key, label)
+    doc type whose label appears in the name, preferring the longest (most specific) label
+    so "Notice of Appearance" beats "Notice"; else the slugified name.
+    """
+    lowered = (name or '').lower()
+    matches = [(len(label), key) for key, label in doc_types if label.lower() in lowered]
+    if matches:
+        return max(matches)[1]
+    return slugify(name)
+
+def init_app(app):
+    """Settings: TEMPLATE_CACHE_SECONDS (0 disables the cache), TEMPLATE_CACHE_MAXSIZE (slugs kept)."""
+    app.config.setdefault('TEMPLATE_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    app.config.setdefault('TEMPLATE_CACHE_MAXSIZE', DEFAULT_MAXSIZE)
@@ -0,0 +1,95 @@
+# services/user_cache.py
+# The logged-in User for Flask-Login without a primary-key query per request. Column values are
+# cached per process by id; each request gets its own User built from them and attached to the
+# request's session without SQL, so role checks (auth.team_required, is_superuser()) and
+# relationship lazy loads work as before. A commit that changes or deletes a User (approving a
+# user, changing a role or the active flag) drops that entry (session hooks below); other
+# processes pick the change up within USER_CACHE_SECONDS.
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from models import db, User
+from utils.db_routing import primary
+
+DEFAULT_CACHE_SECONDS = 30
+
+_USER_COLUMNS = tuple(c.key for c in User.__mapper__.column_attrs)
+
+# user id -> (loaded_at, {column: value}); None in place of the dict = no such user
+_user_cache = {}
+# bumped by every invalidation, so a row read while a commit changed it is not stored
+_generation = 0
+_lock = threading.Lock()
+
+def _snapshot(user):
+    return {key: getattr(user, key) for key in _USER_COLUMNS} if user is not None else None
+
+def _attach(values):
+    user = User(**values)
+    make_transient_to_detached(user)
+    # load=False: becomes the session's User for this id without a SELECT
+    return db.session.merge(user, load=False)
+
+def load_user(user_id):
+    """The User with this id (or None), from the cache when fresh; for login_manager.user_loader."""
+    ttl = current_app.config.get('USER_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    if ttl:
+        with _lock:
+            entry = _user_cache.get(user_id)
+            generation = _generation
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            return _attach(entry[1]) if entry[1] is not None else None
+    with primary():  # never cache a lagging replica's row
+        user = db.session.get(User, user_id)
+    if ttl:
+        with _lock:
+            if generation == _generation:
+                _user_cache[user_id] = (time.monotonic(), _snapshot(user))
+    return user
+
+def invalidate_user(user_id=None):
+    """Forget the cached user (or all users)."""
+    global _generation
+    with _lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+        _generation += 1
+
+# --- Invalidation hooks ---
+
+def _after_flush(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            session.info.setdefault('users_dirty', set()).add(obj.id)
+
+def _do_orm_execute(orm_execute_state):
+    # bulk update/delete statements bypass the flush and may touch any user
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is User:
+            orm_execute_state.session.info['users_dirty_all'] = True
+
+def _after_commit(session):
+    if session.info.pop('users_dirty_all', False):
+        session.info.pop('users_dirty', None)
+        invalidate_user()
+        return
+    for user_id in session.info.pop('users_dirty', ()):
+        invalidate_user(user_id)
+
+def _after_rollback(session):
+    session.info.pop('users_dirty', None)
+    session.info.pop('users_dirty_all', None)
+
+def init_app(app):
+    """Register the invalidation hooks. Setting: USER_CACHE_SECONDS (0 disables the cache)."""
+    app.config.setdefault('USER_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
@@ -0,0 +1,33 @@
+# tests/conftest.py
+# The tests run against the module-level app on a throwaway SQLite database, like the benchmarks.
+# Run: python -m pytest -q
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix='cms_test_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir, 'test.db')
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(_tmpdir, 'uploads'))
+
+from app import app as cms_app  # noqa: E402
+from models import User  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return cms_app
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the bootstrap super user."""
+    with app.app_context():
+        user_id = User.query.first().id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
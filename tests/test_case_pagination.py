@@ -0,0 +1,51 @@
+# tests/test_case_pagination.py
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+from models import Case
+from services.pagination import keyset_paginate
+from migrate_case_created_at import backfill_created_at, set_not_null
+
+
+def legacy_engine():
+    """A database whose "case".created_at is still nullable, as before the migration."""
+    engine = create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='cms_test_'), 'legacy.db'))
+    ddl = str(CreateTable(Case.__table__).compile(dialect=engine.dialect))
+    assert 'created_at DATETIME NOT NULL' in ddl
+    with engine.begin() as conn:
+        conn.exec_driver_sql(ddl.replace('created_at DATETIME NOT NULL', 'created_at DATETIME'))
+    return engine
+
+
+def all_pages(session):
+    query = session.query(Case.id, Case.created_at)
+    ids, after = [], None
+    while True:
+        page = keyset_paginate(query, [Case.created_at, Case.id], after=after, page_size=2)
+        ids.extend(row.id for row in page)
+        if not page.has_next:
+            return ids
+        after = page.next_cursor
+
+
+def test_cases_without_created_at_are_listed_after_migration():
+    engine = legacy_engine()
+    with engine.begin() as conn:
+        conn.execute(insert(Case.__table__), [
+            {'id': 1, 'style': 'Case 1', 'case_number': 'K-1', 'created_at': datetime(2020, 1, 1), 'updated_at': None},
+            {'id': 2, 'style': 'Case 2', 'case_number': 'K-2', 'created_at': None, 'updated_at': None},
+            {'id': 3, 'style': 'Case 3', 'case_number': 'K-3', 'created_at': datetime(2024, 1, 1), 'updated_at': None},
+            {'id': 4, 'style': 'Case 4', 'case_number': 'K-4', 'created_at': None, 'updated_at': datetime(2022, 1, 1)},
+        ])
+    with engine.begin() as conn:
+        assert backfill_created_at(conn, datetime(2025, 1, 1)) == 2
+        assert set_not_null(conn)
+        assert not set_not_null(conn)
+    created_at = next(c for c in inspect(engine).get_columns('case') if c['name'] == 'created_at')
+    assert created_at['nullable'] is False
+    with Session(engine) as session:
+        # newest first: the migration time, then updated_at for the edited row
+        assert all_pages(session) == [2, 3, 4, 1]
@@ -0,0 +1,35 @@
+# tests/test_custom_fields.py
+from forms import CaseForm
+from models import db, CustomField
+from services import custom_fields
+from utils.query_count import QueryCounter
+
+
+def test_cached_form_build_runs_no_query(app):
+    custom_fields.invalidate_custom_form_cache()
+    with app.test_request_context():
+        custom_fields.get_custom_form(CaseForm, 'case')
+        with QueryCounter(db.engine) as counter:
+            custom_fields.get_custom_form(CaseForm, 'case')
+        assert counter.count == 0
+
+
+def test_expired_entry_picks_up_fields_added_elsewhere(app):
+    custom_fields.invalidate_custom_form_cache()
+    with app.test_request_context():
+        _, specs = custom_fields.get_custom_form(CaseForm, 'case')
+        assert 'court_room' not in [spec.slug for spec in specs]
+        # written without invalidating, as another process would
+        db.session.add(CustomField(name='court_room', slug='court_room', label='Court room',
+                                   target='case', field_type='text'))
+        db.session.commit()
+        _, specs = custom_fields.get_custom_form(CaseForm, 'case')
+        assert 'court_room' not in [spec.slug for spec in specs]
+        ttl = app.config['CUSTOM_FORM_CACHE_SECONDS']
+        app.config['CUSTOM_FORM_CACHE_SECONDS'] = 0
+        try:
+            form_cls, specs = custom_fields.get_custom_form(CaseForm, 'case')
+        finally:
+            app.config['CUSTOM_FORM_CACHE_SECONDS'] = ttl
+        assert 'court_room' in [spec.slug for spec in specs]
+        assert hasattr(form_cls, 'custom_court_room')
@@ -0,0 +1,20 @@
+# tests/test_jobs_api.py
+import pytest
+
+BAD_BODIES = [
+    {'case_ids': [1], 'doc_types': [{}]},
+    {'case_ids': [1], 'doc_types': [['letter_to_client']]},
+    {'case_ids': [1], 'doc_types': [None]},
+    {'case_ids': [{}], 'doc_types': ['letter_to_client']},
+    {'case_ids': ['1'], 'doc_types': ['letter_to_client']},
+    {'case_ids': [True], 'doc_types': ['letter_to_client']},
+    {'case_ids': [], 'doc_types': ['letter_to_client']},
+    {'case_ids': 1, 'doc_types': 'letter_to_client'},
+]
+
+
+@pytest.mark.parametrize('body', BAD_BODIES)
+def test_submit_batch_rejects_malformed_lists(client, body):
+    response = client.post('/api/jobs/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
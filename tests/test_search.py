@@ -0,0 +1,38 @@
+# tests/test_search.py
+import pytest
+from urllib.parse import quote
+from app import app as cms_app
+from models import db, Case, Note, User
+
+# queries with no word characters: an FTS5 MATCH built from them would be empty
+PUNCTUATION_QUERIES = ['%', '-', '!!', '"', '--']
+
+SEARCH_URLS = [
+    '/cases?search={q}',
+    '/notes?search={q}',
+    '/api/notes?search={q}',
+    '/api/choices/cases?q={q}',
+]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def rows():
+    with cms_app.app_context():
+        case = Case(style='Punctuation v. Search', case_number='PS-0001')
+        db.session.add(case)
+        db.session.flush()
+        db.session.add(Note(case_id=case.id, user_id=User.query.first().id, note='searchable note'))
+        db.session.commit()
+
+
+@pytest.mark.parametrize('url', SEARCH_URLS)
+@pytest.mark.parametrize('q', PUNCTUATION_QUERIES)
+def test_punctuation_only_query(client, url, q):
+    response = client.get(url.format(q=quote(q)))
+    assert response.status_code == 200
+
+
+def test_words_still_match(client):
+    response = client.get('/api/choices/cases?q=punctuation')
+    assert response.status_code == 200
+    assert [r['label'] for r in response.get_json()['results']] == ['Punctuation v. Search']
@@ -0,0 +1,21 @@
+# tests/test_storage.py
+import io
+import pytest
+from utils.storage import LocalStorage, StorageBackend
+
+
+def test_backend_missing_a_method_fails_on_creation():
+    class WriteOnlyStorage(StorageBackend):
+        def put(self, key, fileobj):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnlyStorage()
+
+
+def test_local_storage_round_trip(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.put('blobs/ab/cd/abcd', io.BytesIO(b'content'))
+    with storage.open('blobs/ab/cd/abcd') as fh:
+        assert fh.read() == b'content'
+    assert list(storage.iter_keys('blobs/')) == ['blobs/ab/cd/abcd']
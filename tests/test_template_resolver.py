@@ -0,0 +1,13 @@
+# tests/test_template_resolver.py
+from services import template_resolver
+
+
+def test_preview_of_unknown_slugs_keeps_cache_bounded(app, client):
+    template_resolver.invalidate_template_cache()
+    maxsize = app.config['TEMPLATE_CACHE_MAXSIZE']
+    for i in range(maxsize + 20):
+        assert client.get(f'/documents/preview_template/no_such_slug_{i}').status_code == 200
+    assert len(template_resolver._template_cache) == maxsize
+    # the oldest slugs went first
+    assert 'no_such_slug_0' not in template_resolver._template_cache
+    assert f'no_such_slug_{maxsize + 19}' in template_resolver._template_cache
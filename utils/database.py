@@ -0,0 +1,121 @@
+# utils/database.py
+# Engine configuration by database backend, applied before db.init_app() creates the engines.
+# - SQLite: every new connection runs the SQLITE_* pragmas below. WAL lets readers proceed while
+#   one writer commits, synchronous=NORMAL is durable under WAL except on power loss, and
+#   busy_timeout makes a writer wait for the lock instead of failing with "database is locked".
+#   It also sets mmap. The pool keeps connections, so the pragmas run once per connection.
+#   File databases get a QueuePool of DB_POOL_SIZE too.
+# - PostgreSQL/MySQL: a sized QueuePool (DB_POOL_*) with pre-ping, so connections dropped by the
+#   server or a proxy are replaced instead of failing the next request.
+# - DATABASE_REPLICA_URL adds a 'replica' bind with the same treatment, used by utils/db_routing.py.
+# Explicit SQLALCHEMY_ENGINE_OPTIONS / SQLALCHEMY_BINDS entries always win over these defaults.
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models import db
+from utils import db_routing
+from utils.db_routing import REPLICA_BIND_KEY
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 15000,
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_CACHE_SIZE_KB': 20000,
+}
+DEFAULT_POOL = {
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_POOL_RECYCLE': 1800,
+}
+
+def normalize_url(uri):
+    # 'postgres://' (Heroku, some managed services) is not a name SQLAlchemy accepts
+    if uri and uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def _is_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def sqlite_pragmas(config):
+    """PRAGMA statements for new SQLite connections; a setting of None skips its pragma."""
+    pragmas = []
+    if config.get('SQLITE_JOURNAL_MODE'):
+        pragmas.append(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+    if config.get('SQLITE_SYNCHRONOUS'):
+        pragmas.append(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+    if config.get('SQLITE_BUSY_TIMEOUT_MS') is not None:
+        pragmas.append(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+    if config.get('SQLITE_MMAP_SIZE') is not None:
+        pragmas.append(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}")
+    if config.get('SQLITE_CACHE_SIZE_KB') is not None:
+        # negative = size in KiB rather than pages
+        pragmas.append(f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}")
+    return pragmas
+
+def engine_options(uri, config):
+    """Engine keyword arguments suited to the backend of `uri` (a URL string)."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        if _is_memory(url):
+            return {}
+        options = {'pool_size': int(config['DB_POOL_SIZE']), 'max_overflow': int(config['DB_MAX_OVERFLOW'])}
+        busy_ms = config.get('SQLITE_BUSY_TIMEOUT_MS')
+        if busy_ms:
+            # the driver's own lock wait (seconds), consistent with busy_timeout
+            options['connect_args'] = {'timeout': int(busy_ms) / 1000.0}
+        return options
+    return {
+        'pool_size': int(config['DB_POOL_SIZE']),
+        'max_overflow': int(config['DB_MAX_OVERFLOW']),
+        'pool_timeout': int(config['DB_POOL_TIMEOUT']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+        'pool_pre_ping': True,
+    }
+
+def register_sqlite_pragmas(engine, pragmas):
+    """Run `pragmas` on every new DBAPI connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def init_app(app):
+    """
+    Fill in engine options for the configured database, initialize Flask-SQLAlchemy and attach
+    the SQLite pragmas. Call instead of db.init_app(app). Settings (env var of the same name as
+    the default): SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE; DATABASE_REPLICA_URL (config only, see config.py).
+    """
+    for name, default in {**DEFAULT_SQLITE_PRAGMAS, **DEFAULT_POOL}.items():
+        app.config.setdefault(name, os.getenv(name, default))
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    options = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config)
+    configured = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for key, value in options.items():
+        configured.setdefault(key, value)
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        # read-only views' SELECTs go here (utils/db_routing.py)
+        replica_url = normalize_url(replica_url)
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        binds.setdefault(REPLICA_BIND_KEY, {'url': replica_url, **engine_options(replica_url, app.config)})
+    db.init_app(app)
+    db_routing.init_app(app)
+
+    with app.app_context():
+        pragmas = sqlite_pragmas(app.config)
+        for engine in db.engines.values():
+            if not _is_memory(engine.url):
+                register_sqlite_pragmas(engine, pragmas)
@@ -0,0 +1,82 @@
+# utils/db_routing.py
+# Read-replica routing. When DATABASE_REPLICA_URL is set (the 'replica' bind, see
+# utils/database.py), SELECTs issued by views decorated with @replica_reads go to the replica;
+# everything else goes to the primary: writes, flushes, SELECT ... FOR UPDATE and undecorated
+# views. Three rules keep replication lag from showing:
+# - once a request's session has written, its later reads in that request stay on the primary;
+# - after a request commits a write, the same browser reads from the primary for
+#   REPLICA_STICKY_SECONDS, so the page it is redirected to shows the change;
+# - process caches refilled after an invalidation load inside `with primary():`, so they
+#   never cache a lagging replica's rows.
+# Without a replica URL all of this is a no-op.
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, has_request_context, session as browser_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND_KEY = 'replica'
+DEFAULT_STICKY_SECONDS = 5
+_STICKY_KEY = '_db_primary_until'
+
+def _is_plain_select(clause):
+    return bool(getattr(clause, 'is_select', False)) and getattr(clause, '_for_update_arg', None) is None
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends eligible reads to the replica engine."""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and self.info.get('replica_reads') \
+                and not self.info.get('db_wrote') and not self.info.get('primary_depth') \
+                and _is_plain_select(clause):
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _db_session():
+    from models import db
+    return db.session
+
+def replica_reads(view):
+    """Let a read-mostly view's SELECTs use the replica (see module comment for the exceptions)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if browser_session.get(_STICKY_KEY, 0) < time.time():
+            _db_session().info['replica_reads'] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+@contextmanager
+def primary():
+    """Route this block's reads to the primary even inside a @replica_reads view."""
+    info = _db_session().info
+    info['primary_depth'] = info.get('primary_depth', 0) + 1
+    try:
+        yield
+    finally:
+        info['primary_depth'] -= 1
+
+# --- Hooks ---
+
+def _after_flush(session, flush_context):
+    session.info['db_wrote'] = True
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['db_wrote'] = True
+
+def _after_commit(session):
+    if session.info.get('db_wrote') and has_request_context():
+        sticky = current_app.config.get('REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+        if sticky and REPLICA_BIND_KEY in current_app.config.get('SQLALCHEMY_BINDS', {}):
+            browser_session[_STICKY_KEY] = time.time() + sticky
+
+def init_app(app):
+    """Register the write-tracking hooks. Setting: REPLICA_STICKY_SECONDS (default 5)."""
+    from models import db
+    app.config.setdefault('REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+        event.listen(db.session, 'after_commit', _after_commit)
@@ -0,0 +1,71 @@
+import threading
+from contextlib import contextmanager
+from sqlalchemy import event
+from models import db
+
+# Query budgets for views whose query count must not grow with the number of rows shown
+# (see services/case_queries.case_detail_loaders). Counts allow for Flask-Login's user load,
+# which only queries when services/user_cache has no fresh entry.
+VIEW_QUERY_BUDGETS = {
+    'cases_list': 2,
+    'case_detail': 6,
+    'documents_list': 2,
+    'events_list': 2,
+    # one page of notes, plus the filter dropdowns when services/choices has them uncached
+    'notes_list': 4,
+}
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, budget, statements, label=None):
+        self.budget = budget
+        self.statements = statements
+        where = f" in {label}" if label else ""
+        listing = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(statements, 1))
+        super().__init__(f"{len(statements)} queries{where}, budget is {budget}:\n{listing}")
+
+class QueryCounter:
+    """
+    Records the SQL statements executed on an engine while active. Only statements run
+    by the thread that started counting are recorded, so concurrent requests don't mix.
+    """
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.statements = []
+        self._thread = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self.engine = self.engine or db.engine
+        self._thread = threading.get_ident()
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+@contextmanager
+def assert_max_queries(budget, engine=None, label=None):
+    """
+    Fail with QueryBudgetExceeded (an AssertionError, listing the statements) if the block
+    runs more than `budget` queries:
+
+        with assert_max_queries(VIEW_QUERY_BUDGETS['case_detail'], label='case_detail'):
+            client.get(f'/cases/{case.id}')
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > budget:
+        raise QueryBudgetExceeded(budget, counter.statements, label)
+
+def assert_view_queries(client, url, endpoint, engine=None, **kwargs):
+    """GET url with a Flask test client inside the budget for `endpoint`; returns the response."""
+    with assert_max_queries(VIEW_QUERY_BUDGETS[endpoint], engine, label=f"{endpoint} ({url})"):
+        return client.get(url, **kwargs)
@@ -0,0 +1,124 @@
+# utils/schema_check.py
+# Lint for missing indexes, run by `flask check-indexes` (exit status 1 when something is missing):
+# - every foreign key column must lead an index (or the primary key / a unique constraint);
+# - every model column the code sorts by must appear in some index. Sort columns are found by
+#   parsing the sources in SCAN_PATHS for `Model.column` arguments of .order_by(...), order_by=...
+#   and keyset_paginate(...), plus the services.choices dropdown sources.
+# A column that is deliberately left unindexed goes in UNINDEXED_SORT_COLUMNS with the reason.
+import ast
+import os
+import sys
+import click
+from sqlalchemy import Column
+from sqlalchemy.sql import visitors
+from models import db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCAN_PATHS = ('app.py', 'custom_admin.py', 'cms', 'services')
+# 'table.column' -> why sorting by it without an index is fine
+UNINDEXED_SORT_COLUMNS = {}
+
+_SORT_MODIFIERS = ('asc', 'desc', 'nullsfirst', 'nullslast', 'nulls_first', 'nulls_last')
+
+def _models():
+    return {m.class_.__name__: m for m in db.Model.registry.mappers}
+
+def _column_for(node, models):
+    """'table.column' for an expression like Model.col, Model.col.desc() or Model.col.desc().nullslast()."""
+    while (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+           and node.func.attr in _SORT_MODIFIERS):
+        node = node.func.value
+    if not (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)):
+        return None
+    mapper = models.get(node.value.id)
+    if mapper is None or node.attr not in mapper.columns:
+        return None
+    column = mapper.columns[node.attr]
+    return f"{column.table.name}.{column.name}"
+
+def _expression_columns(expr):
+    if hasattr(expr, '__clause_element__'):
+        expr = expr.__clause_element__()
+    return [e for e in visitors.iterate(expr) if isinstance(e, Column) and e.table is not None]
+
+def _sort_expressions(call):
+    func = call.func
+    name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+    if name == 'order_by':
+        yield from call.args
+    elif name == 'keyset_paginate' and len(call.args) > 1 and isinstance(call.args[1], (ast.List, ast.Tuple)):
+        yield from call.args[1].elts
+    for keyword in call.keywords:
+        if keyword.arg == 'order_by':
+            yield keyword.value
+        elif keyword.arg == 'columns' and name == 'keyset_paginate' and isinstance(keyword.value, (ast.List, ast.Tuple)):
+            yield from keyword.value.elts
+
+def _source_files(paths):
+    for path in paths:
+        full = os.path.join(ROOT, path)
+        if os.path.isfile(full):
+            yield full
+        for dirpath, _dirs, files in os.walk(full):
+            for filename in sorted(files):
+                if filename.endswith('.py'):
+                    yield os.path.join(dirpath, filename)
+
+def sort_columns(paths=SCAN_PATHS):
+    """{'table.column': ['file:line', ...]} for the model columns the code sorts by."""
+    models = _models()
+    found = {}
+    for filename in _source_files(paths):
+        with open(filename, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename)
+        where = os.path.relpath(filename, ROOT)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                for expr in _sort_expressions(node):
+                    column = _column_for(expr, models)
+                    if column:
+                        found.setdefault(column, []).append(f"{where}:{expr.lineno}")
+    from services.choices import CHOICE_SOURCES
+    for name, source in CHOICE_SOURCES.items():
+        for column in _expression_columns(source.order_by):
+            found.setdefault(f"{column.table.name}.{column.name}", []).append(f"services/choices.py ({name})")
+    return found
+
+def _indexed(table):
+    """(columns leading an index, columns in any index) for a Table."""
+    column_lists = [list(table.primary_key.columns)]
+    column_lists += [list(index.columns) for index in table.indexes]
+    column_lists += [list(c.columns) for c in table.constraints if isinstance(c, db.UniqueConstraint)]
+    column_lists = [cols for cols in column_lists if cols]
+    return {cols[0].name for cols in column_lists}, {c.name for cols in column_lists for c in cols}
+
+def missing_indexes(metadata=None, paths=SCAN_PATHS):
+    """Problems as strings, e.g. 'note.user_id: foreign key without an index'."""
+    metadata = metadata or db.metadata
+    problems = []
+    for table in metadata.sorted_tables:
+        leading, _ = _indexed(table)
+        for fk in table.foreign_keys:
+            if fk.parent.name not in leading:
+                problems.append(f"{table.name}.{fk.parent.name}: foreign key without an index")
+    for column, locations in sorted(sort_columns(paths).items()):
+        table_name, column_name = column.split('.', 1)
+        table = metadata.tables.get(table_name)
+        if table is None or column in UNINDEXED_SORT_COLUMNS:
+            continue
+        if column_name not in _indexed(table)[1]:
+            problems.append(f"{column}: sorted by without an index ({', '.join(locations)})")
+    return problems
+
+def init_app(app):
+    """Register the `flask check-indexes` command."""
+    @app.cli.command('check-indexes')
+    def check_indexes_command():
+        """Fail if a foreign key or sort column has no index."""
+        with app.app_context():
+            problems = missing_indexes()
+        for problem in problems:
+            click.echo(problem)
+        if problems:
+            sys.exit(1)
+        click.echo('All foreign keys and sort columns are indexed.')
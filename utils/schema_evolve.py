@@ -0,0 +1,218 @@
+# utils/schema_evolve.py
+# Online schema evolution, run by `flask schema-evolve` (replaces add_case_colums.py). It diffs
+# models.Case and its practice-area extension tables (or the tables given with --table, or every
+# model table with --all) against the live database and applies the difference step by step,
+# printing each step's time:
+# - Missing tables and columns are added in ONE transaction, so a failed step leaves the schema
+#   as it was. Adding a nullable column, or one with a constant server default, only changes the
+#   catalog on SQLite and PostgreSQL 11+; no rows are rewritten. Outside SQLite each table gets
+#   a single ALTER TABLE carrying all of its new columns, so it is locked once.
+# - On SQLite, a column that ALTER TABLE ADD COLUMN refuses (unique, primary key, non-constant
+#   default) is added by rebuilding the table in Alembic's batch mode, inside the same
+#   transaction: copy into a new table, then swap the names.
+# - Readers: on PostgreSQL the transaction sets lock_timeout (--lock-timeout-ms). An ALTER that
+#   cannot get its lock quickly gives up and the transaction is retried; waiting in the lock
+#   queue would hold up every later SELECT on the table. Missing indexes are built afterwards
+#   with CREATE INDEX CONCURRENTLY, which blocks neither reads nor writes. On SQLite, WAL mode
+#   (utils/database.py) keeps readers going while the transaction writes.
+# A NOT NULL column without a server default cannot be added to a table that has rows, so it is
+# reported and skipped; give it a server_default in models.py. Columns that exist only in the
+# database are listed and left alone (see migrate_case_extensions.py --drop-columns).
+import re
+import time
+import click
+from sqlalchemy import Column, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+from models import db, Case, PRACTICE_AREA_EXTENSIONS
+
+DEFAULT_LOCK_TIMEOUT_MS = 2000
+DEFAULT_RETRIES = 5
+
+def case_tables():
+    return [Case.__table__] + [ext.__table__ for ext in PRACTICE_AREA_EXTENSIONS.values()]
+
+def _ddl(element, dialect):
+    return str(element.compile(dialect=dialect)).strip()
+
+def _needs_server_default(column):
+    return not column.nullable and not column.primary_key and column.server_default is None
+
+def _sqlite_needs_rebuild(column):
+    """True for columns SQLite's ALTER TABLE ADD COLUMN refuses."""
+    if column.primary_key or column.unique:
+        return True
+    default = column.server_default
+    # a plain string is a constant; text()/func defaults may not be
+    return default is not None and not isinstance(getattr(default, 'arg', None), str)
+
+def _add_columns_sql(table, columns, dialect):
+    quote = dialect.identifier_preparer.quote
+    clauses = [f"ADD COLUMN {_ddl(CreateColumn(c), dialect)}" for c in columns]
+    # CreateColumn leaves out table-level constraints such as unique=True
+    clauses += [f"ADD UNIQUE ({quote(c.name)})" for c in columns if c.unique]
+    prefix = f"ALTER TABLE {quote(table.name)} "
+    if dialect.name == 'sqlite':
+        # SQLite takes one column per ALTER TABLE
+        return [prefix + clause for clause in clauses]
+    return [prefix + ', '.join(clauses)]
+
+def _create_index_sql(index, dialect):
+    sql = _ddl(CreateIndex(index), dialect)
+    if dialect.name == 'postgresql':
+        sql = re.sub(r'^CREATE (UNIQUE )?INDEX', r'CREATE \1INDEX CONCURRENTLY', sql)
+    return sql
+
+def plan(conn, tables=None):
+    """
+    Compare `tables` (default: case_tables()) with the database on `conn`.
+    Returns (steps, notes): steps are dicts with 'kind' ('create_table', 'add_columns',
+    'rebuild' or 'create_index'), 'table', 'columns' and 'sql', in the order to run them;
+    notes are findings that need an operator rather than DDL.
+    """
+    inspector = inspect(conn)
+    dialect = conn.dialect
+    live_tables = set(inspector.get_table_names())
+    steps, index_steps, notes = [], [], []
+    for table in tables or case_tables():
+        skipped = set()
+        if table.name not in live_tables:
+            steps.append({'kind': 'create_table', 'table': table, 'columns': list(table.columns),
+                          'sql': [_ddl(CreateTable(table), dialect)]})
+            live_indexes = set()
+        else:
+            live_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            model_columns = {c.name for c in table.columns}
+            for name in sorted(live_columns - model_columns):
+                notes.append(f"{table.name}.{name}: in the database but not in models.py (left alone)")
+            missing = [c for c in table.columns if c.name not in live_columns]
+            for column in missing:
+                if _needs_server_default(column):
+                    skipped.add(column.name)
+                    notes.append(f"{table.name}.{column.name}: NOT NULL without a server_default, skipped")
+            missing = [c for c in missing if c.name not in skipped]
+            rebuild = [c for c in missing if dialect.name == 'sqlite' and _sqlite_needs_rebuild(c)]
+            add = [c for c in missing if c not in rebuild]
+            if add:
+                steps.append({'kind': 'add_columns', 'table': table, 'columns': add,
+                              'sql': _add_columns_sql(table, add, dialect)})
+            if rebuild:
+                names = ', '.join(c.name for c in rebuild)
+                steps.append({'kind': 'rebuild', 'table': table, 'columns': rebuild,
+                              'sql': [f'-- rebuild "{table.name}" in batch mode, adding {names}']})
+            live_indexes = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name in live_indexes or skipped & {c.name for c in index.columns}:
+                continue
+            index_steps.append({'kind': 'create_index', 'table': table, 'columns': list(index.columns),
+                                'index': index, 'sql': [_create_index_sql(index, dialect)]})
+    return steps + index_steps, notes
+
+def _rebuild(conn, step):
+    try:
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+    except ImportError:
+        raise RuntimeError("Rebuilding a SQLite table requires alembic (pip install Flask-Migrate)")
+    operations = Operations(MigrationContext.configure(conn))
+    with operations.batch_alter_table(step['table'].name, recreate='always') as batch:
+        for column in step['columns']:
+            batch.add_column(Column(column.name, column.type, nullable=column.nullable,
+                                    server_default=column.server_default))
+            if column.unique:
+                # batch mode needs constraint names
+                batch.create_unique_constraint(f"uq_{step['table'].name}_{column.name}", [column.name])
+
+def _run_step(conn, step):
+    started = time.perf_counter()
+    if step['kind'] == 'rebuild':
+        _rebuild(conn, step)
+    else:
+        for sql in step['sql']:
+            conn.execute(text(sql))
+    return (time.perf_counter() - started) * 1000
+
+def _is_lock_error(error):
+    # PostgreSQL lock_not_available (lock_timeout) or SQLite's busy_timeout running out
+    return getattr(error.orig, 'pgcode', None) == '55P03' or 'database is locked' in str(error.orig)
+
+def _describe(step):
+    if step['kind'] == 'create_index':
+        return f"create index {step['index'].name}"
+    if step['kind'] == 'create_table':
+        return f"create table {step['table'].name}"
+    names = ', '.join(c.name for c in step['columns'])
+    verb = 'rebuild' if step['kind'] == 'rebuild' else 'alter'
+    return f"{verb} {step['table'].name}: add {names}"
+
+def _transaction(engine, steps, lock_timeout_ms, echo):
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql' and lock_timeout_ms:
+            conn.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+        for step in steps:
+            echo(f"  {_run_step(conn, step):9.1f} ms  {_describe(step)}")
+    echo(f"  {(time.perf_counter() - started) * 1000:9.1f} ms  committed {len(steps)} step(s) in one transaction")
+
+def apply(engine, steps, lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS, retries=DEFAULT_RETRIES, echo=print):
+    """
+    Run planned steps: everything but concurrent index builds in one transaction, retried up to
+    `retries` times with backoff when a lock is not granted, then the concurrent index builds.
+    """
+    concurrent = engine.dialect.name == 'postgresql'
+    deferred = [s for s in steps if concurrent and s['kind'] == 'create_index']
+    batched = [s for s in steps if not (concurrent and s['kind'] == 'create_index')]
+    if batched:
+        for attempt in range(retries + 1):
+            try:
+                _transaction(engine, batched, lock_timeout_ms, echo)
+                break
+            except OperationalError as e:
+                if attempt == retries or not _is_lock_error(e):
+                    raise
+                delay = min(2 ** attempt * 0.5, 10)
+                echo(f"  lock not granted ({e.orig}); rolled back, retrying in {delay:g}s")
+                time.sleep(delay)
+    for step in deferred:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block. If it fails it leaves
+        # an INVALID index behind: drop it and run again.
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            echo(f"  {_run_step(conn, step):9.1f} ms  {_describe(step)} (concurrently)")
+
+def init_app(app):
+    """Register the `flask schema-evolve` command."""
+    @app.cli.command('schema-evolve')
+    @click.option('--dry-run', is_flag=True, help='Print the DDL without running it.')
+    @click.option('--table', 'table_names', multiple=True,
+                  help='Model table to evolve (repeatable); default: case and its extension tables.')
+    @click.option('--all', 'all_tables', is_flag=True, help='Evolve every model table.')
+    @click.option('--lock-timeout-ms', type=int, default=DEFAULT_LOCK_TIMEOUT_MS, show_default=True,
+                  help='PostgreSQL: longest wait for a table lock before the transaction is retried.')
+    @click.option('--retries', type=int, default=DEFAULT_RETRIES, show_default=True)
+    def schema_evolve_command(dry_run, table_names, all_tables, lock_timeout_ms, retries):
+        """Add the tables, columns and indexes the models have and the database lacks."""
+        tables = None
+        if all_tables:
+            tables = list(db.metadata.sorted_tables)
+        elif table_names:
+            unknown = [name for name in table_names if name not in db.metadata.tables]
+            if unknown:
+                raise click.BadParameter(f"not a model table: {', '.join(unknown)}", param_hint='--table')
+            tables = [db.metadata.tables[name] for name in table_names]
+        with app.app_context():
+            engine = db.engine
+            with engine.connect() as conn:
+                steps, notes = plan(conn, tables)
+            for note in notes:
+                click.echo(f"note: {note}")
+            if not steps:
+                click.echo('Schema is up to date.')
+                return
+            if dry_run:
+                for step in steps:
+                    for sql in step['sql']:
+                        click.echo(f"{sql};")
+                click.echo(f"Dry run: {len(steps)} step(s), nothing written")
+                return
+            apply(engine, steps, lock_timeout_ms, retries, echo=click.echo)
+            click.echo(f"Applied {len(steps)} step(s)")
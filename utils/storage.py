@@ -1,5 +1,28 @@
+import hashlib
 import os
-from flask import current_app, send_from_directory, abort
+import shutil
+import tempfile
+import time
+import click
+from abc import ABC, abstractmethod
+from flask import current_app, send_from_directory, send_file, redirect, abort
+from sqlalchemy import event, select
+from models import db, Document
+
+# Documents are stored through a StorageBackend chosen by STORAGE_BACKEND:
+#   'local' (default)  files under UPLOAD_FOLDER
+#   's3'               an S3-compatible bucket (AWS, MinIO, ...); needs boto3
+# Generated content is content-addressed: key blobs/ab/cd/<sha256>, one object per distinct
+# content. Document.content_hash points at the blob and the number of Documents sharing a hash
+# is its reference count. Deleting the last referencing Document removes the blob.
+BLOB_PREFIX = 'blobs/'
+# blobs younger than this survive GC, so a concurrent writer that just deduplicated onto an
+# existing blob cannot lose it to a delete committing at the same moment
+DEFAULT_GC_GRACE_SECONDS = 60
+# content up to this size is hashed in memory; larger content spools to a temp file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+COPY_CHUNK = 1024 * 1024
+EXTENSION_KEY = 'cms_storage'
 
 def get_upload_folder():
     return current_app.config.get('UPLOAD_FOLDER') or os.path.join(current_app.root_path, 'uploads', 'documents')
@@ -18,4 +41,339 @@ def serve_file(filename):
         _ = safe_join_upload(filename)
     except Exception:
         abort(403)
-    return send_from_directory(folder, filename, as_attachment=False)
\ No newline at end of file
+    return send_from_directory(folder, filename, as_attachment=False)
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class StorageBackend(ABC):
+    """
+    Interface every storage driver implements. Keys are '/'-separated relative names
+    (e.g. 'blobs/ab/cd/<sha256>'); all data moves as streams, never whole files in memory.
+    A driver that leaves out a method fails when it is instantiated.
+    """
+    @abstractmethod
+    def put(self, key, fileobj):
+        """Store the remaining bytes of fileobj under key, replacing any existing object."""
+
+    @abstractmethod
+    def open(self, key):
+        """Readable binary stream of the object; raises FileNotFoundError if missing."""
+
+    @abstractmethod
+    def exists(self, key):
+        """True if an object is stored under key."""
+
+    @abstractmethod
+    def touch(self, key):
+        """Refresh the object's last-modified time (used by the GC grace period)."""
+
+    @abstractmethod
+    def last_modified(self, key):
+        """POSIX timestamp of the last write/touch, or None if the object is missing."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove the object; missing objects are ignored."""
+
+    @abstractmethod
+    def iter_keys(self, prefix=''):
+        """Keys of every object whose key starts with prefix."""
+
+    @abstractmethod
+    def send(self, key, download_name, mimetype, as_attachment=False):
+        """Flask response serving the object (with range/conditional support where possible)."""
+
+class LocalStorage(StorageBackend):
+    """Files under a root directory (UPLOAD_FOLDER). Single-node only."""
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, *key.split('/')))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f"Invalid storage key {key!r}")
+        return path
+
+    def put(self, key, fileobj):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                shutil.copyfileobj(fileobj, fh, COPY_CHUNK)
+            os.replace(tmp, path)  # atomic; readers never see a partial file
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def touch(self, key):
+        os.utime(self.path(key))
+
+    def last_modified(self, key):
+        try:
+            return os.path.getmtime(self.path(key))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_keys(self, prefix=''):
+        start = self.path(prefix.rstrip('/')) if prefix else self.root
+        for dirpath, _, filenames in os.walk(start):
+            for name in filenames:
+                if not name.startswith('.tmp-'):
+                    yield os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, '/')
+
+    def send(self, key, download_name, mimetype, as_attachment=False):
+        # send_file answers Range/If-None-Match/If-Modified-Since itself and hands the open
+        # file to wsgi.file_wrapper (sendfile) or to the proxy when USE_X_SENDFILE is on
+        return send_file(self.path(key), mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, conditional=True, etag=True, max_age=0)
+
+class S3Storage(StorageBackend):
+    """
+    Objects in an S3-compatible bucket, shared by every app node. Point endpoint_url at
+    MinIO (or a moto server) for local testing. Uploads switch to multipart above
+    multipart_threshold; reads are redirected to short-lived presigned URLs so the
+    bucket serves ranges and conditional requests directly.
+    """
+    def __init__(self, bucket, prefix='', endpoint_url=None, region_name=None,
+                 multipart_threshold=SPOOL_MAX_SIZE, multipart_chunksize=SPOOL_MAX_SIZE, url_expires=300):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND='s3' requires boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND='s3' requires STORAGE_S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region_name)
+        self.transfer_config = TransferConfig(multipart_threshold=multipart_threshold,
+                                              multipart_chunksize=multipart_chunksize)
+        self.url_expires = url_expires
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _is_missing(self, error):
+        return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def _head(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+    def put(self, key, fileobj):
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(key), Config=self.transfer_config)
+
+    def open(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+        except ClientError as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def touch(self, key):
+        # a server-side self-copy is the only way to move LastModified; no data goes through us
+        self.client.copy_object(Bucket=self.bucket, Key=self._key(key), MetadataDirective='REPLACE',
+                                CopySource={'Bucket': self.bucket, 'Key': self._key(key)})
+
+    def last_modified(self, key):
+        head = self._head(key)
+        return head['LastModified'].timestamp() if head else None
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def iter_keys(self, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(self.prefix):]
+
+    def send(self, key, download_name, mimetype, as_attachment=False):
+        disposition = 'attachment' if as_attachment else 'inline'
+        url = self.client.generate_presigned_url('get_object', ExpiresIn=self.url_expires, Params={
+            'Bucket': self.bucket,
+            'Key': self._key(key),
+            'ResponseContentType': mimetype,
+            'ResponseContentDisposition': f'{disposition}; filename="{download_name}"',
+        })
+        return redirect(url)
+
+def storage_settings(config):
+    """The STORAGE_* settings (plus UPLOAD_FOLDER) as a plain, picklable dict."""
+    settings = {k: v for k, v in config.items() if k.startswith('STORAGE_')}
+    settings['UPLOAD_FOLDER'] = config.get('UPLOAD_FOLDER')
+    return settings
+
+def create_backend(settings):
+    """Build a backend from storage_settings(); usable outside an app context (e.g. pool workers)."""
+    kind = (settings.get('STORAGE_BACKEND') or 'local').lower()
+    if kind == 'local':
+        return LocalStorage(settings.get('STORAGE_LOCAL_ROOT') or settings['UPLOAD_FOLDER'])
+    if kind == 's3':
+        return S3Storage(
+            bucket=settings.get('STORAGE_S3_BUCKET'),
+            prefix=settings.get('STORAGE_S3_PREFIX') or '',
+            endpoint_url=settings.get('STORAGE_S3_ENDPOINT_URL'),
+            region_name=settings.get('STORAGE_S3_REGION'),
+            multipart_threshold=int(settings.get('STORAGE_S3_MULTIPART_THRESHOLD') or SPOOL_MAX_SIZE),
+            multipart_chunksize=int(settings.get('STORAGE_S3_MULTIPART_CHUNKSIZE') or SPOOL_MAX_SIZE),
+        )
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {kind!r}")
+
+def get_storage():
+    """The app's storage backend, created on first use (and again if its settings change)."""
+    state = current_app.extensions.setdefault(EXTENSION_KEY, {})
+    settings = storage_settings(current_app.config)
+    if state.get('settings') != settings:
+        state['backend'] = create_backend(settings)
+        state['settings'] = settings
+    return state['backend']
+
+# ---------------------------------------------------------------------------
+# Content-addressed blobs
+# ---------------------------------------------------------------------------
+
+def blob_key(digest):
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}"
+
+def document_key(doc):
+    """Storage key for a Document's content, or None for legacy rows stored by path only."""
+    return blob_key(doc.content_hash) if doc.content_hash else None
+
+def _spool(content):
+    """Copy content (str, bytes or binary stream) into a rewound temp file, hashing on the way."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    sha, size = hashlib.sha256(), 0
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    if isinstance(content, bytes):
+        sha.update(content)
+        spooled.write(content)
+        size = len(content)
+    else:
+        for chunk in iter(lambda: content.read(COPY_CHUNK), b''):
+            sha.update(chunk)
+            spooled.write(chunk)
+            size += len(chunk)
+    spooled.seek(0)
+    return sha.hexdigest(), size, spooled
+
+def put_blob(content, backend=None):
+    """
+    Store content (str is encoded as UTF-8; bytes or a binary stream are taken as-is) and
+    return (digest, key, size). Identical content is written once: later puts only refresh
+    the blob's timestamp. Pass `backend` when there is no app context (pool workers).
+    """
+    backend = backend or get_storage()
+    digest, size, spooled = _spool(content)
+    key = blob_key(digest)
+    with spooled:
+        if backend.exists(key):
+            backend.touch(key)
+        else:
+            backend.put(key, spooled)
+    return digest, key, size
+
+def blob_refcounts(digests):
+    """{digest: number of Documents referencing it} for the given digests (absent = 0)."""
+    if not digests:
+        return {}
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            select(Document.content_hash, db.func.count())
+            .where(Document.content_hash.in_(list(digests)))
+            .group_by(Document.content_hash)
+        )
+        return {digest: count for digest, count in rows}
+
+def collect_blobs(digests, grace=None, backend=None):
+    """Remove the blobs among `digests` that no Document references. Returns the number removed."""
+    backend = backend or get_storage()
+    if grace is None:
+        grace = current_app.config.get('BLOB_GC_GRACE_SECONDS', DEFAULT_GC_GRACE_SECONDS)
+    digests = set(digests)
+    referenced = blob_refcounts(digests)
+    cutoff = time.time() - grace
+    removed = 0
+    for digest in digests - set(referenced):
+        key = blob_key(digest)
+        modified = backend.last_modified(key)
+        if modified is not None and modified <= cutoff:
+            backend.delete(key)
+            removed += 1
+    return removed
+
+def sweep_blobs(grace=None, batch=500, backend=None):
+    """Garbage-collect every unreferenced blob (e.g. after bulk deletes or crashed writes)."""
+    backend = backend or get_storage()
+    removed, pending = 0, []
+    for key in backend.iter_keys(BLOB_PREFIX):
+        pending.append(key.rsplit('/', 1)[-1])
+        if len(pending) >= batch:
+            removed += collect_blobs(pending, grace, backend)
+            pending = []
+    if pending:
+        removed += collect_blobs(pending, grace, backend)
+    return removed
+
+# Deleted Documents are collected at flush time and their blobs checked once the
+# transaction commits (a rollback keeps them).
+def _after_flush(session, flush_context):
+    digests = {obj.content_hash for obj in session.deleted if isinstance(obj, Document) and obj.content_hash}
+    if digests:
+        session.info.setdefault('blob_gc', set()).update(digests)
+
+def _after_commit(session):
+    digests = session.info.pop('blob_gc', None)
+    if digests:
+        try:
+            collect_blobs(digests)
+        except Exception:
+            current_app.logger.exception("Blob garbage collection failed; `flask storage-gc` will retry")
+
+def _after_rollback(session):
+    session.info.pop('blob_gc', None)
+
+def init_app(app):
+    """Read STORAGE_* settings, register the blob GC hooks and the `flask storage-gc` command."""
+    app.config.setdefault('STORAGE_BACKEND', os.getenv('STORAGE_BACKEND', 'local'))
+    for name in ('STORAGE_S3_BUCKET', 'STORAGE_S3_PREFIX', 'STORAGE_S3_ENDPOINT_URL', 'STORAGE_S3_REGION'):
+        app.config.setdefault(name, os.getenv(name))
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
+
+    @app.cli.command('storage-gc')
+    @click.option('--grace', default=DEFAULT_GC_GRACE_SECONDS, show_default=True, help='Keep blobs modified in the last N seconds.')
+    def storage_gc_command(grace):
+        """Remove stored document blobs that no Document references."""
+        with app.app_context():
+            removed = sweep_blobs(grace=grace)
+        click.echo(f'Removed {removed} unreferenced blob(s).')